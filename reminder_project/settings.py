@@ -39,6 +39,9 @@ STATICFILES_DIRS = [
 
 
 AUTHENTICATION_BACKENDS = [
+    # Пользователь запроса берётся из кэша (см. users/backends.py);
+    # ModelBackend оставлен для сессий, созданных до его появления
+    "users.backends.CachedModelBackend",
     "django.contrib.auth.backends.ModelBackend",
 ]
 
@@ -58,6 +61,9 @@ EMAIL_HOST_USER = "cloudremindersbot@gmail.com"
 EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_PASSWORD")
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Адрес сайта для ссылок в письмах, которые отправляются не из запроса
+SITE_URL = config("SITE_URL", default="http://localhost:8000")
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -77,6 +83,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # 0. Метрики запросов (reminders/metrics.py): снаружи всех, чтобы учесть их время
+    "reminders.metrics.MetricsMiddleware",
     # 1. БЕЗОПАСНОСТЬ: Должны идти первыми
     "django.middleware.security.SecurityMiddleware",
     # CORS: обязан стоять до CommonMiddleware
@@ -85,11 +93,15 @@ MIDDLEWARE = [
     # 2. СЕССИИ/АУТЕНТИФИКАЦИЯ: Устанавливают контекст пользователя
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # Бюджет SQL-запросов на представление (reminders/query_budget.py)
+    "reminders.query_budget.QueryBudgetMiddleware",
     # 3. CSRF: Зависит от сессии/аутентификации
     "django.middleware.csrf.CsrfViewMiddleware",
     # 4. Прочее (менее критично)
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    # 5. Профилирование по запросу сотрудника (reminders/profiling.py) — последней
+    "reminders.profiling.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "reminder_project.urls"
@@ -173,6 +185,10 @@ STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Процессы для обработки загруженных изображений (users/imaging.py): аватары
+# и картинки на досках; 0 — в самом воркере
+IMAGE_POOL_WORKERS = config("IMAGE_POOL_WORKERS", default=2, cast=int)
+
 # --- Безопасность за обратным прокси (nginx / HTTPS) ---
 # nginx передаёт реальную схему запроса в заголовке X-Forwarded-Proto
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
@@ -200,7 +216,65 @@ REST_FRAMEWORK = {
     ),
 }
 
-SESSION_ENGINE = "django.contrib.sessions.backends.db"
+# Двухуровневый кэш (reminders/caching.py): LRU в памяти процесса перед
+# общим Redis. Без REDIS_URL общий уровень — LocMemCache (тесты, разработка)
+REDIS_URL = config("REDIS_URL", default="")
+CACHES = {
+    "default": {
+        "BACKEND": "reminders.caching.TwoTierCache",
+        "OPTIONS": {
+            "SHARED": "shared",
+            "MAX_ENTRIES": config("LOCAL_CACHE_MAX_ENTRIES", default=5000, cast=int),
+            "LOCAL_TIMEOUT": config("LOCAL_CACHE_TIMEOUT", default=60, cast=int),
+        },
+    },
+    "shared": (
+        {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+        if REDIS_URL
+        else {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "shared",
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        }
+    ),
+}
+
+# Сессии читаются из общего кэша, база — запасной вариант
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+SESSION_CACHE_ALIAS = "shared"
+
+# Бюджеты SQL-запросов по имени URL (reminders/query_budget.py).
+# Проверяются всегда при QUERY_BUDGET_ENABLED, иначе — по заголовку
+# X-Query-Budget: 1 от сотрудника
+QUERY_BUDGET_ENABLED = config("QUERY_BUDGET_ENABLED", default=False, cast=bool)
+QUERY_BUDGETS = {
+    "default": 30,
+    "board_page": 10,
+    "dashboard_page": 8,
+    "board-list": 6,
+    "board-detail": 6,
+    "board-content": 6,
+    "save_board_api": 20,
+}
+# Сколько одинаковых запросов за запрос считать признаком N+1
+QUERY_REPEAT_THRESHOLD = 5
+
+# Метрики Prometheus (/api/metrics/): токен для сборщика и как часто
+# процесс сбрасывает свои счётчики в общий кэш
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+METRICS_FLUSH_INTERVAL = 10
+
+# Профилирование запросов (reminders/profiling.py): доля запросов,
+# профилируемых без просьбы (0 — только по X-Profile/?_profile=1 от сотрудника),
+# и сколько последних профилей хранить
+PROFILE_SAMPLE_RATE = config("PROFILE_SAMPLE_RATE", default=0.0, cast=float)
+PROFILE_KEEP = 200
+
+# Рассылка изменений досок между воркерами (см. reminders/realtime.py)
+REALTIME_BACKEND = "reminders.realtime.PostgresNotifyBackend"
 SESSION_COOKIE_AGE = 1209600  # 2 недели
 
 
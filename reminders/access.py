@@ -0,0 +1,165 @@
+"""
+Пересчёт материализованных прав доступа к доскам (BoardAccess).
+
+Права наследуются вниз по дереву вложенных досок: кто может читать или
+редактировать родительскую доску, может то же самое и на дочерних.
+Уровень OWNER выдаётся только владельцу самой доски, от предков
+наследуется не выше EDITOR.
+
+Уровни кэшируются (Board.get_access_level) под версией "acl" пользователя:
+любая перезапись строк пользователя меняет эту версию.
+"""
+
+from django.db import transaction
+
+from .caching import bump_versions
+from .contacts import refresh_contacts
+from .models import Board, BoardAccess, BoardCollaborator, GroupMember
+
+GROUP_ROLE_LEVELS = {
+    GroupMember.Role.ADMIN: BoardAccess.Level.EDITOR,
+    GroupMember.Role.EDITOR: BoardAccess.Level.EDITOR,
+    GroupMember.Role.VIEWER: BoardAccess.Level.VIEWER,
+}
+
+COLLABORATOR_LEVELS = {
+    BoardCollaborator.AccessLevel.EDITOR: BoardAccess.Level.EDITOR,
+    BoardCollaborator.AccessLevel.VIEWER: BoardAccess.Level.VIEWER,
+}
+
+BOARD_FIELDS = ("id", "parent_id", "owner_id", "group_id")
+
+
+def collect_subtree(board_ids):
+    """Доски вместе со всеми потомками: {id: (id, parent_id, owner_id, group_id)}."""
+    rows = (
+        Board.objects.filter(ancestor_links__ancestor_id__in=list(board_ids))
+        .values_list(*BOARD_FIELDS)
+        .distinct()
+    )
+    return {row[0]: row for row in rows}
+
+
+def _merge(levels, user_id, level):
+    if level > levels.get(user_id, 0):
+        levels[user_id] = level
+
+
+def compute_levels(rows, user_ids=None):
+    """
+    Считает {board_id: {user_id: level}} для досок rows (результат collect_subtree).
+    Права родителей, не попавших в rows, берутся из уже посчитанной таблицы.
+    """
+    group_ids = {row[3] for row in rows.values() if row[3]}
+    outer_parent_ids = {
+        row[1] for row in rows.values() if row[1] and row[1] not in rows
+    }
+
+    members = GroupMember.objects.filter(group_id__in=group_ids)
+    collaborators = BoardCollaborator.objects.filter(
+        board_id__in=list(rows), status=BoardCollaborator.Status.ACCEPTED
+    )
+    inherited = BoardAccess.objects.filter(board_id__in=outer_parent_ids)
+    if user_ids is not None:
+        members = members.filter(user_id__in=user_ids)
+        collaborators = collaborators.filter(user_id__in=user_ids)
+        inherited = inherited.filter(user_id__in=user_ids)
+
+    group_levels = {}
+    for group_id, user_id, role in members.values_list("group_id", "user_id", "role"):
+        _merge(group_levels.setdefault(group_id, {}), user_id, GROUP_ROLE_LEVELS[role])
+
+    own_levels = {}
+    for board_id, user_id, access_level in collaborators.values_list(
+        "board_id", "user_id", "access_level"
+    ):
+        _merge(
+            own_levels.setdefault(board_id, {}),
+            user_id,
+            COLLABORATOR_LEVELS[access_level],
+        )
+
+    resolved = {}
+    for board_id, user_id, level in inherited.values_list(
+        "board_id", "user_id", "level"
+    ):
+        resolved.setdefault(board_id, {})[user_id] = level
+
+    for board_id in rows:
+        # Поднимаемся до уже посчитанного предка и спускаемся обратно
+        chain = []
+        seen = set()
+        current = board_id
+        while current in rows and current not in resolved and current not in seen:
+            seen.add(current)
+            chain.append(current)
+            current = rows[current][1]
+        base = resolved.get(current, {}) if current not in seen else {}
+
+        for chain_id in reversed(chain):
+            _, _, owner_id, group_id = rows[chain_id]
+            levels = {
+                user_id: min(level, BoardAccess.Level.EDITOR)
+                for user_id, level in base.items()
+            }
+            for user_id, level in group_levels.get(group_id, {}).items():
+                _merge(levels, user_id, level)
+            for user_id, level in own_levels.get(chain_id, {}).items():
+                _merge(levels, user_id, level)
+            if owner_id and (user_ids is None or owner_id in user_ids):
+                levels[owner_id] = BoardAccess.Level.OWNER
+            resolved[chain_id] = levels
+            base = levels
+
+    return {board_id: resolved[board_id] for board_id in rows}
+
+
+def rebuild_board_access(board_ids, user_ids=None):
+    """
+    Пересчитывает права на доски board_ids и всех их потомков.
+    Если передан user_ids, трогаем только строки этих пользователей.
+    """
+    rows = collect_subtree(board_ids)
+    if not rows:
+        return
+    levels = compute_levels(rows, user_ids)
+
+    with transaction.atomic():
+        stale = BoardAccess.objects.filter(board_id__in=list(rows))
+        if user_ids is not None:
+            stale = stale.filter(user_id__in=user_ids)
+        old_pairs = set(stale.values_list("board_id", "user_id"))
+        stale.delete()
+        BoardAccess.objects.bulk_create(
+            BoardAccess(board_id=board_id, user_id=user_id, level=level)
+            for board_id, board_levels in levels.items()
+            for user_id, level in board_levels.items()
+        )
+        # Контакты меняются только у тех, кто получил или потерял доступ
+        new_pairs = {
+            (board_id, user_id)
+            for board_id, board_levels in levels.items()
+            for user_id in board_levels
+        }
+        refresh_contacts(user_id for _, user_id in old_pairs ^ new_pairs)
+        bump_versions("acl", {user_id for _, user_id in old_pairs | new_pairs})
+
+
+def revoke_board_access(board_ids, user_ids):
+    """
+    Снимает права пользователей на поддеревья досок сразу, а точный пересчёт
+    (у пользователя могут остаться другие основания доступа) откладывает
+    до коммита: при каскадном удалении доски к этому моменту уже исчезнут.
+    """
+    board_ids = list(collect_subtree(board_ids))
+    if not board_ids:
+        return
+    BoardAccess.objects.filter(board_id__in=board_ids, user_id__in=user_ids).delete()
+    bump_versions("acl", user_ids)
+    refresh_contacts(user_ids)
+    transaction.on_commit(lambda: rebuild_board_access(board_ids, user_ids=user_ids))
+
+
+def rebuild_all_board_access():
+    """Полный пересчёт таблицы (после массовых правок через update() и т.п.)."""
+    rebuild_board_access(Board.objects.values_list("id", flat=True))
@@ -1,3 +1,64 @@
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.core.files.storage import default_storage
+from django.http import FileResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
 
-# Register your models here.
+from .models import RequestProfile
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    """Последние профили запросов (reminders/profiling.py)."""
+
+    list_display = (
+        "created_at",
+        "method",
+        "path",
+        "view_name",
+        "status_code",
+        "duration_ms",
+        "query_count",
+        "db_ms",
+        "user",
+        "sampled",
+        "download",
+    )
+    list_filter = ("view_name", "sampled", "method")
+    search_fields = ("path", "view_name")
+    list_select_related = ("user",)
+    readonly_fields = [field.name for field in RequestProfile._meta.fields]
+    fields = readonly_fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                "<int:pk>/download/",
+                self.admin_site.admin_view(self.download_view),
+                name="reminders_requestprofile_download",
+            ),
+            *super().get_urls(),
+        ]
+
+    @admin.display(description="Файл")
+    def download(self, obj):
+        url = reverse("admin:reminders_requestprofile_download", args=[obj.pk])
+        return format_html('<a href="{}">.prof</a>', url)
+
+    def download_view(self, request, pk):
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        if not self.has_view_permission(request, profile):
+            raise PermissionDenied
+        return FileResponse(
+            default_storage.open(profile.profile.name),
+            as_attachment=True,
+            filename=f"profile-{profile.pk}.prof",
+        )
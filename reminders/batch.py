@@ -0,0 +1,98 @@
+"""
+Пакетное создание элементов доски (create_items_api).
+
+Вставка пачки (вставка стикеров, дублирование выделения) — один INSERT
+на таблицу: вложенные доски, их строки замыкания, элементы и данные задач
+создаются bulk_create в одной транзакции с одной новой ревизией доски.
+При bulk_create сигналы post_save не срабатывают, поэтому их работа —
+замыкание и права для новых досок, сводки исполнителей — делается здесь;
+ссылки на картинки учитывает BoardItemQuerySet.bulk_create.
+"""
+
+from django.db import transaction
+
+from .access import rebuild_board_access
+from .dashboard import invalidate_dashboards
+from .hierarchy import insert_board_nodes
+from .images import usable_image_ids
+from .models import Board, BoardItem, TaskData
+from users.models import CustomUser
+
+# Больше элементов за один запрос не принимаем
+BATCH_LIMIT = 500
+
+
+def _ids(values):
+    ids = set()
+    for value in values:
+        try:
+            ids.add(int(value))
+        except (TypeError, ValueError):
+            # Ошибку покажет валидация сериализатора
+            pass
+    return ids
+
+
+def batch_context(user, entries):
+    """
+    Доступные пользователю картинки и существующие исполнители, на которые
+    ссылается пачка, для BoardItemBatchSerializer: по одному запросу на пачку.
+    """
+    user_ids = _ids(
+        (entry.get("task_data") or {}).get("assigned_to_id") for entry in entries
+    )
+    return {
+        "image_ids": usable_image_ids(
+            user, _ids(entry.get("image") for entry in entries)
+        ),
+        "user_ids": (
+            set(CustomUser.objects.filter(id__in=user_ids).values_list("id", flat=True))
+            if user_ids
+            else set()
+        ),
+    }
+
+
+def create_board_items(board, user, entries):
+    """
+    Создаёт элементы из провалидированных entries (BoardItemBatchSerializer)
+    и возвращает их в порядке entries. Для NESTED_BOARD в той же пачке
+    создаётся дочерняя доска с названием title и цветом color.
+    """
+    if not entries:
+        return []
+    items, children, tasks = [], [], []
+    for entry in entries:
+        entry = dict(entry)
+        task_payload = entry.pop("task_data", None)
+        title = entry.pop("title", "Новая доска")
+        color = entry.pop("color", None)
+        item = BoardItem(board=board, **entry)
+        if item.item_type == BoardItem.ItemType.NESTED_BOARD:
+            item.linked_board = Board(
+                title=title,
+                owner_id=board.owner_id or user.pk,
+                parent=board,
+                settings={"BackgroundColor": color},
+            )
+            children.append(item.linked_board)
+        elif item.item_type == BoardItem.ItemType.TASK:
+            tasks.append(TaskData(item=item, **(task_payload or {})))
+        items.append(item)
+
+    with transaction.atomic():
+        if children:
+            Board.objects.bulk_create(children)
+            insert_board_nodes(children)
+            rebuild_board_access([child.pk for child in children])
+            for item in items:
+                if item.linked_board is not None:
+                    item.content_payload = str(item.linked_board.pk)
+
+        revision = Board.next_revision(board.id)
+        for item in items:
+            item.revision = revision
+        BoardItem.objects.bulk_create(items)
+        TaskData.objects.bulk_create(tasks)
+        invalidate_dashboards({task.assigned_to_id for task in tasks} - {None})
+    return items
@@ -0,0 +1,86 @@
+"""
+Кэш сериализованных элементов доски.
+
+Ключ включает Board.revision — версию содержимого доски, которую увеличивает
+каждая запись элементов, задач и настроек (см. Board.next_revision). Поэтому
+кэш не нужно инвалидировать: после правки просто читается другой ключ,
+а старый истекает сам. Открытие неизменённой доски стоит одного обращения
+к кэшу вместо сериализации всех элементов.
+
+Поля самой доски (название, права пользователя) не кэшируются — они
+дешёвые и зависят от того, кто открывает доску.
+
+Содержимое под ключом с ревизией не меняется, поэтому его можно держать
+в локальном уровне кэша (reminders/caching.py); счётчики меняются
+постоянно и живут только в общем.
+"""
+
+from django.core.cache import cache
+
+from .caching import shared_cache
+from .models import BoardItem
+from .serializers import BoardItemSerializer, BoardSerializer
+
+# Увеличить при изменении формата BoardItemSerializer
+# (2 — картинки элементов IMAGE и аватар исполнителя в размере sm)
+PAYLOAD_FORMAT = 2
+PAYLOAD_TIMEOUT = 60 * 60 * 24
+
+HITS_KEY = "board-payload:hits"
+MISSES_KEY = "board-payload:misses"
+
+
+def _payload_key(board):
+    return f"board-payload:{PAYLOAD_FORMAT}:{board.pk}:{board.revision}"
+
+
+def _count(key):
+    counters = shared_cache()
+    try:
+        counters.incr(key)
+    except ValueError:
+        # Счётчика ещё нет (или он вытеснен из кэша)
+        if not counters.add(key, 1, timeout=None):
+            counters.incr(key)
+
+
+def get_board_items_payload(board, items=None):
+    """
+    Список сериализованных элементов доски для её текущей ревизии.
+    items — queryset элементов на случай промаха (по умолчанию все элементы).
+    """
+    key = _payload_key(board)
+    payload = cache.get(key)
+    if payload is not None:
+        _count(HITS_KEY)
+        return payload
+
+    _count(MISSES_KEY)
+    if items is None:
+        items = BoardItem.objects.select_related(
+            "task_data__assigned_to", "linked_board", "image"
+        ).filter(board=board)
+    payload = BoardItemSerializer(items, many=True).data
+    cache.set(key, payload, PAYLOAD_TIMEOUT)
+    return payload
+
+
+def get_board_payload(board, request, items=None):
+    """То же, что BoardDetailSerializer(board).data, но элементы берутся из кэша."""
+    items_payload = get_board_items_payload(board, items)
+    board.items_count = len(items_payload)
+    data = BoardSerializer(board, context={"request": request}).data
+    data["items"] = items_payload
+    return data
+
+
+def board_payload_cache_stats():
+    counters = shared_cache().get_many([HITS_KEY, MISSES_KEY])
+    hits = counters.get(HITS_KEY, 0)
+    misses = counters.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else None,
+    }
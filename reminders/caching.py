@@ -0,0 +1,228 @@
+"""
+Двухуровневый кэш и версионные ключи.
+
+TwoTierCache — бэкенд для CACHES["default"]: перед общим кэшем (Redis,
+CACHES["shared"]) стоит LRU в памяти процесса с коротким TTL. Попадание
+в локальный уровень не ходит по сети. Удаление и запись видны другим
+воркерам только через общий уровень, поэтому в default кладём значения
+под версионными ключами (их содержимое не меняется), а изменяемые
+данные — счётчики, сессии, сами версии — держим в общем кэше напрямую.
+
+Версии (get_versions / bump_versions) живут только в общем кэше:
+bump_versions из хуков сохранения и удаления моделей сразу меняет ключ
+для всех воркеров. Версия меняется дважды — сразу (чтобы текущая
+транзакция не читала старое) и после коммита (чтобы параллельный запрос
+не успел положить старые данные под новым ключом).
+
+Без REDIS_URL общий уровень — LocMemCache: замена для тестов и разработки.
+"""
+
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.db import transaction
+
+SHARED_ALIAS = "shared"
+
+# Локальные уровни и счётчики — на процесс, общие для всех потоков
+_stores = {}
+_stats = {}
+_locks = {}
+
+
+def shared_cache():
+    return caches[SHARED_ALIAS]
+
+
+class TwoTierCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._shared_alias = options.get("SHARED", SHARED_ALIAS)
+        self._local_timeout = options.get("LOCAL_TIMEOUT", 60)
+        self._store = _stores.setdefault(name, OrderedDict())
+        self._stats = _stats.setdefault(
+            name,
+            {"local_hits": 0, "local_misses": 0, "shared_hits": 0, "shared_misses": 0},
+        )
+        self._lock = _locks.setdefault(name, threading.Lock())
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    # --- локальный уровень ---
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._store.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._store.move_to_end(key)
+                self._stats["local_hits"] += 1
+                return entry[1]
+            if entry is not None:
+                del self._store[key]
+            self._stats["local_misses"] += 1
+        return None
+
+    def _local_set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        timeout = self.get_backend_timeout(timeout)
+        ttl = self._local_timeout
+        if timeout is not None:
+            ttl = min(ttl, timeout - time.time())
+        if ttl <= 0:
+            self._local_delete(key)
+            return
+        # Храним копию: изменение полученного объекта не должно портить кэш
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._lock:
+            self._store[key] = (time.monotonic() + ttl, pickled)
+            self._store.move_to_end(key)
+            while len(self._store) > self._max_entries:
+                self._store.popitem(last=False)
+
+    def _local_delete(self, key):
+        with self._lock:
+            self._store.pop(key, None)
+
+    def _count_shared(self, hit):
+        with self._lock:
+            self._stats["shared_hits" if hit else "shared_misses"] += 1
+
+    # --- API кэша Django ---
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        pickled = self._local_get(key)
+        if pickled is not None:
+            return pickle.loads(pickled)
+        missing = object()
+        value = self.shared.get(key, missing, version=0)
+        self._count_shared(value is not missing)
+        if value is missing:
+            return default
+        self._local_set(key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        result, missed = {}, {}
+        for key in keys:
+            full_key = self.make_and_validate_key(key, version=version)
+            pickled = self._local_get(full_key)
+            if pickled is not None:
+                result[key] = pickle.loads(pickled)
+            else:
+                missed[full_key] = key
+        if missed:
+            found = self.shared.get_many(list(missed), version=0)
+            for full_key, key in missed.items():
+                self._count_shared(full_key in found)
+                if full_key in found:
+                    result[key] = found[full_key]
+                    self._local_set(full_key, found[full_key])
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self.shared.set(key, value, timeout, version=0)
+        self._local_set(key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._local_delete(key)
+        return self.shared.add(key, value, timeout, version=0)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self.shared.touch(key, timeout, version=0)
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._local_delete(key)
+        return self.shared.delete(key, version=0)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self.shared.has_key(key, version=0)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._local_delete(key)
+        return self.shared.incr(key, delta, version=0)
+
+    def clear(self):
+        with self._lock:
+            self._store.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, local_entries=len(self._store))
+        for tier in ("local", "shared"):
+            total = stats[f"{tier}_hits"] + stats[f"{tier}_misses"]
+            stats[f"{tier}_hit_ratio"] = (
+                round(stats[f"{tier}_hits"] / total, 4) if total else None
+            )
+        return stats
+
+
+def cache_stats():
+    """Статистика уровней кэша default для текущего процесса."""
+    cache = caches["default"]
+    return cache.stats() if isinstance(cache, TwoTierCache) else None
+
+
+# --- версионные ключи ---
+def _version_key(namespace, ident):
+    return f"version:{namespace}:{ident}"
+
+
+def get_versions(namespace, idents):
+    """{ident: версия}; недостающие версии создаются."""
+    shared = shared_cache()
+    keys = {_version_key(namespace, ident): ident for ident in idents}
+    found = shared.get_many(list(keys))
+    versions = {keys[key]: version for key, version in found.items()}
+    for key, ident in keys.items():
+        if ident not in versions:
+            # Начальная версия — время, чтобы после вытеснения ключа
+            # не совпасть с данными, лежащими под старой версией
+            version = time.time_ns()
+            if not shared.add(key, version, timeout=None):
+                version = shared.get(key, version)
+            versions[ident] = version
+    return versions
+
+
+def get_version(namespace, ident):
+    return get_versions(namespace, [ident])[ident]
+
+
+def versioned_key(namespace, ident, *parts):
+    """Ключ, который меняется при каждом bump_versions(namespace, [ident])."""
+    suffix = "".join(f":{part}" for part in parts)
+    return f"{namespace}:{ident}:{get_version(namespace, ident)}{suffix}"
+
+
+def bump_versions(namespace, idents):
+    """Сбрасывает данные под версионными ключами idents — сразу и после коммита."""
+    idents = {ident for ident in idents if ident is not None}
+    if not idents:
+        return
+
+    def bump():
+        version = time.time_ns()
+        shared_cache().set_many(
+            {_version_key(namespace, ident): version for ident in idents},
+            timeout=None,
+        )
+
+    bump()
+    transaction.on_commit(bump)
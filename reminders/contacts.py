@@ -0,0 +1,99 @@
+"""
+Контакты пользователя для поиска при приглашении на доску (UserContact).
+
+Контакт — тот, с кем есть общая доска (по BoardAccess, включая вложенные)
+или общая рабочая группа; weight — число таких досок и групп. Ещё не
+принятое приглашение на доску тоже связывает приглашённого со всеми, у кого
+к ней есть доступ, — как и в прежнем поиске по участникам досок. Связь
+симметрична, поэтому строки хранятся в обе стороны.
+
+Таблицу пересчитывают для затронутых пользователей rebuild_board_access
+и revoke_board_access (reminders/access.py), а также сигналы участников
+групп и приглашений. search_text обновляется при изменении профиля контакта. На Postgres
+по search_text построен триграммный GIN-индекс (миграция 0013), поэтому
+поиск по подстроке — один индексный запрос без перебора таблицы.
+"""
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from users.models import CustomUser
+
+from .models import BoardAccess, BoardCollaborator, GroupMember, UserContact
+
+SEARCH_FIELDS = ("username", "email", "first_name", "last_name")
+PENDING = BoardCollaborator.Status.PENDING
+
+
+def contact_search_text(*values):
+    return " ".join(value for value in values if value).lower()
+
+
+def compute_contact_weights(user_ids):
+    """{(user_id, contact_id): weight} для всех контактов пользователей user_ids."""
+    weights = {}
+    shared = [
+        BoardAccess.objects.filter(user_id__in=user_ids)
+        .values_list("user_id", "board__access_entries__user_id")
+        .annotate(count=Count("id")),
+        GroupMember.objects.filter(user_id__in=user_ids)
+        .values_list("user_id", "group__members__user_id")
+        .annotate(count=Count("id")),
+        # Приглашённые, но ещё не принявшие: доступа у них нет
+        BoardCollaborator.objects.filter(user_id__in=user_ids, status=PENDING)
+        .values_list("user_id", "board__access_entries__user_id")
+        .annotate(count=Count("id")),
+        BoardAccess.objects.filter(
+            user_id__in=user_ids, board__collaborators__status=PENDING
+        )
+        .values_list("user_id", "board__collaborators__user_id")
+        .annotate(count=Count("id")),
+    ]
+    for rows in shared:
+        for user_id, contact_id, count in rows:
+            if user_id != contact_id:
+                key = (user_id, contact_id)
+                weights[key] = weights.get(key, 0) + count
+    return weights
+
+
+def refresh_contacts(user_ids):
+    """Пересчитывает все контакты пользователей user_ids (в обе стороны)."""
+    user_ids = {user_id for user_id in user_ids if user_id}
+    if not user_ids:
+        return
+    weights = compute_contact_weights(user_ids)
+    for (user_id, contact_id), weight in list(weights.items()):
+        weights.setdefault((contact_id, user_id), weight)
+
+    search_texts = {
+        row[0]: contact_search_text(*row[1:])
+        for row in CustomUser.objects.filter(
+            id__in={contact_id for _, contact_id in weights}
+        ).values_list("id", *SEARCH_FIELDS)
+    }
+    with transaction.atomic():
+        UserContact.objects.filter(
+            Q(user_id__in=user_ids) | Q(contact_id__in=user_ids)
+        ).delete()
+        UserContact.objects.bulk_create(
+            UserContact(
+                user_id=user_id,
+                contact_id=contact_id,
+                weight=weight,
+                search_text=search_texts[contact_id],
+            )
+            for (user_id, contact_id), weight in weights.items()
+        )
+
+
+def update_contact_search_text(user):
+    UserContact.objects.filter(contact=user).update(
+        search_text=contact_search_text(
+            *(getattr(user, field) for field in SEARCH_FIELDS)
+        )
+    )
+
+
+def rebuild_all_contacts():
+    refresh_contacts(CustomUser.objects.values_list("id", flat=True))
@@ -0,0 +1,95 @@
+"""
+Сводка для главной страницы пользователя (dashboard_page).
+
+Собирается тремя запросами: корневые доски из BoardAccess (свои и чужие
+одним запросом, без OR по группам и приглашениям и без DISTINCT),
+открытые задачи и ожидающие приглашения. Результат — простые словари,
+кэшируется под ключом с версией пользователя (reminders/caching.py).
+
+Версию меняют сигналы (reminders/signals.py) при изменении участников
+групп, приглашений, корневых досок и задач, а также пакетные записи задач
+в save_board_api и apply_board_operations.
+"""
+
+from django.core.cache import cache
+
+from .caching import bump_versions, versioned_key
+from .models import Board, BoardCollaborator, TaskData
+
+SUMMARY_TIMEOUT = 60 * 10
+TASKS_LIMIT = 10
+
+
+def invalidate_dashboards(user_ids):
+    """Сбрасывает сводки пользователей (сразу и после коммита транзакции)."""
+    bump_versions("dashboard", user_ids)
+
+
+def invalidate_task_assignees(item_ids):
+    """Сбрасывает сводки исполнителей задач с указанными элементами."""
+    invalidate_dashboards(
+        TaskData.objects.filter(
+            item_id__in=list(item_ids), assigned_to__isnull=False
+        ).values_list("assigned_to_id", flat=True)
+    )
+
+
+def build_dashboard_summary(user):
+    boards = (
+        Board.objects.filter(access_entries__user=user, parent__isnull=True)
+        .select_related("owner")
+        .order_by("-updated_at")
+    )
+    my_boards, shared_boards = [], []
+    for board in boards:
+        entry = {
+            "id": board.id,
+            "title": board.title,
+            "settings": board.settings,
+            "owner": {"username": board.owner.username} if board.owner else None,
+        }
+        (my_boards if board.owner_id == user.id else shared_boards).append(entry)
+
+    my_tasks = [
+        {
+            "id": task.id,
+            "item_id": task.item_id,
+            "title": task.item.content_payload,
+            "board_id": task.item.board_id,
+            "board_title": task.item.board.title,
+            "due_date": task.due_date,
+            "priority": task.priority,
+        }
+        for task in TaskData.objects.filter(assigned_to=user, is_completed=False)
+        .select_related("item__board")
+        .order_by("due_date")[:TASKS_LIMIT]
+    ]
+
+    invitations = [
+        {
+            "board_id": invite.board_id,
+            "board_title": invite.board.title,
+            "inviter": invite.board.owner.username if invite.board.owner else None,
+            "access_level": invite.get_access_level_display(),
+            "created_at": invite.created_at,
+        }
+        for invite in BoardCollaborator.objects.filter(
+            user=user, status=BoardCollaborator.Status.PENDING
+        ).select_related("board__owner")
+    ]
+
+    return {
+        "my_boards": my_boards,
+        "shared_boards": shared_boards,
+        "my_tasks": my_tasks,
+        "invitations": invitations,
+    }
+
+
+def get_dashboard_summary(user):
+    key = versioned_key("dashboard", user.id)
+    summary = cache.get(key)
+    if summary is None:
+        summary = build_dashboard_summary(user)
+        cache.set(key, summary, SUMMARY_TIMEOUT)
+    return summary
@@ -0,0 +1,210 @@
+"""
+Рассылка напоминаний о сроках задач (TaskData.due_date).
+
+В памяти держится куча (heap) ближайших сроков — только задачи со сроком
+в пределах horizon, поэтому сотни тысяч открытых задач не загружаются
+целиком. Между срабатываниями процесс спит до ближайшего срока, а раз
+в sync_interval подгружает только задачи, изменённые с прошлой сверки
+(TaskData.updated_at).
+
+Записи в куче могут устареть (задачу закрыли, перенесли срок) — перед
+отправкой задачи перечитываются из БД одним запросом на пачку. Письма
+пачки уходят через одно SMTP-соединение, которое переиспользуется,
+пока есть что отправлять.
+"""
+
+import heapq
+import logging
+import smtplib
+import time
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Q
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import TaskData
+
+logger = logging.getLogger(__name__)
+
+
+class DueReminderDispatcher:
+    # Запас на транзакции, закоммиченные позже своего updated_at
+    SYNC_OVERLAP = timedelta(minutes=1)
+    # Через сколько повторить пачку, если почтовый сервер недоступен
+    RETRY_DELAY = timedelta(minutes=1)
+    # Соединение закрывается, если до следующего письма дольше этого
+    IDLE_TIMEOUT = timedelta(minutes=1)
+
+    def __init__(
+        self,
+        lead=timedelta(0),
+        horizon=timedelta(hours=6),
+        grace=timedelta(days=1),
+        sync_interval=timedelta(seconds=30),
+        batch_size=100,
+    ):
+        self.lead = lead
+        self.horizon = horizon
+        # Просроченные задачи, о которых ещё не напоминали, — не старше grace
+        self.grace = grace
+        self.sync_interval = sync_interval
+        self.batch_size = batch_size
+
+        self.heap = []  # (когда напомнить, id задачи, срок)
+        self.queued = set()  # (id задачи, срок) уже в куче
+        self.loaded_until = None
+        self.synced_at = None
+        self.connection = None
+
+    @staticmethod
+    def pending():
+        """Открытые задачи с исполнителем, о текущем сроке которых не напоминали."""
+        return TaskData.objects.filter(
+            Q(reminded_for__isnull=True) | ~Q(reminded_for=F("due_date")),
+            is_completed=False,
+            assigned_to__isnull=False,
+            due_date__isnull=False,
+        )
+
+    def push(self, task_id, due_date, remind_at=None):
+        if (task_id, due_date) in self.queued and remind_at is None:
+            return
+        self.queued.add((task_id, due_date))
+        heapq.heappush(
+            self.heap, (remind_at or due_date - self.lead, task_id, due_date)
+        )
+
+    def _load(self, tasks):
+        for task_id, due_date in tasks.values_list("id", "due_date").iterator(
+            chunk_size=2000
+        ):
+            self.push(task_id, due_date)
+
+    def refresh(self, now):
+        """Подгружает сроки, попавшие в горизонт, и недавно изменённые задачи."""
+        until = now + self.lead + self.horizon
+        if self.loaded_until is None:
+            self._load(self.pending().filter(due_date__range=(now - self.grace, until)))
+            self.loaded_until = until
+        elif until - self.loaded_until >= self.horizon / 2:
+            self._load(
+                self.pending().filter(
+                    due_date__gt=self.loaded_until, due_date__lte=until
+                )
+            )
+            self.loaded_until = until
+
+        if self.synced_at is not None:
+            self._load(
+                self.pending().filter(
+                    updated_at__gte=self.synced_at - self.SYNC_OVERLAP,
+                    due_date__gte=now - self.grace,
+                    due_date__lte=self.loaded_until,
+                )
+            )
+        self.synced_at = now
+
+    def pop_due(self, now):
+        """Записи кучи, по которым пора напоминать (не больше batch_size)."""
+        entries = []
+        while self.heap and self.heap[0][0] <= now and len(entries) < self.batch_size:
+            _, task_id, due_date = heapq.heappop(self.heap)
+            self.queued.discard((task_id, due_date))
+            entries.append((task_id, due_date))
+        return entries
+
+    def build_message(self, task):
+        board = task.item.board
+        title = task.item.content_payload or "Задача"
+        due = timezone.localtime(task.due_date).strftime("%d.%m.%Y %H:%M")
+        url = settings.SITE_URL.rstrip("/") + reverse("board_page", args=[board.id])
+        return EmailMessage(
+            subject=f"Срок задачи: {title}",
+            body=(
+                f"Привет, {task.assigned_to.username}!\n\n"
+                f"Срок задачи «{title}» на доске «{board.title}» — {due}.\n"
+                f"Открыть доску: {url}"
+            ),
+            to=[task.assigned_to.email],
+        )
+
+    def _send(self, messages):
+        # Сервер мог закрыть простаивавшее соединение: одна попытка переподключиться
+        for attempt in range(2):
+            try:
+                if self.connection is None:
+                    self.connection = get_connection()
+                    self.connection.open()
+                return self.connection.send_messages(messages)
+            except (smtplib.SMTPException, OSError):
+                self.close()
+                if attempt:
+                    raise
+
+    def send_batch(self, entries, now):
+        """Отправляет напоминания по записям кучи, возвращает число писем."""
+        tasks = [
+            task
+            for task in self.pending()
+            .filter(id__in=[task_id for task_id, _ in entries])
+            .select_related("assigned_to", "item__board")
+            if task.due_date - self.lead <= now and task.assigned_to.email
+        ]
+        if not tasks:
+            return 0
+
+        try:
+            self._send([self.build_message(task) for task in tasks])
+        except (smtplib.SMTPException, OSError):
+            logger.exception("Could not send %d due-date reminders", len(tasks))
+            for task in tasks:
+                self.push(task.id, task.due_date, remind_at=now + self.RETRY_DELAY)
+            return 0
+
+        # Отмечаем именно тот срок, о котором напомнили: если его успели
+        # перенести, задача останется в pending()
+        tasks.sort(key=lambda task: task.due_date)
+        for due_date, group in groupby(tasks, key=lambda task: task.due_date):
+            TaskData.objects.filter(
+                id__in=[task.id for task in group], due_date=due_date
+            ).update(reminded_for=due_date)
+        return len(tasks)
+
+    def run_once(self, now=None):
+        """Один проход: сверка с БД и отправка всего, что уже пора."""
+        now = now or timezone.now()
+        if self.synced_at is None or now - self.synced_at >= self.sync_interval:
+            self.refresh(now)
+        sent = 0
+        while entries := self.pop_due(now):
+            sent += self.send_batch(entries, now)
+        return sent
+
+    def seconds_until_next(self, now):
+        wake = self.synced_at + self.sync_interval
+        if self.heap:
+            wake = min(wake, self.heap[0][0])
+        return max((wake - now).total_seconds(), 0)
+
+    def run_forever(self):
+        try:
+            while True:
+                self.run_once()
+                now = timezone.now()
+                if not self.heap or self.heap[0][0] - now > self.IDLE_TIMEOUT:
+                    self.close()
+                time.sleep(self.seconds_until_next(now))
+        finally:
+            self.close()
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.connection = None
@@ -0,0 +1,62 @@
+"""
+Ограничивающие прямоугольники (bbox) элементов доски.
+
+Повторяет то, как Konva размещает узел: точки линии (или прямоугольник
+0..width × 0..height) масштабируются на scaleX/scaleY, поворачиваются на
+rotation градусов вокруг (x, y) и сдвигаются в (x, y).
+"""
+
+import math
+
+
+def _number(value, default=0.0):
+    try:
+        result = float(value)
+    except (TypeError, ValueError):
+        return default
+    return result if math.isfinite(result) else default
+
+
+def local_points(geometry):
+    """Точки элемента в его собственной системе координат."""
+    points = geometry.get("points")
+    if isinstance(points, (list, tuple)) and len(points) >= 2:
+        return [
+            (_number(points[i]), _number(points[i + 1]))
+            for i in range(0, len(points) - 1, 2)
+        ]
+    width = _number(geometry.get("width"))
+    height = _number(geometry.get("height"))
+    return [(0.0, 0.0), (width, 0.0), (0.0, height), (width, height)]
+
+
+def item_bbox(geometry):
+    """(min_x, min_y, max_x, max_y) элемента на доске или None без геометрии."""
+    if not isinstance(geometry, dict) or not geometry:
+        return None
+
+    points = local_points(geometry)
+    scale_x = _number(geometry.get("scaleX"), 1.0)
+    scale_y = _number(geometry.get("scaleY"), 1.0)
+    angle = math.radians(_number(geometry.get("rotation")))
+    cos, sin = math.cos(angle), math.sin(angle)
+    origin_x = _number(geometry.get("x"))
+    origin_y = _number(geometry.get("y"))
+
+    xs, ys = [], []
+    for px, py in points:
+        px, py = px * scale_x, py * scale_y
+        xs.append(origin_x + px * cos - py * sin)
+        ys.append(origin_y + px * sin + py * cos)
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def parse_bbox(value):
+    """Разбирает ?bbox=min_x,min_y,max_x,max_y; ValueError при ошибке."""
+    parts = [float(part) for part in value.split(",")]
+    if len(parts) != 4 or not all(math.isfinite(part) for part in parts):
+        raise ValueError(value)
+    min_x, min_y, max_x, max_y = parts
+    if min_x > max_x or min_y > max_y:
+        raise ValueError(value)
+    return min_x, min_y, max_x, max_y
@@ -0,0 +1,75 @@
+"""
+Поддержка таблицы замыкания дерева досок (BoardClosure).
+
+Вызывается из сигналов Board внутри транзакции Board.save(), поэтому
+дерево и таблица всегда меняются вместе. Удаление досок чистится
+каскадом по внешним ключам.
+"""
+
+from django.core.exceptions import ValidationError
+
+from .models import BoardClosure
+
+
+def _parent_links(parent_id):
+    """(ancestor_id, depth) для родителя, включая его самого."""
+    if not parent_id:
+        return []
+    return list(
+        BoardClosure.objects.filter(descendant_id=parent_id).values_list(
+            "ancestor_id", "depth"
+        )
+    )
+
+
+def insert_board_node(board):
+    """Строки замыкания для только что созданной доски."""
+    insert_board_nodes([board])
+
+
+def insert_board_nodes(boards):
+    """То же для пачки досок, созданных bulk_create (сигналы не срабатывают)."""
+    parent_links = {}
+    links = []
+    for board in boards:
+        if board.parent_id not in parent_links:
+            parent_links[board.parent_id] = _parent_links(board.parent_id)
+        links.append(
+            BoardClosure(ancestor_id=board.pk, descendant_id=board.pk, depth=0)
+        )
+        links += [
+            BoardClosure(
+                ancestor_id=ancestor_id, descendant_id=board.pk, depth=depth + 1
+            )
+            for ancestor_id, depth in parent_links[board.parent_id]
+        ]
+    BoardClosure.objects.bulk_create(links)
+
+
+def move_board_node(board):
+    """Переносит поддерево доски под её новый parent."""
+    subtree = list(
+        BoardClosure.objects.filter(ancestor_id=board.pk).values_list(
+            "descendant_id", "depth"
+        )
+    )
+    if not subtree:
+        insert_board_node(board)
+        return
+
+    subtree_ids = [descendant_id for descendant_id, _ in subtree]
+    if board.parent_id in subtree_ids:
+        raise ValidationError({"parent": "Циклическая вложенность досок недопустима."})
+
+    BoardClosure.objects.filter(descendant_id__in=subtree_ids).exclude(
+        ancestor_id__in=subtree_ids
+    ).delete()
+    BoardClosure.objects.bulk_create(
+        BoardClosure(
+            ancestor_id=ancestor_id,
+            descendant_id=descendant_id,
+            depth=ancestor_depth + depth + 1,
+        )
+        for ancestor_id, ancestor_depth in _parent_links(board.parent_id)
+        for descendant_id, depth in subtree
+    )
@@ -0,0 +1,202 @@
+"""
+Хранилище картинок для элементов IMAGE.
+
+Файл адресуется содержимым: images/<sha256[:2]>/<sha256>/orig.<ext> и
+уменьшенные копии <ширина>.webp рядом. Повторная загрузка той же картинки
+(на другую доску, другим пользователем) возвращает уже сохранённую запись,
+копии строятся только для нового содержимого — в пуле процессов,
+как и для аватаров (users/imaging.py).
+
+Элементу можно назначить только картинку, которую пользователь загрузил
+сам или видит на доступной ему доске (usable_image_ids), — иначе по
+последовательным id можно было бы получить чужие картинки.
+
+StoredImage.ref_count поддерживают сохранение элемента (reminders/signals.py),
+BoardItemQuerySet.bulk_create, delete_tracked и Board.delete. Картинки
+без ссылок удаляет команда collect_images — после выдержки, чтобы не
+задеть только что загруженную, но ещё не привязанную картинку.
+"""
+
+import hashlib
+import io
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from users.imaging import render_in_pool
+
+from .models import BoardItem, StoredImage
+
+MAX_IMAGE_SIZE = 10 * 1024 * 1024
+ALLOWED_TYPES = ("image/jpeg", "image/png", "image/gif", "image/webp")
+ORIGINAL_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
+
+# Ширины уменьшенных копий; строятся только те, что меньше оригинала
+VARIANT_WIDTHS = (256, 512, 1024, 2048)
+# Сколько неиспользуемая картинка живёт до удаления
+UNUSED_GRACE = timedelta(days=1)
+
+
+class ImageError(ValueError):
+    pass
+
+
+def _directory(digest):
+    return f"images/{digest[:2]}/{digest}"
+
+
+def usable_image_ids(user, image_ids):
+    """id из image_ids, которые пользователь может поставить на доску."""
+    image_ids = {image_id for image_id in image_ids if image_id is not None}
+    if not image_ids:
+        return set()
+    uploaded = StoredImage.uploaded_by.through.objects.filter(
+        storedimage_id=OuterRef("pk"), customuser_id=user.pk
+    )
+    on_readable_board = BoardItem.objects.filter(
+        image_id=OuterRef("pk"), board__access_entries__user_id=user.pk
+    )
+    return set(
+        StoredImage.objects.filter(id__in=image_ids)
+        .filter(Q(Exists(uploaded)) | Q(Exists(on_readable_board)))
+        .values_list("id", flat=True)
+    )
+
+
+def store_image(upload, user):
+    """
+    Сохраняет загрузку пользователя (или находит такую же)
+    и возвращает StoredImage.
+    """
+    if upload.size > MAX_IMAGE_SIZE:
+        raise ImageError("File size too large. Maximum 10MB allowed.")
+    if upload.content_type not in ALLOWED_TYPES:
+        raise ImageError("Invalid file type. Allowed: JPEG, PNG, GIF, WEBP")
+
+    data = upload.read()
+    digest = hashlib.sha256(data).hexdigest()
+    existing = StoredImage.objects.filter(sha256=digest).first()
+    if existing is not None:
+        existing.uploaded_by.add(user)
+        return existing
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            original_format = image.format
+            width, height = image.size
+        # Копии вписываются по ширине: высоту не ограничиваем
+        specs = [
+            (variant_width, variant_width, max(width, height), False, "webp")
+            for variant_width in VARIANT_WIDTHS
+            if variant_width < width
+        ]
+        width, height, rendered = render_in_pool(
+            settings.IMAGE_POOL_WORKERS, data, specs
+        )
+    except (
+        UnidentifiedImageError,
+        Image.DecompressionBombError,
+        OSError,
+        ValueError,
+    ) as error:
+        raise ImageError("Could not read image") from error
+    if original_format not in ORIGINAL_EXTENSIONS:
+        raise ImageError("Invalid file type. Allowed: JPEG, PNG, GIF, WEBP")
+
+    directory = _directory(digest)
+    original = default_storage.save(
+        f"{directory}/orig.{ORIGINAL_EXTENSIONS[original_format]}", ContentFile(data)
+    )
+    variants = []
+    for (key, _), (variant_width, variant_height, content) in sorted(rendered.items()):
+        name = default_storage.save(f"{directory}/{key}.webp", ContentFile(content))
+        variants.append([variant_width, variant_height, name])
+
+    try:
+        with transaction.atomic():
+            image = StoredImage.objects.create(
+                sha256=digest,
+                original=original,
+                width=width,
+                height=height,
+                variants=variants,
+            )
+    except IntegrityError:
+        # Ту же картинку параллельно загрузил другой запрос
+        _delete_files([original, *(name for _, _, name in variants)])
+        image = StoredImage.objects.get(sha256=digest)
+    image.uploaded_by.add(user)
+    return image
+
+
+def rendered_size(geometry):
+    """Размер элемента на сцене с учётом масштаба Konva (или None)."""
+    if not isinstance(geometry, dict):
+        return None
+    try:
+        width = float(geometry["width"]) * abs(float(geometry.get("scaleX", 1)))
+        height = float(geometry["height"]) * abs(float(geometry.get("scaleY", 1)))
+    except (KeyError, TypeError, ValueError):
+        return None
+    return width, height
+
+
+def image_url(image, geometry=None):
+    """URL самой маленькой копии, которая не меньше элемента на сцене."""
+    size = rendered_size(geometry)
+    if size is not None:
+        for width, height, name in image.variants:
+            if width >= size[0] and height >= size[1]:
+                return default_storage.url(name)
+    return default_storage.url(image.original)
+
+
+def image_files(image):
+    return [image.original, *(name for _, _, name in image.variants)]
+
+
+def _delete_files(names):
+    for name in names:
+        default_storage.delete(name)
+
+
+def collect_unused_images(now=None, dry_run=False):
+    """
+    Пересчитывает ref_count по фактическим ссылкам и удаляет картинки,
+    на которые никто не ссылается дольше UNUSED_GRACE. Возвращает число удалённых.
+    """
+    now = now or timezone.now()
+    drifted = StoredImage.objects.annotate(actual=Count("items")).exclude(
+        ref_count=F("actual")
+    )
+    for image_id, actual in drifted.values_list("id", "actual"):
+        StoredImage.objects.filter(id=image_id).update(ref_count=actual)
+
+    unused = StoredImage.objects.filter(
+        ref_count__lte=0, items__isnull=True, created_at__lt=now - UNUSED_GRACE
+    )
+    removed = 0
+    for image in unused.iterator():
+        if dry_run:
+            removed += 1
+            continue
+        with transaction.atomic():
+            # Между выборкой и удалением на картинку могли сослаться снова
+            locked = (
+                StoredImage.objects.select_for_update(of=("self",))
+                .filter(id=image.id, ref_count__lte=0, items__isnull=True)
+                .first()
+            )
+            if locked is None:
+                continue
+            names = image_files(locked)
+            locked.delete()
+            transaction.on_commit(lambda names=names: _delete_files(names))
+        removed += 1
+    return removed
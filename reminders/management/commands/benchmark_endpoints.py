@@ -0,0 +1,315 @@
+import itertools
+import json
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+import django
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from reminders.management.commands.benchmark_points import synthetic_stroke
+from reminders.models import Board, BoardItem, GroupMember, TaskData, WorkGroup
+from users.models import CustomUser
+
+BATCH_SIZE = 2000
+
+
+class Rollback(Exception):
+    """Откатывает транзакцию с синтетическими данными."""
+
+
+def _int_list(value):
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+def build_items(board, count, rng, assignee):
+    """Элементы доски: стикеры, линии и задачи примерно как на живых досках."""
+    for start in range(0, count, BATCH_SIZE):
+        items, tasks = [], []
+        for index in range(start, min(start + BATCH_SIZE, count)):
+            x, y = (index % 300) * 120, (index // 300) * 120
+            roll = rng.random()
+            if roll < 0.2:
+                item = BoardItem(
+                    board=board,
+                    item_type=BoardItem.ItemType.DRAWING,
+                    geometry={"x": 0, "y": 0, "points": synthetic_stroke(40, rng)},
+                    style={"stroke": "#222222", "strokeWidth": 3},
+                )
+            elif roll < 0.3:
+                item = BoardItem(
+                    board=board,
+                    item_type=BoardItem.ItemType.TASK,
+                    geometry={"x": x, "y": y, "width": 200, "height": 100},
+                    content_payload=f"Задача {index}",
+                )
+                tasks.append(item)
+            else:
+                item = BoardItem(
+                    board=board,
+                    item_type=BoardItem.ItemType.STICKER,
+                    geometry={"x": x, "y": y, "width": 100, "height": 100},
+                    style={"fill": "#fff59d"},
+                    content_payload=f"Стикер {index}",
+                )
+            items.append(item)
+        BoardItem.objects.bulk_create(items)
+        TaskData.objects.bulk_create(
+            TaskData(
+                item=item,
+                assigned_to=assignee,
+                due_date=timezone.now() + timedelta(days=rng.randint(1, 30)),
+            )
+            for item in tasks
+        )
+
+
+def read_body(response):
+    """Тело ответа; потоковый ответ вычитывается целиком (и формируется при этом)."""
+    if not response.streaming:
+        return response.content
+    if response.is_async:
+
+        async def collect():
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        return async_to_sync(collect)()
+    return b"".join(response.streaming_content)
+
+
+def stage_payload(board, shift):
+    """Сцена Konva, в которой каждый элемент сдвинут на shift px."""
+    children = []
+    for item in BoardItem.objects.filter(board=board).iterator():
+        geometry = item.geometry
+        attrs = {
+            "id": str(item.id),
+            "x": geometry.get("x", 0) + shift,
+            "y": geometry.get("y", 0),
+            "width": geometry.get("width"),
+            "height": geometry.get("height"),
+            **item.style,
+        }
+        if geometry.get("points") is not None:
+            attrs["points"] = geometry["points"]
+        children.append({"attrs": attrs, "className": "Group"})
+    return json.dumps({"attrs": {}, "children": [{"children": children}]})
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет горячие эндпоинты на синтетических данных: время, число "
+        "SQL-запросов и пик памяти. Данные создаются в транзакции и "
+        "откатываются, но запускать лучше на отдельной базе"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--items",
+            default="100,10000,100000",
+            help="Размеры досок через запятую",
+        )
+        parser.add_argument(
+            "--depths", default="1,5,10", help="Глубины вложенности через запятую"
+        )
+        parser.add_argument(
+            "--groups", type=int, default=50, help="В скольких группах пользователь"
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Сколько раз повторять запрос"
+        )
+        parser.add_argument("--output", help="Файл для результатов (JSON)")
+        parser.add_argument(
+            "--compare", help="Файл с прошлыми результатами для сравнения"
+        )
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("--repeat должен быть не меньше 1")
+        self.repeat = options["repeat"]
+        self.results = []
+        self.rng = random.Random(0)
+
+        try:
+            with transaction.atomic():
+                self.run_all(
+                    _int_list(options["items"]),
+                    _int_list(options["depths"]),
+                    options["groups"],
+                )
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            cache.clear()
+
+        report = {
+            "created_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "repeat": self.repeat,
+            "results": self.results,
+        }
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Результаты записаны в {options['output']}")
+        if options["compare"]:
+            self.compare(options["compare"])
+
+    # --- данные и сценарии ---
+    def run_all(self, item_counts, depths, group_count):
+        owner = CustomUser.objects.create_user(
+            username="bench-owner", email="bench-owner@example.com"
+        )
+        member = CustomUser.objects.create_user(
+            username="bench-member", email="bench-member@example.com"
+        )
+        self.owner_client = Client(HTTP_HOST="localhost")
+        self.owner_client.force_login(owner)
+        self.member_client = Client(HTTP_HOST="localhost")
+        self.member_client.force_login(member)
+
+        for count in item_counts:
+            board = Board.objects.create(title=f"Бенчмарк {count}", owner=owner)
+            build_items(board, count, self.rng, owner)
+            fixture = {"items": count}
+            self.bench_board(board, fixture)
+            # Чередуем сдвиги, чтобы каждое сохранение меняло все элементы
+            payloads = itertools.cycle(
+                [stage_payload(board, 1), stage_payload(board, 2)]
+            )
+            self.measure(
+                "save_board_api",
+                fixture,
+                lambda: self.owner_client.post(
+                    reverse("save_board_api"),
+                    {"board_id": board.id, "board_data": next(payloads)},
+                    content_type="application/json",
+                    secure=True,
+                ),
+            )
+
+        for depth in depths:
+            parent = Board.objects.create(title="Корень", owner=owner)
+            for level in range(1, depth):
+                parent = Board.objects.create(title=f"Уровень {level}", parent=parent)
+            build_items(parent, min(item_counts or [100]), self.rng, owner)
+            self.bench_board(parent, {"depth": depth})
+
+        for index in range(group_count):
+            group = WorkGroup.objects.create(name=f"Группа {index}")
+            GroupMember.objects.create(group=group, user=member)
+            GroupMember.objects.create(
+                group=group, user=owner, role=GroupMember.Role.ADMIN
+            )
+            Board.objects.create(
+                title=f"Доска группы {index}", owner=owner, group=group
+            )
+        fixture = {"groups": group_count}
+        self.measure(
+            "dashboard_page",
+            fixture,
+            lambda: self.member_client.get(reverse("dashboard_page"), secure=True),
+        )
+        self.measure(
+            "BoardViewSet.list",
+            fixture,
+            lambda: self.member_client.get(reverse("board-list"), secure=True),
+        )
+
+    def bench_board(self, board, fixture):
+        client = self.owner_client
+        self.measure(
+            "board_page",
+            fixture,
+            lambda: client.get(reverse("board_page", args=[board.id]), secure=True),
+        )
+        self.measure(
+            "BoardViewSet.retrieve",
+            fixture,
+            lambda: client.get(reverse("board-detail", args=[board.id]), secure=True),
+        )
+        self.measure(
+            "BoardViewSet.content",
+            fixture,
+            lambda: client.get(
+                reverse("board-content", args=[board.id]) + "?stream=1", secure=True
+            ),
+        )
+
+    # --- замеры ---
+    def measure(self, endpoint, fixture, request):
+        """
+        Первый запрос — с пустым кэшем («холодный»), остальные — повторные.
+        Пик памяти снимается отдельным холодным запросом: tracemalloc
+        замедляет выполнение и исказил бы время.
+        """
+        timings, queries = [], []
+        cache.clear()
+        for _ in range(self.repeat):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = request()
+                body = read_body(response)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+            if response.status_code >= 400:
+                raise CommandError(f"{endpoint} {fixture}: HTTP {response.status_code}")
+
+        cache.clear()
+        tracemalloc.start()
+        try:
+            read_body(request())
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        result = {
+            "endpoint": endpoint,
+            "fixture": fixture,
+            "status": response.status_code,
+            "response_kb": round(len(body) / 1024, 1),
+            "cold_ms": round(timings[0], 2),
+            "warm_ms": round(statistics.median(timings[1:] or timings), 2),
+            "queries_cold": queries[0],
+            "queries_warm": queries[-1],
+            "peak_memory_kb": round(peak / 1024, 1),
+        }
+        self.results.append(result)
+        self.stdout.write(
+            f"{endpoint:<24} {json.dumps(fixture):<18} "
+            f"{result['cold_ms']:>10.1f} мс {result['warm_ms']:>10.1f} мс "
+            f"{result['queries_cold']:>5}/{result['queries_warm']:<5} запросов "
+            f"{result['peak_memory_kb']:>10.0f} КБ"
+        )
+
+    def compare(self, path):
+        with open(path, encoding="utf-8") as previous_file:
+            previous = {
+                (row["endpoint"], json.dumps(row["fixture"], sort_keys=True)): row
+                for row in json.load(previous_file)["results"]
+            }
+        self.stdout.write(f"Сравнение с {path} (теплое время, запросы):")
+        for row in self.results:
+            key = (row["endpoint"], json.dumps(row["fixture"], sort_keys=True))
+            old = previous.get(key)
+            if old is None:
+                continue
+            ratio = row["warm_ms"] / old["warm_ms"] if old["warm_ms"] else 0
+            self.stdout.write(
+                f"{key[0]:<24} {key[1]:<18} x{ratio:.2f} "
+                f"({old['warm_ms']} → {row['warm_ms']} мс), "
+                f"запросов {old['queries_warm']} → {row['queries_warm']}"
+            )
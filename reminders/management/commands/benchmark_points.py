@@ -0,0 +1,87 @@
+import json
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from reminders.models import BoardItem
+from reminders.points import decode_points, encode_points
+
+
+def synthetic_stroke(length, rng):
+    """Штрих кистью: мелкие шаги с дробными координатами, как от Konva."""
+    x, y = rng.uniform(0, 2000), rng.uniform(0, 2000)
+    points = []
+    for _ in range(length):
+        x += rng.uniform(-4, 4)
+        y += rng.uniform(-4, 4)
+        points += [round(x, 2), round(y, 2)]
+    return points
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает хранение точек линий в JSON и в points_blob: "
+        "размер и время декодирования"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--board", type=int, help="Брать линии с этой доски вместо синтетических"
+        )
+        parser.add_argument(
+            "--strokes", type=int, default=200, help="Число синтетических штрихов"
+        )
+        parser.add_argument(
+            "--points", type=int, default=500, help="Точек в синтетическом штрихе"
+        )
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        if options["board"]:
+            strokes = [
+                item.geometry["points"]
+                for item in BoardItem.objects.filter(
+                    board_id=options["board"], points_blob__isnull=False
+                ).iterator()
+            ]
+        else:
+            rng = random.Random(0)
+            strokes = [
+                synthetic_stroke(options["points"], rng)
+                for _ in range(options["strokes"])
+            ]
+        if not strokes:
+            self.stdout.write("Нет линий для замера")
+            return
+
+        as_json = [json.dumps(points) for points in strokes]
+        as_blob = [encode_points(points) for points in strokes]
+        json_bytes = sum(len(data.encode()) for data in as_json)
+        blob_bytes = sum(len(data) for data in as_blob)
+
+        repeat = options["repeat"]
+        json_time = min(
+            timeit.repeat(
+                lambda: [json.loads(data) for data in as_json], number=1, repeat=repeat
+            )
+        )
+        blob_time = min(
+            timeit.repeat(
+                lambda: [decode_points(data) for data in as_blob],
+                number=1,
+                repeat=repeat,
+            )
+        )
+
+        point_count = sum(len(points) // 2 for points in strokes)
+        self.stdout.write(f"Штрихов: {len(strokes)}, точек: {point_count}")
+        self.stdout.write(
+            f"Размер: JSON {json_bytes} Б, points_blob {blob_bytes} Б "
+            f"(в {json_bytes / blob_bytes:.1f} раза меньше)"
+        )
+        self.stdout.write(
+            f"Декодирование: JSON {json_time * 1000:.2f} мс, "
+            f"points_blob {blob_time * 1000:.2f} мс "
+            f"(в {json_time / blob_time:.1f} раза быстрее)"
+        )
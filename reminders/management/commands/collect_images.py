@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from reminders.images import collect_unused_images
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет StoredImage.ref_count со ссылками элементов и удаляет "
+        "картинки, которые давно никем не используются"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Только посчитать, не удалять"
+        )
+
+    def handle(self, *args, **options):
+        removed = collect_unused_images(dry_run=options["dry_run"])
+        self.stdout.write(self.style.SUCCESS(f"Удалено картинок: {removed}"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from reminders.access import rebuild_all_board_access
+from reminders.contacts import rebuild_all_contacts
+from reminders.models import BoardAccess, UserContact
+
+
+class Command(BaseCommand):
+    help = (
+        "Полностью пересчитывает таблицу прав доступа к доскам (BoardAccess) "
+        "и контакты пользователей (UserContact)"
+    )
+
+    def handle(self, *args, **options):
+        rebuild_all_board_access()
+        rebuild_all_contacts()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Готово: {BoardAccess.objects.count()} записей, "
+                f"{UserContact.objects.count()} контактов"
+            )
+        )
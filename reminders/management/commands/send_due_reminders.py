@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from reminders.due_reminders import DueReminderDispatcher
+
+
+class Command(BaseCommand):
+    help = "Рассылает исполнителям напоминания о сроках задач (долгоживущий процесс)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Отправить то, что уже пора, и выйти (для cron и проверки)",
+        )
+        parser.add_argument(
+            "--lead",
+            type=int,
+            default=0,
+            help="За сколько минут до срока напоминать",
+        )
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--sync-interval",
+            type=int,
+            default=30,
+            help="Раз в сколько секунд подгружать изменённые задачи",
+        )
+        parser.add_argument(
+            "--horizon",
+            type=int,
+            default=6,
+            help="На сколько часов вперёд держать сроки в памяти",
+        )
+
+    def handle(self, *args, **options):
+        dispatcher = DueReminderDispatcher(
+            lead=timedelta(minutes=options["lead"]),
+            horizon=timedelta(hours=options["horizon"]),
+            sync_interval=timedelta(seconds=options["sync_interval"]),
+            batch_size=options["batch_size"],
+        )
+        if options["once"]:
+            try:
+                sent = dispatcher.run_once()
+            finally:
+                dispatcher.close()
+            self.stdout.write(self.style.SUCCESS(f"Отправлено напоминаний: {sent}"))
+            return
+
+        self.stdout.write("Рассылка напоминаний запущена")
+        try:
+            dispatcher.run_forever()
+        except KeyboardInterrupt:
+            self.stdout.write("Остановлено")
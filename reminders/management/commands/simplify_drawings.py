@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from reminders.models import Board, BoardItem
+from reminders.simplify import board_stroke_tolerance, simplify_points
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Упрощает уже сохранённые штрихи рисования. По умолчанию — на досках, "
+        "где задан Board.settings['strokeTolerance']"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--board", type=int, action="append", dest="boards")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            help="Допуск в пикселях вместо настройки доски",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Только посчитать, не сохранять"
+        )
+
+    def handle(self, *args, **options):
+        tolerance = options["tolerance"]
+        if tolerance is not None and tolerance <= 0:
+            raise CommandError("--tolerance должен быть больше нуля")
+
+        boards = Board.objects.all()
+        if options["boards"]:
+            boards = boards.filter(id__in=options["boards"])
+
+        total_before = total_after = 0
+        for board in boards.iterator():
+            board_tolerance = tolerance or board_stroke_tolerance(board)
+            if board_tolerance is None:
+                continue
+            before, after = self.simplify_board(
+                board, board_tolerance, options["dry_run"]
+            )
+            total_before += before
+            total_after += after
+            if before != after:
+                self.stdout.write(f"Доска {board.id}: {before} → {after} точек")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Готово: {total_before} → {total_after} точек")
+        )
+
+    def simplify_board(self, board, tolerance, dry_run):
+        before = after = 0
+        batch = []
+        items = BoardItem.objects.filter(
+            board=board, item_type=BoardItem.ItemType.DRAWING
+        )
+        for item in items.iterator(chunk_size=BATCH_SIZE):
+            points = item.geometry.get("points")
+            simplified = simplify_points(points, tolerance)
+            if simplified is points:
+                continue
+            before += len(points) // 2
+            after += len(simplified) // 2
+            if len(simplified) < len(points):
+                item.geometry["points"] = simplified
+                batch.append(item)
+            if len(batch) == BATCH_SIZE:
+                self.save_batch(board, batch, dry_run)
+                batch = []
+        self.save_batch(board, batch, dry_run)
+        return before, after
+
+    def save_batch(self, board, items, dry_run):
+        if dry_run or not items:
+            return
+        with transaction.atomic():
+            BoardItem.stamp_revision(board.id, items)
+            BoardItem.objects.bulk_update(items, ["geometry", "revision"])
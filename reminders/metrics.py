@@ -0,0 +1,465 @@
+"""
+Метрики для Prometheus: задержки, размеры ответов и время БД по имени URL.
+
+MetricsMiddleware копит данные в памяти процесса и раз в
+METRICS_FLUSH_INTERVAL секунд записывает снимок процесса в общий кэш
+(reminders/caching.py) — одна запись на процесс, а не обращение к Redis
+на каждый запрос. Каждый процесс занимает свой слот (ключ-владелец,
+поставленный через add), поэтому воркеры gunicorn (и разные машины)
+не перетирают данные друг друга.
+
+Снимки хранятся без срока, чтобы суммы счётчиков не уменьшались.
+Слот процесса, который не обновлял снимок SLOT_STALE_AFTER секунд,
+reap_slots при сборе метрик переносит в общую сумму завершившихся
+процессов (RETIRED_KEY) и освобождает для повторного использования —
+число слотов не растёт с каждым перезапуском. Если молчавший процесс
+потом оживёт, он увидит, что слот уже не его, и начнёт счёт заново
+в новом слоте (теряются только данные с его последней записи).
+
+К данным запросов добавляются счётчики кэша и очередей (почта
+в users/outbox.py, напоминания о сроках в reminders/due_reminders.py).
+"""
+
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+from users.models import OutboxEmail
+
+from .board_cache import board_payload_cache_stats
+from .caching import cache_stats, shared_cache
+from .models import TaskData
+from .query_budget import activate, install
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм (включительно, как le в Prometheus)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# Наибольший выданный номер слота
+SLOTS_KEY = "metrics:slots"
+# Сумма счётчиков процессов, чьи слоты освобождены
+RETIRED_KEY = "metrics:retired"
+REAP_LOCK_KEY = "metrics:reap-lock"
+SLOT_STALE_AFTER = 60 * 10
+# Запросы, не попавшие ни в один URL, — одной меткой, а не по пути
+UNRESOLVED = "<unresolved>"
+
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_state = {"pid": None, "slot": None, "token": None, "flushed_at": 0.0}
+_views = {}
+_in_flight = 0
+
+
+class DbTimer:
+    """Время и число SQL-запросов одного HTTP-запроса (см. query_budget.activate)."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def add(self, sql, duration):
+        self.count += 1
+        self.duration += duration
+
+
+def _observe(buckets, counts, value):
+    for index, bound in enumerate(buckets):
+        if value <= bound:
+            counts[index] += 1
+            return
+    counts[-1] += 1
+
+
+def _view_stats(view):
+    stats = _views.get(view)
+    if stats is None:
+        stats = _views[view] = {
+            "latency": [0] * (len(LATENCY_BUCKETS) + 1),
+            "latency_sum": 0.0,
+            "size": [0] * (len(SIZE_BUCKETS) + 1),
+            "size_sum": 0,
+            "db_seconds": 0.0,
+            "db_queries": 0,
+            "status": {},
+        }
+    return stats
+
+
+def _reset_after_fork():
+    # Данные родителя (если приложение загружено до fork) не принадлежат воркеру
+    if _state["pid"] != os.getpid():
+        global _in_flight
+        _views.clear()
+        _in_flight = 0
+        _state.update(
+            pid=os.getpid(), slot=None, token=None, flushed_at=time.monotonic()
+        )
+
+
+def request_started():
+    global _in_flight
+    with _lock:
+        _reset_after_fork()
+        _in_flight += 1
+
+
+def request_finished(request, response, duration, db_timer):
+    global _in_flight
+    match = getattr(request, "resolver_match", None)
+    view = match.view_name if match else UNRESOLVED
+    with _lock:
+        _in_flight -= 1
+        stats = _view_stats(view)
+        _observe(LATENCY_BUCKETS, stats["latency"], duration)
+        stats["latency_sum"] += duration
+        if not response.streaming:
+            size = len(response.content)
+            _observe(SIZE_BUCKETS, stats["size"], size)
+            stats["size_sum"] += size
+        stats["db_seconds"] += db_timer.duration
+        stats["db_queries"] += db_timer.count
+        status = f"{response.status_code // 100}xx"
+        stats["status"][status] = stats["status"].get(status, 0) + 1
+    maybe_flush()
+
+
+def request_failed():
+    # Исключение превратится в ответ 500 выше по цепочке; запрос уже не в работе
+    global _in_flight
+    with _lock:
+        _in_flight -= 1
+
+
+def snapshot():
+    with _lock:
+        return {
+            "updated": time.time(),
+            "in_flight": _in_flight,
+            "views": {
+                view: {**stats, "status": dict(stats["status"])}
+                for view, stats in _views.items()
+            },
+            "cache": cache_stats(),
+        }
+
+
+def _slot_key(slot):
+    return f"metrics:slot:{slot}"
+
+
+def _owner_key(slot):
+    return f"metrics:slot:{slot}:owner"
+
+
+def claim_slot(shared):
+    """Свободный слот с наименьшим номером и метка владельца."""
+    token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+    shared.add(SLOTS_KEY, 0, timeout=None)
+    for slot in range(1, shared.get(SLOTS_KEY, 0) + 1):
+        if shared.add(_owner_key(slot), token, timeout=None):
+            return slot, token
+    while True:
+        slot = shared.incr(SLOTS_KEY)
+        if shared.add(_owner_key(slot), token, timeout=None):
+            return slot, token
+
+
+def flush():
+    """Записывает снимок процесса в общий кэш."""
+    with _flush_lock:
+        shared = shared_cache()
+        slot = _state["slot"]
+        if slot is not None and shared.get(_owner_key(slot)) != _state["token"]:
+            # Слот освобождён reap_slots, и записанные счётчики уже в RETIRED_KEY
+            with _lock:
+                _views.clear()
+            slot = None
+        if slot is None:
+            _state["slot"], _state["token"] = claim_slot(shared)
+        shared.set(_slot_key(_state["slot"]), snapshot(), timeout=None)
+        _state["flushed_at"] = time.monotonic()
+
+
+def maybe_flush():
+    interval = getattr(settings, "METRICS_FLUSH_INTERVAL", 10)
+    if time.monotonic() - _state["flushed_at"] < interval:
+        return
+    try:
+        flush()
+    except Exception:
+        # Метрики не должны ронять запрос; попробуем при следующем
+        logger.warning("Could not flush metrics", exc_info=True)
+        _state["flushed_at"] = time.monotonic()
+
+
+def _flush_at_exit():
+    if _views:
+        try:
+            flush()
+        except Exception:
+            # Кэш уже недоступен при остановке — данные процесса теряются
+            pass
+
+
+atexit.register(_flush_at_exit)
+
+
+def _read_slots(shared):
+    """(сумма завершившихся, {слот: снимок}) одним get_many."""
+    slots = range(1, shared.get(SLOTS_KEY, 0) + 1)
+    found = shared.get_many([RETIRED_KEY, *(_slot_key(slot) for slot in slots)])
+    retired = found.get(RETIRED_KEY) or {"views": {}, "cache": {}, "folded": {}}
+    snapshots = {
+        slot: found[_slot_key(slot)] for slot in slots if _slot_key(slot) in found
+    }
+    return retired, snapshots
+
+
+def _retire(retired, snap):
+    retired["views"] = _merge([retired, snap])
+    for key, value in (snap["cache"] or {}).items():
+        if key.endswith(("_hits", "_misses")):
+            retired["cache"][key] = retired["cache"].get(key, 0) + value
+
+
+def reap_slots():
+    """
+    Переносит счётчики молчащих процессов в RETIRED_KEY и освобождает их
+    слоты. Сумма записывается вместе с пометкой folded раньше, чем удаляется
+    снимок, поэтому collect_snapshots между этими шагами не посчитает его
+    дважды.
+    """
+    shared = shared_cache()
+    if not shared.add(REAP_LOCK_KEY, 1, timeout=60):
+        return
+    try:
+        retired, snapshots = _read_slots(shared)
+        stale_before = time.time() - SLOT_STALE_AFTER
+        stale = [
+            slot for slot, snap in snapshots.items() if snap["updated"] < stale_before
+        ]
+        if not stale:
+            return
+        for slot in stale:
+            snap = snapshots[slot]
+            if retired["folded"].get(slot) != snap["updated"]:
+                _retire(retired, snap)
+                retired["folded"][slot] = snap["updated"]
+        shared.set(RETIRED_KEY, retired, timeout=None)
+        shared.delete_many(
+            [_slot_key(slot) for slot in stale] + [_owner_key(slot) for slot in stale]
+        )
+    finally:
+        shared.delete(REAP_LOCK_KEY)
+
+
+def collect_snapshots():
+    """Снимки живых процессов и сумма завершившихся (как снимок без in_flight)."""
+    retired, snapshots = _read_slots(shared_cache())
+    live = [
+        snap
+        for slot, snap in snapshots.items()
+        if retired["folded"].get(slot) != snap["updated"]
+    ]
+    return live, retired
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        install()
+        request_started()
+        started = time.perf_counter()
+        try:
+            with activate(DbTimer()) as db_timer:
+                response = self.get_response(request)
+        except BaseException:
+            request_failed()
+            raise
+        request_finished(request, response, time.perf_counter() - started, db_timer)
+        return response
+
+    async def __acall__(self, request):
+        # Учёт запросов к БД подключается к соединениям потоков при их
+        # создании (query_budget.install_on_connect)
+        request_started()
+        started = time.perf_counter()
+        try:
+            with activate(DbTimer()) as db_timer:
+                response = await self.get_response(request)
+        except BaseException:
+            request_failed()
+            raise
+        request_finished(request, response, time.perf_counter() - started, db_timer)
+        return response
+
+
+def metrics_authorized(request):
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token and constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return True
+    return request.user.is_staff
+
+
+# --- формат Prometheus ---
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return (
+        "{"
+        + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+        + "}"
+    )
+
+
+def _histogram(lines, name, buckets, per_view, count_key, sum_key):
+    lines.append(f"# TYPE {name} histogram")
+    for view, stats in sorted(per_view.items()):
+        cumulative = 0
+        for bound, count in zip(buckets, stats[count_key]):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(view=view, le=bound)} {cumulative}")
+        total = sum(stats[count_key])
+        lines.append(f"{name}_bucket{_labels(view=view, le='+Inf')} {total}")
+        lines.append(f"{name}_sum{_labels(view=view)} {stats[sum_key]}")
+        lines.append(f"{name}_count{_labels(view=view)} {total}")
+
+
+def _merge(snapshots):
+    views = {}
+    for snap in snapshots:
+        for view, stats in snap["views"].items():
+            merged = views.get(view)
+            if merged is None:
+                views[view] = {**stats, "status": dict(stats["status"])}
+                continue
+            for key in ("latency", "size"):
+                merged[key] = [a + b for a, b in zip(merged[key], stats[key])]
+            for key in ("latency_sum", "size_sum", "db_seconds", "db_queries"):
+                merged[key] += stats[key]
+            for status, count in stats["status"].items():
+                merged["status"][status] = merged["status"].get(status, 0) + count
+    return views
+
+
+def queue_stats():
+    now = timezone.now()
+    outbox = dict(OutboxEmail.objects.values_list("status").annotate(count=Count("id")))
+    oldest = OutboxEmail.objects.filter(status=OutboxEmail.Status.PENDING).aggregate(
+        oldest=Min("created_at")
+    )["oldest"]
+    due = TaskData.objects.filter(
+        is_completed=False,
+        due_date__lte=now,
+        due_date__gt=now - timedelta(days=1),
+    ).filter(Q(reminded_for__isnull=True) | ~Q(reminded_for=F("due_date")))
+    return {
+        "outbox": outbox,
+        "outbox_oldest_seconds": (now - oldest).total_seconds() if oldest else 0,
+        "due_reminders": due.count(),
+    }
+
+
+def render_metrics():
+    flush()
+    reap_slots()
+    live, retired = collect_snapshots()
+    fresh_after = time.time() - 2 * getattr(settings, "METRICS_FLUSH_INTERVAL", 10)
+    fresh = [snap for snap in live if snap["updated"] >= fresh_after]
+    snapshots = [retired, *live]
+    views = _merge(snapshots)
+    lines = []
+
+    _histogram(
+        lines,
+        "reminders_http_request_duration_seconds",
+        LATENCY_BUCKETS,
+        views,
+        "latency",
+        "latency_sum",
+    )
+    _histogram(
+        lines,
+        "reminders_http_response_size_bytes",
+        SIZE_BUCKETS,
+        views,
+        "size",
+        "size_sum",
+    )
+    lines.append("# TYPE reminders_http_responses_total counter")
+    for view, stats in sorted(views.items()):
+        for status, count in sorted(stats["status"].items()):
+            lines.append(
+                f"reminders_http_responses_total{_labels(view=view, status=status)} {count}"
+            )
+    for name, key in (
+        ("reminders_http_db_seconds_total", "db_seconds"),
+        ("reminders_http_db_queries_total", "db_queries"),
+    ):
+        lines.append(f"# TYPE {name} counter")
+        for view, stats in sorted(views.items()):
+            lines.append(f"{name}{_labels(view=view)} {stats[key]}")
+    lines.append("# TYPE reminders_http_requests_in_flight gauge")
+    lines.append(
+        f"reminders_http_requests_in_flight {sum(snap['in_flight'] for snap in fresh)}"
+    )
+    lines.append("# TYPE reminders_metrics_processes gauge")
+    lines.append(f"reminders_metrics_processes {len(fresh)}")
+
+    lines.append("# TYPE reminders_cache_requests_total counter")
+    for tier in ("local", "shared"):
+        for result, suffix in (("hit", "hits"), ("miss", "misses")):
+            total = sum(
+                (snap["cache"] or {}).get(f"{tier}_{suffix}", 0) for snap in snapshots
+            )
+            lines.append(
+                f"reminders_cache_requests_total{_labels(tier=tier, result=result)} {total}"
+            )
+    payload = board_payload_cache_stats()
+    lines.append("# TYPE reminders_board_payload_cache_total counter")
+    for result in ("hits", "misses"):
+        lines.append(
+            f"reminders_board_payload_cache_total{_labels(result=result)} {payload[result]}"
+        )
+
+    queues = queue_stats()
+    lines.append("# TYPE reminders_outbox_emails gauge")
+    for status in OutboxEmail.Status.values:
+        lines.append(
+            f"reminders_outbox_emails{_labels(status=status)} {queues['outbox'].get(status, 0)}"
+        )
+    lines.append("# TYPE reminders_outbox_oldest_pending_seconds gauge")
+    lines.append(
+        f"reminders_outbox_oldest_pending_seconds {queues['outbox_oldest_seconds']}"
+    )
+    lines.append("# TYPE reminders_due_reminders_pending gauge")
+    lines.append(f"reminders_due_reminders_pending {queues['due_reminders']}")
+    return "\n".join(lines) + "\n"
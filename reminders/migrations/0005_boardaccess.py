@@ -0,0 +1,81 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+VIEWER, EDITOR, OWNER = 1, 2, 3
+
+
+def fill_board_access(apps, schema_editor):
+    """Первичное заполнение BoardAccess по текущим владельцам, группам и соавторам."""
+    Board = apps.get_model("reminders", "Board")
+    BoardAccess = apps.get_model("reminders", "BoardAccess")
+    BoardCollaborator = apps.get_model("reminders", "BoardCollaborator")
+    GroupMember = apps.get_model("reminders", "GroupMember")
+
+    boards = {
+        row[0]: row
+        for row in Board.objects.values_list("id", "parent_id", "owner_id", "group_id")
+    }
+    group_levels = {}
+    for group_id, user_id, role in GroupMember.objects.values_list(
+        "group_id", "user_id", "role"
+    ):
+        level = VIEWER if role == "viewer" else EDITOR
+        levels = group_levels.setdefault(group_id, {})
+        levels[user_id] = max(levels.get(user_id, 0), level)
+    own_levels = {}
+    for board_id, user_id, access_level in BoardCollaborator.objects.filter(
+        status="accepted"
+    ).values_list("board_id", "user_id", "access_level"):
+        level = EDITOR if access_level == "editor" else VIEWER
+        levels = own_levels.setdefault(board_id, {})
+        levels[user_id] = max(levels.get(user_id, 0), level)
+
+    resolved = {}
+    for board_id in boards:
+        chain, current = [], board_id
+        while current in boards and current not in resolved and current not in chain:
+            chain.append(current)
+            current = boards[current][1]
+        base = resolved.get(current, {})
+        for chain_id in reversed(chain):
+            _, _, owner_id, group_id = boards[chain_id]
+            levels = {user_id: min(level, EDITOR) for user_id, level in base.items()}
+            for source in (group_levels.get(group_id, {}), own_levels.get(chain_id, {})):
+                for user_id, level in source.items():
+                    levels[user_id] = max(levels.get(user_id, 0), level)
+            if owner_id:
+                levels[owner_id] = OWNER
+            resolved[chain_id] = base = levels
+
+    BoardAccess.objects.bulk_create(
+        BoardAccess(board_id=board_id, user_id=user_id, level=level)
+        for board_id, levels in resolved.items()
+        for user_id, level in levels.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reminders', '0004_board_parent_and_nested_board'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoardAccess',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveSmallIntegerField(choices=[(1, 'Читатель'), (2, 'Редактор'), (3, 'Владелец')])),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='access_entries', to='reminders.board')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='board_access', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'board')},
+            },
+        ),
+        migrations.RunPython(fill_board_access, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_board_closure(apps, schema_editor):
+    """Строит таблицу замыкания по существующим ссылкам parent."""
+    Board = apps.get_model("reminders", "Board")
+    BoardClosure = apps.get_model("reminders", "BoardClosure")
+
+    parents = dict(Board.objects.values_list("id", "parent_id"))
+    links = []
+    for board_id in parents:
+        current, depth, seen = board_id, 0, set()
+        while current is not None and current not in seen:
+            seen.add(current)
+            links.append(
+                BoardClosure(ancestor_id=current, descendant_id=board_id, depth=depth)
+            )
+            current, depth = parents.get(current), depth + 1
+    BoardClosure.objects.bulk_create(links, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reminders', '0005_boardaccess'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoardClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='reminders.board')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='reminders.board')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='reminders_b_descend_c9f907_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(fill_board_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_linked_board(apps, schema_editor):
+    """Переносит id дочерней доски из content_payload во внешний ключ."""
+    Board = apps.get_model("reminders", "Board")
+    BoardItem = apps.get_model("reminders", "BoardItem")
+
+    items = list(
+        BoardItem.objects.filter(item_type="nested_board").only("id", "content_payload")
+    )
+    candidate_ids = {
+        int(item.content_payload)
+        for item in items
+        if (item.content_payload or "").strip().isdigit()
+    }
+    existing_ids = set(
+        Board.objects.filter(id__in=candidate_ids).values_list("id", flat=True)
+    )
+    to_update = []
+    for item in items:
+        payload = (item.content_payload or "").strip()
+        if payload.isdigit() and int(payload) in existing_ids:
+            item.linked_board_id = int(payload)
+            to_update.append(item)
+    BoardItem.objects.bulk_update(to_update, ["linked_board"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reminders', '0006_boardclosure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='boarditem',
+            name='linked_board',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='linked_items', to='reminders.board'),
+        ),
+        migrations.RunPython(fill_linked_board, migrations.RunPython.noop),
+    ]
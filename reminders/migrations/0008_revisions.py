@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reminders', '0007_boarditem_linked_board'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedBoardItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_id', models.BigIntegerField()),
+                ('revision', models.PositiveBigIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='board',
+            name='revision',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='boarditem',
+            name='revision',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='boarditem',
+            index=models.Index(fields=['board', 'revision'], name='reminders_b_board_i_4bd3cd_idx'),
+        ),
+        migrations.AddField(
+            model_name='deletedboarditem',
+            name='board',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deleted_items', to='reminders.board'),
+        ),
+        migrations.AddIndex(
+            model_name='deletedboarditem',
+            index=models.Index(fields=['board', 'revision'], name='reminders_d_board_i_34feb1_idx'),
+        ),
+    ]
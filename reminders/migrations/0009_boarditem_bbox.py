@@ -0,0 +1,70 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:15
+
+from django.db import migrations, models
+
+from reminders.geometry import item_bbox
+
+BBOX_FIELDS = ["bbox_min_x", "bbox_min_y", "bbox_max_x", "bbox_max_y"]
+
+
+def fill_bbox(apps, schema_editor):
+    """Считает bbox для уже существующих элементов."""
+    BoardItem = apps.get_model("reminders", "BoardItem")
+
+    batch = []
+    for item in BoardItem.objects.only("id", "geometry").iterator(chunk_size=1000):
+        bbox = item_bbox(item.geometry)
+        if bbox is None:
+            continue
+        for field, value in zip(BBOX_FIELDS, bbox):
+            setattr(item, field, value)
+        batch.append(item)
+        if len(batch) == 1000:
+            BoardItem.objects.bulk_update(batch, BBOX_FIELDS)
+            batch = []
+    BoardItem.objects.bulk_update(batch, BBOX_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reminders", "0008_revisions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="boarditem",
+            name="bbox_max_x",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="boarditem",
+            name="bbox_max_y",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="boarditem",
+            name="bbox_min_x",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="boarditem",
+            name="bbox_min_y",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="boarditem",
+            index=models.Index(
+                fields=["board", "bbox_min_x", "bbox_max_x"],
+                name="reminders_b_board_i_6c282e_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="boarditem",
+            index=models.Index(
+                fields=["board", "bbox_min_y", "bbox_max_y"],
+                name="reminders_b_board_i_066058_idx",
+            ),
+        ),
+        migrations.RunPython(fill_bbox, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:17
+
+from django.db import migrations, models
+
+from reminders.points import decode_points, encode_points
+
+
+def pack_points(apps, schema_editor):
+    """Переносит geometry["points"] существующих линий в points_blob."""
+    BoardItem = apps.get_model("reminders", "BoardItem")
+
+    batch = []
+    items = BoardItem.objects.filter(geometry__has_key="points").only("id", "geometry")
+    for item in items.iterator(chunk_size=1000):
+        blob = encode_points(item.geometry.get("points"))
+        if blob is None:
+            continue
+        item.points_blob = blob
+        del item.geometry["points"]
+        batch.append(item)
+        if len(batch) == 1000:
+            BoardItem.objects.bulk_update(batch, ["geometry", "points_blob"])
+            batch = []
+    BoardItem.objects.bulk_update(batch, ["geometry", "points_blob"])
+
+
+def unpack_points(apps, schema_editor):
+    BoardItem = apps.get_model("reminders", "BoardItem")
+
+    batch = []
+    items = BoardItem.objects.filter(points_blob__isnull=False).only(
+        "id", "geometry", "points_blob"
+    )
+    for item in items.iterator(chunk_size=1000):
+        item.geometry["points"] = decode_points(item.points_blob)
+        item.points_blob = None
+        batch.append(item)
+        if len(batch) == 1000:
+            BoardItem.objects.bulk_update(batch, ["geometry", "points_blob"])
+            batch = []
+    BoardItem.objects.bulk_update(batch, ["geometry", "points_blob"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reminders", "0009_boarditem_bbox"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="boarditem",
+            name="points_blob",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.RunPython(pack_points, unpack_points),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reminders", "0010_boarditem_points_blob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="taskdata",
+            name="reminded_for",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="taskdata",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+    ]
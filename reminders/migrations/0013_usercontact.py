@@ -0,0 +1,117 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+SEARCH_FIELDS = ("username", "email", "first_name", "last_name")
+
+
+def fill_contacts(apps, schema_editor):
+    """Первичное заполнение UserContact по общим доскам и группам."""
+    BoardAccess = apps.get_model("reminders", "BoardAccess")
+    GroupMember = apps.get_model("reminders", "GroupMember")
+    UserContact = apps.get_model("reminders", "UserContact")
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+
+    weights = {}
+    shared = [
+        BoardAccess.objects.values_list(
+            "user_id", "board__access_entries__user_id"
+        ).annotate(count=Count("id")),
+        GroupMember.objects.values_list("user_id", "group__members__user_id").annotate(
+            count=Count("id")
+        ),
+    ]
+    for rows in shared:
+        for user_id, contact_id, count in rows:
+            if user_id != contact_id:
+                key = (user_id, contact_id)
+                weights[key] = weights.get(key, 0) + count
+
+    search_texts = {
+        row[0]: " ".join(value for value in row[1:] if value).lower()
+        for row in User.objects.values_list("id", *SEARCH_FIELDS)
+    }
+    UserContact.objects.bulk_create(
+        (
+            UserContact(
+                user_id=user_id,
+                contact_id=contact_id,
+                weight=weight,
+                search_text=search_texts[contact_id],
+            )
+            for (user_id, contact_id), weight in weights.items()
+        ),
+        batch_size=2000,
+    )
+
+
+def create_trigram_index(apps, schema_editor):
+    # Поиск по подстроке (LIKE '%...%') использует только триграммный индекс
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            "CREATE INDEX reminders_usercontact_search_trgm "
+            "ON reminders_usercontact USING gin (search_text gin_trgm_ops)"
+        )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS reminders_usercontact_search_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reminders", "0012_stored_images"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserContact",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("weight", models.PositiveIntegerField(default=0)),
+                ("search_text", models.CharField(blank=True, max_length=600)),
+                (
+                    "contact",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="contacts",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["user", "-weight"],
+                        name="reminders_u_user_id_a2fad6_idx",
+                    )
+                ],
+                "unique_together": {("user", "contact")},
+            },
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+        migrations.RunPython(fill_contacts, migrations.RunPython.noop),
+    ]
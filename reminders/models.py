@@ -1,6 +1,15 @@
 import uuid
+from contextlib import contextmanager
+
 from django.conf import settings
-from django.db import models
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.utils import timezone
+
+from .caching import versioned_key
+from .geometry import item_bbox
+from .points import decode_points, encode_points
 from users.views import CustomUser
 
 
@@ -33,6 +42,10 @@ class GroupMember(models.Model):
         unique_together = ("group", "user")  # Один юзер не может быть в группе дважды
 
 
+# Сколько живёт закэшированный уровень доступа
+ACL_TIMEOUT = 60 * 10
+
+
 # --- 3. ОБНОВЛЕННАЯ ДОСКА ---
 class Board(models.Model):
     title = models.CharField(max_length=200)
@@ -58,78 +71,164 @@ class Board(models.Model):
         blank=True,
     )
     settings = models.JSONField(default=dict, blank=True)
+    # Растёт при каждом изменении элементов или настроек доски
+    revision = models.PositiveBigIntegerField(default=0)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    # --- ПРОВЕРКА ПРАВ  ---
-    def user_can_read(self, user):
-        """Может ли пользователь смотреть доску?"""
-        if not user.is_authenticated:
-            return False
-        if self.parent_id and self.parent.user_can_read(user):
-            return True
-        if self.owner == user:
-            return True
+    # Поля, от которых зависят материализованные права (reminders/access.py)
+    # и таблица замыкания дерева досок (reminders/hierarchy.py)
+    ACCESS_FIELDS = ("owner_id", "parent_id", "group_id")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._access_state = self.get_access_state()
+        # Название показывается на плитке в родительской доске
+        self._loaded_title = self.__dict__.get("title")
 
-        if self.group and self.group.members.filter(user=user).exists():
-            return True
+    def get_access_state(self):
+        """Текущие значения ACCESS_FIELDS (отложенные поля не подгружаются)."""
+        return {field: self.__dict__.get(field) for field in self.ACCESS_FIELDS}
 
-        if self.collaborators.filter(
-            user=user, status=BoardCollaborator.Status.ACCEPTED
-        ).exists():
-            return True
+    # --- ПРОВЕРКА ПРАВ  ---
+    def get_access_level(self, user):
+        """Итоговый уровень доступа пользователя (BoardAccess.Level) или None."""
+        if not user.is_authenticated or self.pk is None:
+            return None
+        # Версию "acl" пользователя меняют rebuild_board_access
+        # и revoke_board_access; 0 в кэше — «доступа нет»
+        key = versioned_key("acl", user.pk, self.pk)
+        level = cache.get(key)
+        if level is None:
+            level = (
+                BoardAccess.objects.filter(board_id=self.pk, user_id=user.pk)
+                .values_list("level", flat=True)
+                .first()
+            ) or 0
+            cache.set(key, level, ACL_TIMEOUT)
+        return level or None
 
-        return False
+    def user_can_read(self, user):
+        """Может ли пользователь смотреть доску?"""
+        return self.get_access_level(user) is not None
 
     def user_can_edit(self, user):
         """Может ли пользователь изменять доску?"""
-        if not user.is_authenticated:
-            return False
-        if self.parent_id and self.parent.user_can_edit(user):
-            return True
-        if self.owner == user:
-            return True
-
-        if self.group:
-            member = self.group.members.filter(user=user).first()
-            if member and member.role in [
-                GroupMember.Role.ADMIN,
-                GroupMember.Role.EDITOR,
-            ]:
-                return True
-
-        collab = self.collaborators.filter(
-            user=user, status=BoardCollaborator.Status.ACCEPTED
-        ).first()
-        if collab and collab.access_level == BoardCollaborator.AccessLevel.EDITOR:
-            return True
-
-        return False
+        level = self.get_access_level(user)
+        return level is not None and level >= BoardAccess.Level.EDITOR
+
+    def save(self, *args, **kwargs):
+        # revision меняется только через next_revision(), иначе сохранение
+        # устаревшего экземпляра откатило бы её назад
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name != "revision"
+                and field.attname not in deferred
+            ]
+        # Таблица замыкания и права обновляются сигналами в той же транзакции
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    @classmethod
+    def next_revision(cls, board_id):
+        """Атомарно увеличивает ревизию доски и возвращает новое значение."""
+        with transaction.atomic():
+            cls.objects.filter(pk=board_id).update(revision=models.F("revision") + 1)
+            return (
+                cls.objects.filter(pk=board_id).values_list("revision", flat=True).get()
+            )
+
+    def bump_revision(self):
+        self.revision = Board.next_revision(self.pk)
+        return self.revision
+
+    def delete(self, *args, **kwargs):
+        """Удаляет доску вместе со всем поддеревом одним пакетом."""
+        with transaction.atomic():
+            if self.parent_id:
+                # Плитка этой доски в родителе меняет вид
+                Board.next_revision(self.parent_id)
+            subtree_ids = list(
+                BoardClosure.objects.filter(ancestor_id=self.pk).values_list(
+                    "descendant_id", flat=True
+                )
+            )
+            StoredImage.adjust_refs(
+                BoardItem.objects.filter(
+                    board_id__in=subtree_ids or [self.pk], image__isnull=False
+                ).values_list("image_id", flat=True),
+                -1,
+            )
+            if not subtree_ids:
+                return super().delete(*args, **kwargs)
+            return Board.objects.filter(id__in=subtree_ids).delete()
 
     def get_ancestors(self):
         """Цепочка от корня до текущей доски (включая себя)."""
-        chain = []
-        current = self
-        seen = set()
-        while current and current.pk not in seen:
-            seen.add(current.pk)
-            chain.insert(0, current)
-            current = current.parent
-        return chain
+        if self.pk is None:
+            return [self]
+        return list(
+            Board.objects.filter(descendant_links__descendant_id=self.pk).order_by(
+                "-descendant_links__depth"
+            )
+        )
+
+    def get_descendants(self, include_self=False):
+        """Все вложенные доски любой глубины."""
+        queryset = Board.objects.filter(ancestor_links__ancestor_id=self.pk)
+        if not include_self:
+            queryset = queryset.filter(ancestor_links__depth__gt=0)
+        return queryset
+
+    def get_depth(self):
+        """Глубина вложенности: 0 для корневой доски."""
+        return (
+            BoardClosure.objects.filter(descendant_id=self.pk).aggregate(
+                depth=models.Max("depth")
+            )["depth"]
+            or 0
+        )
 
     def clean(self):
-        from django.core.exceptions import ValidationError
-
         if not self.parent_id:
             return
         if self.pk and self.parent_id == self.pk:
-            raise ValidationError({"parent": "Доска не может быть родителем самой себе."})
-        ancestor = self.parent
-        while ancestor:
-            if self.pk and ancestor.pk == self.pk:
-                raise ValidationError({"parent": "Циклическая вложенность досок недопустима."})
-            ancestor = ancestor.parent
+            raise ValidationError(
+                {"parent": "Доска не может быть родителем самой себе."}
+            )
+        if (
+            self.pk
+            and BoardClosure.objects.filter(
+                ancestor_id=self.pk, descendant_id=self.parent_id
+            ).exists()
+        ):
+            raise ValidationError(
+                {"parent": "Циклическая вложенность досок недопустима."}
+            )
+
+
+class BoardClosure(models.Model):
+    """
+    Таблица замыкания дерева досок: по строке на каждую пару (предок, потомок),
+    включая саму доску с depth=0. Поддерживается сигналами, см. reminders/hierarchy.py.
+    """
+
+    ancestor = models.ForeignKey(
+        Board, on_delete=models.CASCADE, related_name="descendant_links"
+    )
+    descendant = models.ForeignKey(
+        Board, on_delete=models.CASCADE, related_name="ancestor_links"
+    )
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ("ancestor", "descendant")
+        indexes = [models.Index(fields=["descendant", "depth"])]
 
 
 # --- 4. ПРЯМОЙ ДОСТУП К ЛИЧНЫМ ДОСКАМ (ШАРИНГ) ---
@@ -160,6 +259,172 @@ class BoardCollaborator(models.Model):
         unique_together = ("board", "user")
 
 
+# --- 5. ИТОГОВЫЕ ПРАВА НА ДОСКИ (ДЕНОРМАЛИЗАЦИЯ) ---
+class BoardAccess(models.Model):
+    """
+    Итоговый уровень доступа пользователя к доске с учётом владельца, группы,
+    соавторов и наследования от родительских досок.
+    Таблица пересчитывается сигналами, напрямую её не редактируем.
+    """
+
+    class Level(models.IntegerChoices):
+        VIEWER = 1, "Читатель"
+        EDITOR = 2, "Редактор"
+        OWNER = 3, "Владелец"
+
+    board = models.ForeignKey(
+        Board, on_delete=models.CASCADE, related_name="access_entries"
+    )
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name="board_access"
+    )
+    level = models.PositiveSmallIntegerField(choices=Level.choices)
+
+    class Meta:
+        unique_together = ("user", "board")
+
+
+# --- 5.1. КОНТАКТЫ ДЛЯ ПОИСКА ПРИ ПРИГЛАШЕНИИ (ДЕНОРМАЛИЗАЦИЯ) ---
+class UserContact(models.Model):
+    """
+    Пользователь contact знаком пользователю user: у них есть общие доски
+    или группы. Таблица поддерживается reminders/contacts.py, напрямую её
+    не редактируем.
+    """
+
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name="contacts"
+    )
+    contact = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="+")
+    # Число общих досок и групп: чем больше, тем выше контакт в выдаче
+    weight = models.PositiveIntegerField(default=0)
+    # username, email и имя контакта в нижнем регистре для поиска по подстроке
+    search_text = models.CharField(max_length=600, blank=True)
+
+    class Meta:
+        unique_together = ("user", "contact")
+        indexes = [models.Index(fields=["user", "-weight"])]
+
+
+# --- 6. КАРТИНКИ ЭЛЕМЕНТОВ IMAGE ---
+class StoredImage(models.Model):
+    """
+    Загруженная картинка, по одной записи на содержимое (sha256): одну и ту же
+    картинку на многих досках храним один раз. Файлы и уменьшенные копии —
+    в MEDIA_ROOT/images/, см. reminders/images.py.
+    """
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    original = models.CharField(max_length=255)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    # Уменьшенные копии [[ширина, высота, имя файла], ...] по возрастанию
+    variants = models.JSONField(default=list, blank=True)
+    # Число элементов, ссылающихся на картинку; ноль — кандидат на удаление
+    ref_count = models.IntegerField(default=0, db_index=True)
+    # Кто загружал картинку: ставить её на доску может только загрузивший
+    # или тот, кто видит её на одной из доступных досок (images.usable_image_ids)
+    uploaded_by = models.ManyToManyField(CustomUser, related_name="+", blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256[:12]
+
+    @staticmethod
+    def adjust_refs(image_ids, delta):
+        """Меняет ref_count на delta для каждого вхождения id в image_ids."""
+        counts = {}
+        for image_id in image_ids:
+            if image_id is not None:
+                counts[image_id] = counts.get(image_id, 0) + 1
+        by_count = {}
+        for image_id, count in counts.items():
+            by_count.setdefault(count, []).append(image_id)
+        for count, ids in by_count.items():
+            StoredImage.objects.filter(id__in=ids).update(
+                ref_count=models.F("ref_count") + delta * count
+            )
+
+
+@contextmanager
+def stored_geometry(items):
+    """
+    На время записи в БД считает bbox и переносит geometry["points"]
+    в points_blob (reminders/points.py). В памяти geometry остаётся полной.
+    """
+    originals = []
+    for item in items:
+        item.update_bbox()
+        geometry = item.geometry
+        points = geometry.get("points") if isinstance(geometry, dict) else None
+        item.points_blob = encode_points(points)
+        if item.points_blob is not None:
+            item.geometry = {k: v for k, v in geometry.items() if k != "points"}
+        originals.append((item, geometry))
+    try:
+        yield
+    finally:
+        for item, geometry in originals:
+            item.geometry = geometry
+
+
+class BoardItemQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(), stored_geometry(objs):
+            created = super().bulk_create(objs, *args, **kwargs)
+            StoredImage.adjust_refs([obj.image_id for obj in objs], +1)
+        for obj in objs:
+            obj._loaded_image_id = obj.image_id
+        return created
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        if "geometry" not in fields:
+            return super().bulk_update(objs, fields, *args, **kwargs)
+        objs = list(objs)
+        fields = [*fields, *BoardItem.DERIVED_GEOMETRY_FIELDS]
+        with stored_geometry(objs):
+            return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def in_viewport(self, min_x, min_y, max_x, max_y):
+        """Элементы, bbox которых пересекает область (и элементы без bbox)."""
+        return self.filter(
+            models.Q(
+                bbox_min_x__lte=max_x,
+                bbox_max_x__gte=min_x,
+                bbox_min_y__lte=max_y,
+                bbox_max_y__gte=min_y,
+            )
+            | models.Q(bbox_min_x__isnull=True)
+        )
+
+    def delete_tracked(self):
+        """
+        Удаляет элементы, оставляя DeletedBoardItem, чтобы клиенты узнали
+        об удалении из выборки изменений с ревизии N.
+        """
+        with transaction.atomic():
+            ids_by_board = {}
+            image_ids = []
+            for item_id, board_id, image_id in self.values_list(
+                "id", "board_id", "image_id"
+            ):
+                ids_by_board.setdefault(board_id, []).append(item_id)
+                image_ids.append(image_id)
+            StoredImage.adjust_refs(image_ids, -1)
+            for board_id, item_ids in ids_by_board.items():
+                revision = Board.next_revision(board_id)
+                DeletedBoardItem.objects.bulk_create(
+                    DeletedBoardItem(
+                        board_id=board_id, item_id=item_id, revision=revision
+                    )
+                    for item_id in item_ids
+                )
+            return BoardItem.objects.filter(
+                id__in=[i for ids in ids_by_board.values() for i in ids]
+            ).delete()
+
+
 class BoardItem(models.Model):
 
     class ItemType(models.TextChoices):
@@ -180,15 +445,126 @@ class BoardItem(models.Model):
 
     content_payload = models.TextField(blank=True, null=True)
 
+    # Для NESTED_BOARD: доска, на которую ведёт плитка
+    linked_board = models.ForeignKey(
+        Board,
+        on_delete=models.SET_NULL,
+        related_name="linked_items",
+        null=True,
+        blank=True,
+    )
+
+    # Для IMAGE: картинка в общем хранилище (reminders/images.py)
+    image = models.ForeignKey(
+        StoredImage,
+        on_delete=models.PROTECT,
+        related_name="items",
+        null=True,
+        blank=True,
+    )
+
+    # Ревизия доски, на которой элемент менялся последний раз
+    revision = models.PositiveBigIntegerField(default=0)
+
+    # geometry["points"] в упакованном виде; в geometry при этом их нет
+    points_blob = models.BinaryField(null=True, blank=True)
+
+    # Ограничивающий прямоугольник geometry для запросов по видимой области
+    bbox_min_x = models.FloatField(null=True, blank=True)
+    bbox_min_y = models.FloatField(null=True, blank=True)
+    bbox_max_x = models.FloatField(null=True, blank=True)
+    bbox_max_y = models.FloatField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = BoardItemQuerySet.as_manager()
+
+    BBOX_FIELDS = ("bbox_min_x", "bbox_min_y", "bbox_max_x", "bbox_max_y")
+    # Колонки, которые пересчитываются из geometry при каждой её записи
+    DERIVED_GEOMETRY_FIELDS = ("points_blob", *BBOX_FIELDS)
+
     class Meta:
-        indexes = [models.Index(fields=["board"])]
+        indexes = [
+            models.Index(fields=["board"]),
+            models.Index(fields=["board", "revision"]),
+            models.Index(fields=["board", "bbox_min_x", "bbox_max_x"]),
+            models.Index(fields=["board", "bbox_min_y", "bbox_max_y"]),
+        ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # По прежней картинке уменьшается ref_count (сигнал в reminders/signals.py)
+        self._loaded_image_id = self.__dict__.get("image_id")
 
     def __str__(self):
         return f"{self.item_type} ({self.id})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        blob = instance.__dict__.get("points_blob")
+        geometry = instance.__dict__.get("geometry")
+        if blob is not None and isinstance(geometry, dict):
+            geometry["points"] = decode_points(blob)
+        return instance
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        writes_geometry = update_fields is None or "geometry" in update_fields
+        if update_fields is not None:
+            update_fields = {*update_fields, "revision"}
+            if writes_geometry:
+                update_fields.update(self.DERIVED_GEOMETRY_FIELDS)
+            kwargs["update_fields"] = update_fields
+        with transaction.atomic(), stored_geometry([self] if writes_geometry else []):
+            self.revision = Board.next_revision(self.board_id)
+            super().save(*args, **kwargs)
+
+    def update_bbox(self):
+        """Пересчитывает bbox из geometry."""
+        bbox = item_bbox(self.geometry) or (None,) * 4
+        for field, value in zip(self.BBOX_FIELDS, bbox):
+            setattr(self, field, value)
+
+    def delete(self, *args, **kwargs):
+        return BoardItem.objects.filter(pk=self.pk).delete_tracked()
+
+    @staticmethod
+    def stamp_revision(board_id, items):
+        """Проставляет новую ревизию доски пачке элементов перед bulk_update."""
+        revision = Board.next_revision(board_id)
+        for item in items:
+            item.revision = revision
+        return revision
+
+
+class DeletedBoardItem(models.Model):
+    """Надгробие удалённого элемента для синхронизации «изменения с ревизии N»."""
+
+    board = models.ForeignKey(
+        Board, on_delete=models.CASCADE, related_name="deleted_items"
+    )
+    item_id = models.BigIntegerField()
+    revision = models.PositiveBigIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=["board", "revision"])]
+
+
+class TaskDataQuerySet(models.QuerySet):
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        # auto_now не срабатывает при bulk_update, а по updated_at
+        # рассылка напоминаний находит изменённые задачи
+        objs = list(objs)
+        now = timezone.now()
+        for obj in objs:
+            obj.updated_at = now
+        fields = list(fields)
+        if "updated_at" not in fields:
+            fields.append("updated_at")
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
 
 class TaskData(models.Model):
     item = models.OneToOneField(
@@ -209,7 +585,50 @@ class TaskData(models.Model):
 
     description = models.TextField(blank=True)
 
+    # Срок, о котором исполнителю уже напомнили (reminders/due_reminders.py);
+    # если срок перенесли, напоминание придёт снова
+    reminded_for = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = TaskDataQuerySet.as_manager()
+
     class Meta:
         indexes = [
             models.Index(fields=["assigned_to", "is_completed"]),
         ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Прежний исполнитель тоже должен увидеть, что задача ушла (dashboard.py)
+        self._loaded_assigned_to_id = self.__dict__.get("assigned_to_id")
+
+
+# --- 7. ПРОФИЛИ МЕДЛЕННЫХ ЗАПРОСОВ ---
+class RequestProfile(models.Model):
+    """
+    Профиль cProfile одного запроса (reminders/profiling.py). Файл — дамп
+    pstats (.prof), открывается в snakeviz или python -m pstats.
+    """
+
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    view_name = models.CharField(max_length=200, blank=True, db_index=True)
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField(default=0)
+    db_ms = models.FloatField(default=0)
+    # Снят по PROFILE_SAMPLE_RATE, а не по запросу сотрудника
+    sampled = models.BooleanField(default=False)
+    # Верх таблицы pstats по cumulative, чтобы не скачивать файл ради беглого взгляда
+    summary = models.TextField(blank=True)
+    profile = models.FileField(upload_to="profiles/")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
@@ -0,0 +1,154 @@
+"""
+Пакетное применение типизированных операций к элементам доски.
+
+Вместо полного JSON сцены Konva клиент присылает только изменения
+(переместить, перекрасить, поменять текст, отметить задачу, удалить),
+а сервер загружает и обновляет только затронутые элементы.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from .dashboard import invalidate_task_assignees
+from .models import Board, BoardItem, TaskData
+
+MOVE = "move"
+RESTYLE = "restyle"
+EDIT_TEXT = "edit_text"
+TOGGLE_TASK = "toggle_task"
+DELETE = "delete"
+
+OPERATION_TYPES = (MOVE, RESTYLE, EDIT_TEXT, TOGGLE_TASK, DELETE)
+
+# Ключи, которые save_board_api кладёт в geometry
+GEOMETRY_KEYS = (
+    "x",
+    "y",
+    "rotation",
+    "scaleX",
+    "scaleY",
+    "width",
+    "height",
+    "zIndex",
+    "points",
+)
+
+
+def _patch(target, patch):
+    """Применяет частичное обновление словаря: None удаляет ключ."""
+    result = dict(target or {})
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = value
+    return result
+
+
+def apply_board_operations(board, operations, user):
+    """
+    Применяет провалидированные операции (BoardOperationSerializer) к доске
+    от имени user.
+    Операции над чужими или уже удалёнными элементами попадают в missing,
+    а операции, основанные на устаревшей ревизии элемента, — в conflicts.
+    """
+    item_ids = {operation["id"] for operation in operations}
+
+    with transaction.atomic():
+        items = {
+            item.id: item
+            for item in BoardItem.objects.filter(board=board, id__in=item_ids)
+            .select_related("task_data")
+            .select_for_update(of=("self",))
+        }
+
+        changed_fields = {}
+        changed_tasks = {}
+        deleted_ids = []
+        missing_ids = []
+        conflicts = []
+
+        for operation in operations:
+            item = items.get(operation["id"])
+            if item is None:
+                missing_ids.append(operation["id"])
+                continue
+            if "revision" in operation and item.revision > operation["revision"]:
+                conflicts.append({"id": item.id, "revision": item.revision})
+                continue
+
+            op = operation["op"]
+            fields = changed_fields.setdefault(item.id, set())
+            if op == MOVE:
+                item.geometry = _patch(item.geometry, operation["geometry"])
+                fields.add("geometry")
+            elif op == RESTYLE:
+                item.style = _patch(item.style, operation["style"])
+                fields.add("style")
+            elif op == EDIT_TEXT:
+                item.content_payload = operation["text"]
+                fields.add("content_payload")
+            elif op == TOGGLE_TASK:
+                task_data = getattr(item, "task_data", None)
+                if task_data is None:
+                    missing_ids.append(item.id)
+                    continue
+                task_data.is_completed = operation.get(
+                    "is_completed", not task_data.is_completed
+                )
+                if "due_date" in operation:
+                    task_data.due_date = operation["due_date"]
+                changed_tasks[task_data.id] = task_data
+                # Задача — часть элемента, поэтому его ревизия тоже растёт
+                fields.add("revision")
+            elif op == DELETE:
+                deleted_ids.append(item.id)
+                del items[item.id]
+                changed_fields.pop(item.id, None)
+                task_data = getattr(item, "task_data", None)
+                if task_data is not None:
+                    changed_tasks.pop(task_data.id, None)
+
+        changed_items = [
+            items[item_id] for item_id, fields in changed_fields.items() if fields
+        ]
+        revision = board.revision
+        if changed_items:
+            revision = BoardItem.stamp_revision(board.id, changed_items)
+
+        now = timezone.now()
+        by_fields = {}
+        for item in changed_items:
+            item.updated_at = now
+            fields = changed_fields[item.id] | {"revision", "updated_at"}
+            by_fields.setdefault(tuple(sorted(fields)), []).append(item)
+
+        for fields, group in by_fields.items():
+            BoardItem.objects.bulk_update(group, list(fields))
+        if changed_tasks:
+            TaskData.objects.bulk_update(
+                changed_tasks.values(), ["is_completed", "due_date"]
+            )
+        invalidate_task_assignees(
+            item.id
+            for item in changed_items
+            if item.item_type == BoardItem.ItemType.TASK
+        )
+        if deleted_ids:
+            # Вместе с плиткой удаляем и саму вложенную доску, как delete_reminder_api:
+            # только редактируемую и через Board.delete() (ссылки на картинки)
+            for child in Board.objects.filter(
+                parent=board, linked_items__id__in=deleted_ids
+            ):
+                if child.user_can_edit(user):
+                    child.delete()
+            BoardItem.objects.filter(id__in=deleted_ids).delete_tracked()
+            revision = Board.objects.values_list("revision", flat=True).get(pk=board.id)
+
+    return {
+        "updated": sorted(item.id for item in changed_items),
+        "deleted": deleted_ids,
+        "missing": missing_ids,
+        "conflicts": conflicts,
+        "revision": revision,
+    }
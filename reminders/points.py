@@ -0,0 +1,74 @@
+"""
+Компактное хранение точек линий (geometry["points"]).
+
+Формат points_blob:
+    1 байт   — typecode массива приращений: "h" (int16) или "i" (int32);
+    8 байт   — первая точка (x, y), int32 little-endian;
+    остальное — приращения x, y между соседними точками, little-endian.
+
+Координаты квантуются с шагом 1 / POINT_SCALE пикселя, поэтому обычный
+штрих кистью занимает 4 байта на точку вместо ~15 байт JSON. Декодирование
+целиком в C: array.frombytes + itertools.accumulate.
+"""
+
+import struct
+import sys
+from array import array
+from itertools import accumulate
+
+POINT_SCALE = 100
+HEADER = struct.Struct("<ii")
+
+INT16_MIN, INT16_MAX = -(2**15), 2**15 - 1
+INT32_MIN, INT32_MAX = -(2**31), 2**31 - 1
+
+
+def encode_points(points):
+    """
+    Кодирует плоский список [x0, y0, x1, y1, ...] в bytes.
+    Возвращает None, если список нельзя упаковать без потерь смысла
+    (не числа, нечётная длина, слишком большие координаты) — тогда точки
+    остаются в JSON как есть.
+    """
+    if not isinstance(points, (list, tuple)) or len(points) < 2 or len(points) % 2:
+        return None
+    if any(isinstance(value, bool) for value in points):
+        return None
+    try:
+        quantized = [round(value * POINT_SCALE) for value in points]
+    except (TypeError, ValueError, OverflowError):
+        # Не числа, NaN или бесконечность
+        return None
+    if min(quantized) < INT32_MIN or max(quantized) > INT32_MAX:
+        return None
+
+    deltas = [quantized[i] - quantized[i - 2] for i in range(2, len(quantized))]
+    typecode = "h"
+    if deltas and (min(deltas) < INT16_MIN or max(deltas) > INT16_MAX):
+        typecode = "i"
+        if min(deltas) < INT32_MIN or max(deltas) > INT32_MAX:
+            return None
+    body = array(typecode, deltas)
+    if sys.byteorder == "big":
+        body.byteswap()
+    return typecode.encode() + HEADER.pack(quantized[0], quantized[1]) + body.tobytes()
+
+
+def quantize_points(points):
+    """Точки в том виде, в каком они вернутся из БД после упаковки."""
+    data = encode_points(points)
+    return points if data is None else decode_points(data)
+
+
+def decode_points(data):
+    """Обратное к encode_points: плоский список float."""
+    data = bytes(data)
+    first_x, first_y = HEADER.unpack_from(data, 1)
+    deltas = array(chr(data[0]))
+    deltas.frombytes(data[1 + HEADER.size :])
+    if sys.byteorder == "big":
+        deltas.byteswap()
+    xs = accumulate(deltas[0::2], initial=first_x)
+    ys = accumulate(deltas[1::2], initial=first_y)
+    scale = POINT_SCALE
+    return [value / scale for pair in zip(xs, ys) for value in pair]
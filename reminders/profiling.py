@@ -0,0 +1,129 @@
+"""
+Профилирование отдельных запросов (cProfile).
+
+ProfilingMiddleware включает профилировщик перед представлением, если
+сотрудник попросил об этом заголовком X-Profile: 1 или параметром
+?_profile=1, либо запрос попал в выборку PROFILE_SAMPLE_RATE, и выключает
+его в process_response. Само представление вызывает обработчик Django,
+поэтому ATOMIC_REQUESTS и process_exception работают как обычно, а
+запрос, упавший с исключением, тоже получает профиль. Ответ DRF и
+шаблонный ответ рендерятся внутри профиля, поэтому в нём видны
+сериализация, проверки прав, шаблоны и кодирование JSON.
+
+Профиль сохраняется как RequestProfile с файлом .prof; список последних
+профилей — в админке (reminders/admin.py). Хранится не больше PROFILE_KEEP
+профилей. Номер профиля возвращается в заголовке X-Profile-Id.
+
+Middleware стоит последним: её process_view выполняется после проверки
+CSRF и остальных process_view, а process_response — первым. Под ASGI
+process_view, синхронное представление и process_response выполняются
+в одном потоке (sync_to_async с thread_sensitive).
+"""
+
+import cProfile
+import io
+import marshal
+import pstats
+import random
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils.deprecation import MiddlewareMixin
+
+from .metrics import DbTimer
+from .models import RequestProfile
+from .query_budget import attach, detach, install
+
+HEADER = "HTTP_X_PROFILE"
+QUERY_FLAG = "_profile"
+SUMMARY_LINES = 40
+
+
+def profiling_requested(request):
+    """Явная просьба сотрудника или попадание в выборку (None — не профилировать)."""
+    if request.META.get(HEADER) == "1" or request.GET.get(QUERY_FLAG) == "1":
+        return "requested" if request.user.is_staff else None
+    if random.random() < getattr(settings, "PROFILE_SAMPLE_RATE", 0):
+        return "sampled"
+    return None
+
+
+def _render(response):
+    # DRF Response и TemplateResponse рендерятся после middleware — делаем это здесь
+    if hasattr(response, "render") and not getattr(response, "is_rendered", True):
+        response.render()
+    return response
+
+
+def save_profile(request, response, profiler, duration, db_timer, sampled):
+    summary = io.StringIO()
+    # Stats забирает данные у профилировщика — в файл пишем stats.stats
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.sort_stats("cumulative").print_stats(SUMMARY_LINES)
+    match = request.resolver_match
+    profile = RequestProfile(
+        method=request.method,
+        path=request.get_full_path()[:500],
+        view_name=match.view_name if match else "",
+        user=request.user if request.user.is_authenticated else None,
+        status_code=response.status_code,
+        duration_ms=duration * 1000,
+        query_count=db_timer.count,
+        db_ms=db_timer.duration * 1000,
+        sampled=sampled,
+        summary=summary.getvalue(),
+    )
+    profile.profile.save(
+        f"{uuid.uuid4().hex}.prof", ContentFile(marshal.dumps(stats.stats))
+    )
+    prune_profiles()
+    return profile
+
+
+def prune_profiles():
+    keep = getattr(settings, "PROFILE_KEEP", 200)
+    stale = RequestProfile.objects.order_by("-created_at", "-id")[keep:]
+    for profile in stale:
+        default_storage.delete(profile.profile.name)
+        profile.delete()
+
+
+class ProfilingMiddleware(MiddlewareMixin):
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Асинхронные представления (SSE) выполняются не в этом потоке
+        if iscoroutinefunction(view_func):
+            return None
+        mode = profiling_requested(request)
+        if mode is None:
+            return None
+        # Представление вызывает обработчик Django (с ATOMIC_REQUESTS и
+        # process_exception), профиль останавливается в process_response
+        install()
+        db_timer = DbTimer()
+        attach(db_timer)
+        profiler = cProfile.Profile()
+        request._profiling = (profiler, db_timer, mode, time.perf_counter())
+        profiler.enable()
+        return None
+
+    def process_response(self, request, response):
+        state = getattr(request, "_profiling", None)
+        if state is None:
+            return response
+        profiler, db_timer, mode, started = state
+        del request._profiling
+        try:
+            _render(response)
+        finally:
+            profiler.disable()
+            detach(db_timer)
+        duration = time.perf_counter() - started
+        profile = save_profile(
+            request, response, profiler, duration, db_timer, mode == "sampled"
+        )
+        response["X-Profile-Id"] = str(profile.id)
+        return response
@@ -0,0 +1,227 @@
+"""
+Бюджет SQL-запросов на представление и поиск N+1.
+
+QueryBudgetMiddleware через execute_wrapper соединения считает запросы
+и время БД, группируя их по тексту SQL (параметры в нём — плейсхолдеры,
+поэтому запросы «на каждую строку» дают один и тот же текст). Для текста,
+повторившегося QUERY_REPEAT_THRESHOLD раз, запоминается место вызова
+в коде проекта. Если запросов больше бюджета представления
+(QUERY_BUDGETS по имени URL, иначе "default"), в лог пишется
+предупреждение с повторами и местами вызова.
+
+Включается настройкой QUERY_BUDGET_ENABLED или, для сотрудников,
+заголовком X-Query-Budget: 1. Ответ получает Server-Timing с временем БД.
+Запросы, которые выполняются при чтении потокового ответа, не учитываются.
+
+В тестах — QueryBudgetMixin.assertQueryBudget.
+"""
+
+import logging
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGET = 50
+DEFAULT_REPEAT_THRESHOLD = 5
+HEADER = "HTTP_X_QUERY_BUDGET"
+PROJECT_DIR = str(settings.BASE_DIR)
+
+# Активные учётчики запросов (этот модуль, reminders/metrics.py).
+# Соединения с БД у каждого потока свои, а контекст переходит
+# и в поток sync_to_async, где выполняется представление
+_current = ContextVar("query_recorders", default=())
+
+
+def get_budget(view_name):
+    budgets = getattr(settings, "QUERY_BUDGETS", {})
+    return budgets.get(view_name, budgets.get("default", DEFAULT_BUDGET))
+
+
+def _call_site():
+    """Ближайший к запросу кадр из кода проекта (не Django и не этот модуль)."""
+    for frame in reversed(traceback.extract_stack()):
+        filename = frame.filename
+        if (
+            filename.startswith(PROJECT_DIR)
+            and "site-packages" not in filename
+            and filename != __file__
+        ):
+            return f"{filename[len(PROJECT_DIR) + 1:]}:{frame.lineno} in {frame.name}"
+    return None
+
+
+def _record(execute, sql, params, many, context):
+    recorders = _current.get()
+    if not recorders:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        for recorder in recorders:
+            recorder.add(sql, duration)
+
+
+@receiver(connection_created)
+def install_on_connect(sender, connection, **kwargs):
+    """Подключает учёт к соединению (один раз; повторный connect не дублирует)."""
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+def install():
+    """То же для соединения текущего потока, открытого до загрузки модуля."""
+    install_on_connect(None, connection)
+
+
+def attach(recorder):
+    """
+    activate без with: для учёта, который начинается и заканчивается
+    в разных хуках middleware. Снимается detach(recorder).
+    """
+    _current.set((*_current.get(), recorder))
+
+
+def detach(recorder):
+    _current.set(tuple(item for item in _current.get() if item is not recorder))
+
+
+@contextmanager
+def activate(recorder):
+    """
+    Передаёт recorder.add(sql, duration) запросы текущего контекста.
+    install() для потока, где пойдут запросы, вызывается отдельно.
+    """
+    token = _current.set((*_current.get(), recorder))
+    try:
+        yield recorder
+    finally:
+        _current.reset(token)
+
+
+class QueryRecorder:
+    """Число запросов, время БД и повторы по тексту SQL."""
+
+    def __init__(self, repeat_threshold=None):
+        self.repeat_threshold = repeat_threshold or getattr(
+            settings, "QUERY_REPEAT_THRESHOLD", DEFAULT_REPEAT_THRESHOLD
+        )
+        self.count = 0
+        self.duration = 0.0
+        self.patterns = {}
+        self.call_sites = {}
+
+    def add(self, sql, duration):
+        self.duration += duration
+        self.count += 1
+        seen = self.patterns.get(sql, 0) + 1
+        self.patterns[sql] = seen
+        if seen == self.repeat_threshold:
+            self.call_sites[sql] = _call_site()
+
+    @contextmanager
+    def record(self):
+        install()
+        with activate(self):
+            yield self
+
+    def repeated(self):
+        """[(число повторов, SQL, место вызова)] по убыванию повторов."""
+        return sorted(
+            (
+                (count, sql, self.call_sites.get(sql))
+                for sql, count in self.patterns.items()
+                if count >= self.repeat_threshold
+            ),
+            key=lambda row: -row[0],
+        )
+
+    def describe(self, limit=3):
+        lines = [f"{self.count} queries, {self.duration * 1000:.1f} ms in DB"]
+        for count, sql, call_site in self.repeated()[:limit]:
+            lines.append(f"  {count}x at {call_site or '?'}: {sql[:200]}")
+        return "\n".join(lines)
+
+
+class QueryBudgetMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.enabled() and not (
+            HEADER in request.META and self._requested(request, request.user)
+        ):
+            return self.get_response(request)
+        with QueryRecorder().record() as recorder:
+            response = self.get_response(request)
+        return self.report(request, response, recorder)
+
+    async def __acall__(self, request):
+        if not self.enabled() and not (
+            HEADER in request.META and self._requested(request, await request.auser())
+        ):
+            return await self.get_response(request)
+        # Синхронное представление выполнится в том же потоке, что и install
+        await sync_to_async(install)()
+        with activate(QueryRecorder()) as recorder:
+            response = await self.get_response(request)
+        return self.report(request, response, recorder)
+
+    @staticmethod
+    def enabled():
+        return getattr(settings, "QUERY_BUDGET_ENABLED", False)
+
+    @staticmethod
+    def _requested(request, user):
+        return request.META.get(HEADER) == "1" and user.is_staff
+
+    def report(self, request, response, recorder):
+        match = request.resolver_match
+        view_name = match.view_name if match else request.path
+        budget = get_budget(view_name)
+        response["Server-Timing"] = (
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"'
+        )
+        if recorder.count > budget:
+            logger.warning(
+                "%s %s exceeded its query budget (%d): %s",
+                request.method,
+                view_name,
+                budget,
+                recorder.describe(),
+            )
+        return response
+
+
+class QueryBudgetMixin:
+    """Для TestCase: проверка, что код укладывается в бюджет запросов."""
+
+    @contextmanager
+    def assertQueryBudget(self, view_name=None, budget=None):
+        if budget is None:
+            budget = get_budget(view_name)
+        with QueryRecorder().record() as recorder:
+            yield recorder
+        if recorder.count > budget:
+            self.fail(
+                f"{view_name or 'block'} exceeded its query budget ({budget}): "
+                f"{recorder.describe()}"
+            )
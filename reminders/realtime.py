@@ -0,0 +1,176 @@
+"""
+Рассылка изменений досок в реальном времени.
+
+Каждая запись в доску публикует небольшое событие (ревизия, id изменённых
+и удалённых элементов), а SSE-канал /api/board/<id>/events/ из ASGI-приложения
+отдаёт его всем открытым вкладкам. Сами данные клиент добирает через
+/api/board/<id>/changes/?since=N.
+
+Бэкенд рассылки задаётся настройкой REALTIME_BACKEND:
+- InProcessBackend — внутри одного процесса (тесты, один воркер);
+- PostgresNotifyBackend — через LISTEN/NOTIFY, между всеми воркерами.
+"""
+
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection, transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = "reminders.realtime.InProcessBackend"
+
+
+class InProcessBackend:
+    """Подписчики — asyncio-очереди в event loop'е текущего процесса."""
+
+    # Медленный подписчик не копит события бесконечно: получит resync
+    QUEUE_SIZE = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def publish(self, board_id, event):
+        """Отправляет событие после коммита текущей транзакции."""
+        transaction.on_commit(lambda: self.dispatch(board_id, event))
+
+    def dispatch(self, board_id, event):
+        with self._lock:
+            targets = list(self._subscribers.get(board_id, ()))
+        for loop, queue in targets:
+            loop.call_soon_threadsafe(self._offer, queue, event)
+
+    @staticmethod
+    def _offer(queue, event):
+        if queue.full():
+            while not queue.empty():
+                queue.get_nowait()
+            event = {"type": "resync", "board_id": event.get("board_id")}
+        queue.put_nowait(event)
+
+    def subscribe(self, board_id):
+        """Вызывается из корутины: возвращает очередь событий доски."""
+        queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(board_id, set()).add(
+                (asyncio.get_running_loop(), queue)
+            )
+        return queue
+
+    def unsubscribe(self, board_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(board_id, set())
+            subscribers.difference_update(
+                {entry for entry in subscribers if entry[1] is queue}
+            )
+            if not subscribers:
+                self._subscribers.pop(board_id, None)
+
+
+class PostgresNotifyBackend(InProcessBackend):
+    """
+    Публикация через pg_notify: Postgres сам доставит событие после коммита
+    во все процессы, где фоновый поток слушает канал и раздаёт его локально.
+    """
+
+    CHANNEL = "board_events"
+    # Лимит полезной нагрузки NOTIFY — 8000 байт
+    MAX_PAYLOAD = 7900
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def publish(self, board_id, event):
+        if connection.vendor != "postgresql":
+            # Например, SQLite на локальной машине: рассылаем внутри процесса
+            super().publish(board_id, event)
+            return
+        payload = json.dumps({"board_id": board_id, "event": event})
+        if len(payload.encode()) > self.MAX_PAYLOAD:
+            event = {"type": "resync", "board_id": board_id}
+            payload = json.dumps({"board_id": board_id, "event": event})
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.CHANNEL, payload])
+
+    def subscribe(self, board_id):
+        self._ensure_listener()
+        return super().subscribe(board_id)
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(
+                    target=self._listen, name="board-events-listener", daemon=True
+                )
+                self._listener.start()
+
+    def _listen(self):
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        db = settings.DATABASES["default"]
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(
+                    dbname=db["NAME"],
+                    user=db["USER"],
+                    password=db["PASSWORD"],
+                    host=db["HOST"],
+                    port=db["PORT"],
+                )
+                conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.CHANNEL}")
+                while True:
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        message = json.loads(conn.notifies.pop(0).payload)
+                        self.dispatch(message["board_id"], message["event"])
+            except psycopg2.Error:
+                logger.exception("Board events listener lost connection")
+                if conn is not None:
+                    conn.close()
+                time.sleep(1)
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(getattr(settings, "REALTIME_BACKEND", DEFAULT_BACKEND))()
+
+
+@receiver(setting_changed)
+def reset_backend(setting, **kwargs):
+    if setting == "REALTIME_BACKEND":
+        get_backend.cache_clear()
+
+
+def publish_board_event(board_id, changed=(), deleted=(), settings_changed=False):
+    """Сообщает подписчикам доски, какие элементы изменились или удалены."""
+    from .models import Board
+
+    revision = Board.objects.values_list("revision", flat=True).get(pk=board_id)
+    get_backend().publish(
+        board_id,
+        {
+            "type": "board_changed",
+            "board_id": board_id,
+            "revision": revision,
+            "changed": list(changed),
+            "deleted": list(deleted),
+            "settings_changed": settings_changed,
+        },
+    )
@@ -1,13 +1,20 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Board, BoardItem, TaskData
+from .models import Board, BoardAccess, BoardClosure, BoardItem, TaskData
+from .images import image_url, usable_image_ids
+from .operations import EDIT_TEXT, GEOMETRY_KEYS, MOVE, OPERATION_TYPES, RESTYLE
+from users.avatars import avatar_url
 from users.models import CustomUser
+from django.core.files.storage import default_storage
 from django.db import transaction
 
 User = get_user_model()
 
 
 class UserSerializer(serializers.ModelSerializer):
+    # В списках аватар маленький, см. users/avatars.py
+    avatar = serializers.SerializerMethodField()
+
     class Meta:
         model = CustomUser
         fields = ("id", "username", "email", "first_name", "last_name", "avatar")
@@ -18,6 +25,9 @@ class UserSerializer(serializers.ModelSerializer):
             self.Meta.model = User
         super().__init__(*args, **kwargs)
 
+    def get_avatar(self, obj):
+        return avatar_url(obj, "sm")
+
 
 class TaskDataSerializer(serializers.ModelSerializer):
     assigned_to = UserSerializer(read_only=True)
@@ -61,11 +71,13 @@ class BoardItemSerializer(serializers.ModelSerializer):
             "geometry",
             "style",
             "content_payload",
+            "image",
+            "revision",
             "created_at",
             "updated_at",
             "task_data",  # Вложенный объект
         ]
-        read_only_fields = ("created_at", "updated_at")
+        read_only_fields = ("revision", "created_at", "updated_at")
 
     def to_representation(self, instance):
         """
@@ -76,19 +88,29 @@ class BoardItemSerializer(serializers.ModelSerializer):
         # Если у элемента нет task_data (например, это стрелка), убираем null из ответа для чистоты
         if instance.item_type != BoardItem.ItemType.TASK:
             ret.pop("task_data", None)
+        if instance.image_id:
+            # Копия под размер элемента на сцене; image подтягивается select_related
+            ret["image_url"] = image_url(instance.image, instance.geometry)
+            ret["image_original_url"] = default_storage.url(instance.image.original)
         if instance.item_type == BoardItem.ItemType.NESTED_BOARD:
-            try:
-                child_id = int(instance.content_payload or 0)
-            except (TypeError, ValueError):
-                child_id = None
-            ret["linked_board_id"] = child_id
-            if child_id:
-                child = Board.objects.filter(id=child_id).first()
-                ret["linked_board_title"] = child.title if child else "Доска"
-            else:
-                ret["linked_board_title"] = "Доска"
+            # linked_board подтягивается через select_related во views
+            ret["linked_board_id"] = instance.linked_board_id
+            ret["linked_board_title"] = (
+                instance.linked_board.title if instance.linked_board_id else "Доска"
+            )
         return ret
 
+    def validate_image(self, image):
+        # Чужую картинку по id не поставить (reminders/images.py)
+        unchanged = self.instance is not None and (
+            (image.pk if image else None) == self.instance.image_id
+        )
+        if image is not None and not unchanged:
+            user = self.context["request"].user
+            if not usable_image_ids(user, [image.pk]):
+                raise serializers.ValidationError("Картинка не найдена")
+        return image
+
     def create(self, validated_data):
         """
         Создание элемента + (опционально) TaskData
@@ -134,6 +156,43 @@ class BoardItemSerializer(serializers.ModelSerializer):
         return instance
 
 
+class BatchTaskDataSerializer(TaskDataSerializer):
+    """Данные задачи в пакете: исполнитель проверяется по context["user_ids"]."""
+
+    assigned_to_id = serializers.IntegerField(
+        write_only=True, required=False, allow_null=True
+    )
+
+    def validate_assigned_to_id(self, value):
+        if value is not None and value not in self.context["user_ids"]:
+            raise serializers.ValidationError("Пользователь не найден")
+        return value
+
+
+class BoardItemBatchSerializer(BoardItemSerializer):
+    """
+    Элемент пакетного создания (reminders/batch.py). Доска общая для всей
+    пачки, а картинки и исполнители проверяются по множествам из context
+    (одним запросом на пачку), а не запросом на каждый элемент.
+    """
+
+    image = serializers.IntegerField(source="image_id", required=False, allow_null=True)
+    task_data = BatchTaskDataSerializer(required=False, allow_null=True)
+    # Для NESTED_BOARD: название и цвет создаваемой доски
+    title = serializers.CharField(max_length=200, required=False, write_only=True)
+    color = serializers.CharField(max_length=50, required=False, write_only=True)
+
+    class Meta(BoardItemSerializer.Meta):
+        fields = [
+            field for field in BoardItemSerializer.Meta.fields if field != "board"
+        ] + ["title", "color"]
+
+    def validate_image(self, value):
+        if value is not None and value not in self.context["image_ids"]:
+            raise serializers.ValidationError("Картинка не найдена")
+        return value
+
+
 class BoardSerializer(serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
 
@@ -151,6 +210,7 @@ class BoardSerializer(serializers.ModelSerializer):
             "settings",
             "owner",
             "parent_id",
+            "revision",
             "created_at",
             "updated_at",
             "group",
@@ -158,32 +218,71 @@ class BoardSerializer(serializers.ModelSerializer):
             "items_count",
             "user_access_level",
         )
-        read_only_fields = ("owner", "created_at", "updated_at")
+        read_only_fields = ("owner", "revision", "created_at", "updated_at")
+
+    ACCESS_LEVEL_NAMES = {
+        BoardAccess.Level.OWNER: "owner",
+        BoardAccess.Level.EDITOR: "editor",
+        BoardAccess.Level.VIEWER: "viewer",
+    }
 
     def get_items_count(self, obj):
+        # В списке берём аннотацию из BoardViewSet.get_queryset
+        if hasattr(obj, "items_count"):
+            return obj.items_count
         return obj.items.count()
 
     def get_user_access_level(self, obj):
         """Возвращает права текущего пользователя в виде строки"""
         request = self.context.get("request")
         if request and request.user.is_authenticated:
-            user = request.user
-            if obj.owner == user:
-                return "owner"
-            elif obj.user_can_edit(user):
-                return "editor"
-            elif obj.user_can_read(user):
-                return "viewer"
+            if hasattr(obj, "access_level"):
+                level = obj.access_level
+            else:
+                level = obj.get_access_level(request.user)
+            return self.ACCESS_LEVEL_NAMES.get(level)
         return None
 
-    def create(self, validated_data):
+    def validate_parent_id(self, parent):
+        # Вкладывать можно только в доску, которую пользователь может редактировать
+        unchanged = self.instance is not None and (
+            (parent.pk if parent else None) == self.instance.parent_id
+        )
+        if (
+            parent is not None
+            and not unchanged
+            and not parent.user_can_edit(self.context["request"].user)
+        ):
+            raise serializers.ValidationError("Нет прав на родительскую доску")
+        # Доска и её потомки не могут стать родителем (замыкание включает саму доску)
+        if (
+            parent is not None
+            and not unchanged
+            and self.instance is not None
+            and BoardClosure.objects.filter(
+                ancestor=self.instance, descendant=parent
+            ).exists()
+        ):
+            raise serializers.ValidationError(
+                "Циклическая вложенность досок недопустима."
+            )
+        return parent
+
+    def validate_group(self, group):
+        unchanged = self.instance is not None and (
+            (group.pk if group else None) == self.instance.group_id
+        )
         user = self.context["request"].user
-        validated_data["owner"] = user
-
-        group = validated_data.get("group")
-        if group and not group.members.filter(user=user).exists():
+        if (
+            group is not None
+            and not unchanged
+            and not group.members.filter(user=user).exists()
+        ):
             raise serializers.ValidationError("Вы не состоите в этой группе")
+        return group
 
+    def create(self, validated_data):
+        validated_data["owner"] = self.context["request"].user
         return super().create(validated_data)
 
 
@@ -197,3 +296,35 @@ class BoardDetailSerializer(BoardSerializer):
 
     class Meta(BoardSerializer.Meta):
         fields = BoardSerializer.Meta.fields + ("items",)
+
+
+class BoardOperationSerializer(serializers.Serializer):
+    """Одна операция пакетного сохранения доски (см. reminders/operations.py)."""
+
+    op = serializers.ChoiceField(choices=OPERATION_TYPES)
+    id = serializers.IntegerField()
+    geometry = serializers.DictField(required=False)
+    style = serializers.DictField(required=False)
+    text = serializers.CharField(
+        required=False, allow_blank=True, trim_whitespace=False
+    )
+    is_completed = serializers.BooleanField(required=False)
+    due_date = serializers.DateTimeField(required=False, allow_null=True)
+    # Ревизия элемента, на которой основана правка (для обнаружения конфликтов)
+    revision = serializers.IntegerField(required=False, min_value=0)
+
+    # Какое поле обязательно для каждого типа операции
+    REQUIRED_FIELDS = {MOVE: "geometry", RESTYLE: "style", EDIT_TEXT: "text"}
+
+    def validate(self, attrs):
+        required = self.REQUIRED_FIELDS.get(attrs["op"])
+        if required and required not in attrs:
+            raise serializers.ValidationError(
+                {required: f"Обязательно для операции {attrs['op']}"}
+            )
+        unknown = set(attrs.get("geometry", {})) - set(GEOMETRY_KEYS)
+        if unknown:
+            raise serializers.ValidationError(
+                {"geometry": f"Неизвестные ключи: {', '.join(sorted(unknown))}"}
+            )
+        return attrs
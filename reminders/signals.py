@@ -0,0 +1,214 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .access import rebuild_board_access, revoke_board_access
+from .caching import bump_versions
+from .contacts import refresh_contacts, update_contact_search_text
+from .dashboard import invalidate_dashboards, invalidate_task_assignees
+from .hierarchy import insert_board_node, move_board_node
+from .models import (
+    Board,
+    BoardAccess,
+    BoardCollaborator,
+    BoardItem,
+    GroupMember,
+    StoredImage,
+    TaskData,
+)
+from users.models import CustomUser
+
+
+# --- ДЕРЕВО ДОСОК (BoardClosure) ---
+# Должен быть подключён раньше обработчика прав: тот обходит поддерево по замыканию
+@receiver(post_save, sender=Board)
+def board_closure_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        insert_board_node(instance)
+    elif (
+        instance.get_access_state()["parent_id"] != instance._access_state["parent_id"]
+    ):
+        move_board_node(instance)
+
+
+# --- МАТЕРИАЛИЗОВАННЫЕ ПРАВА (BoardAccess) ---
+@receiver(post_save, sender=Board)
+def board_access_on_board_save(sender, instance, created, raw=False, **kwargs):
+    state = instance.get_access_state()
+    if not raw and (created or state != instance._access_state):
+        rebuild_board_access([instance.pk])
+    instance._access_state = state
+
+
+@receiver(post_save, sender=GroupMember)
+def board_access_on_member_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    board_ids = Board.objects.filter(group_id=instance.group_id).values_list(
+        "id", flat=True
+    )
+    rebuild_board_access(board_ids, user_ids=[instance.user_id])
+
+
+@receiver(post_delete, sender=GroupMember)
+def board_access_on_member_delete(sender, instance, **kwargs):
+    board_ids = Board.objects.filter(group_id=instance.group_id).values_list(
+        "id", flat=True
+    )
+    revoke_board_access(board_ids, user_ids=[instance.user_id])
+
+
+@receiver(post_save, sender=BoardCollaborator)
+def board_access_on_collaborator_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    rebuild_board_access([instance.board_id], user_ids=[instance.user_id])
+
+
+@receiver(post_delete, sender=BoardCollaborator)
+def board_access_on_collaborator_delete(sender, instance, **kwargs):
+    revoke_board_access([instance.board_id], user_ids=[instance.user_id])
+
+
+# --- ВЕРСИЯ СОДЕРЖИМОГО (Board.revision) ---
+# Кэш элементов (reminders/board_cache.py) привязан к ревизии, поэтому
+# изменения, видимые в элементах чужой доски, тоже должны её увеличивать
+@receiver(post_save, sender=Board)
+def board_revision_on_title_change(sender, instance, created, raw=False, **kwargs):
+    title = instance.__dict__.get("title")
+    if not raw and not created and instance.parent_id:
+        if title != instance._loaded_title:
+            Board.next_revision(instance.parent_id)
+    instance._loaded_title = title
+
+
+# Поля пользователя, которые попадают в task_data.assigned_to
+ASSIGNEE_FIELDS = {"username", "email", "first_name", "last_name", "avatar"}
+
+
+@receiver(post_save, sender=CustomUser)
+def board_revision_on_assignee_change(
+    sender, instance, created, raw=False, update_fields=None, **kwargs
+):
+    if raw or created:
+        return
+    if update_fields is not None and not ASSIGNEE_FIELDS & set(update_fields):
+        return
+    Board.objects.filter(items__task_data__assigned_to=instance).update(
+        revision=F("revision") + 1
+    )
+
+
+# --- СВОДКА ДЛЯ ГЛАВНОЙ СТРАНИЦЫ (reminders/dashboard.py) ---
+def _board_users(board_id):
+    return set(
+        BoardAccess.objects.filter(board_id=board_id).values_list("user_id", flat=True)
+    )
+
+
+@receiver(pre_save, sender=Board)
+def dashboard_users_before_board_save(sender, instance, raw=False, **kwargs):
+    # На главной только корневые доски; запоминаем и тех, кто может потерять доступ
+    was_root = instance._access_state["parent_id"] is None
+    if not raw and instance.pk and (was_root or instance.parent_id is None):
+        instance._dashboard_users = _board_users(instance.pk)
+
+
+@receiver(post_save, sender=Board)
+def dashboard_on_board_save(sender, instance, created, raw=False, **kwargs):
+    users = instance.__dict__.pop("_dashboard_users", set())
+    if raw:
+        return
+    if instance.parent_id is None:
+        users |= _board_users(instance.pk)
+    invalidate_dashboards(users)
+
+
+@receiver(pre_delete, sender=Board)
+def dashboard_on_board_delete(sender, instance, **kwargs):
+    if instance.parent_id is None:
+        invalidate_dashboards(_board_users(instance.pk))
+
+
+@receiver(post_save, sender=GroupMember)
+@receiver(post_delete, sender=GroupMember)
+@receiver(post_save, sender=BoardCollaborator)
+@receiver(post_delete, sender=BoardCollaborator)
+def dashboard_on_membership_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_dashboards([instance.user_id])
+
+
+@receiver(post_save, sender=TaskData)
+@receiver(post_delete, sender=TaskData)
+def dashboard_on_task_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_dashboards(
+            [instance.assigned_to_id, instance._loaded_assigned_to_id]
+        )
+    instance._loaded_assigned_to_id = instance.assigned_to_id
+
+
+@receiver(post_save, sender=BoardItem)
+def dashboard_on_task_item_save(sender, instance, created, raw=False, **kwargs):
+    # Название задачи хранится в content_payload элемента
+    if not raw and not created and instance.item_type == BoardItem.ItemType.TASK:
+        invalidate_task_assignees([instance.pk])
+
+
+# --- ССЫЛКИ НА КАРТИНКИ (reminders/images.py) ---
+@receiver(post_save, sender=BoardItem)
+def image_refs_on_item_save(sender, instance, created, raw=False, **kwargs):
+    previous = None if created else instance._loaded_image_id
+    if not raw and instance.image_id != previous:
+        StoredImage.adjust_refs([instance.image_id], +1)
+        StoredImage.adjust_refs([previous], -1)
+    instance._loaded_image_id = instance.image_id
+
+
+# --- КОНТАКТЫ ДЛЯ ПРИГЛАШЕНИЙ (reminders/contacts.py) ---
+# Общие доски учитывает rebuild_board_access, здесь — общие группы и
+# приглашения: ожидающее приглашение доступа не меняет
+@receiver(post_save, sender=GroupMember)
+def contacts_on_member_save(sender, instance, created, raw=False, **kwargs):
+    if not raw and created:
+        refresh_contacts([instance.user_id])
+
+
+@receiver(post_delete, sender=GroupMember)
+def contacts_on_member_delete(sender, instance, **kwargs):
+    refresh_contacts([instance.user_id])
+
+
+@receiver(post_save, sender=BoardCollaborator)
+@receiver(post_delete, sender=BoardCollaborator)
+def contacts_on_collaborator_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_contacts([instance.user_id])
+
+
+CONTACT_SEARCH_FIELDS = {"username", "email", "first_name", "last_name"}
+
+
+@receiver(post_save, sender=CustomUser)
+def contacts_on_user_change(
+    sender, instance, created, raw=False, update_fields=None, **kwargs
+):
+    if raw or created:
+        return
+    if update_fields is not None and not CONTACT_SEARCH_FIELDS & set(update_fields):
+        return
+    update_contact_search_text(instance)
+
+
+# --- КЭШ ПОЛЬЗОВАТЕЛЕЙ И ПРАВ (reminders/caching.py) ---
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def cache_on_user_change(sender, instance, created=False, raw=False, **kwargs):
+    # users/backends.py кэширует пользователя целиком
+    bump_versions("user", [instance.pk])
+    if created:
+        # id мог достаться от удалённого пользователя вместе с его правами в кэше
+        bump_versions("acl", [instance.pk])
@@ -0,0 +1,70 @@
+"""
+Упрощение штрихов рисования (алгоритм Рамера — Дугласа — Пекера).
+
+Кисть присылает каждую точку указателя; упрощение выбрасывает те, что
+отклоняются от ломаной меньше чем на допуск (в пикселях сцены). Допуск
+задаётся на доску в Board.settings["strokeTolerance"]; без него штрихи
+сохраняются как есть.
+"""
+
+TOLERANCE_SETTING = "strokeTolerance"
+
+
+def board_stroke_tolerance(board):
+    """Допуск упрощения для доски или None, если упрощение выключено."""
+    settings = board.settings if isinstance(board.settings, dict) else {}
+    try:
+        tolerance = float(settings.get(TOLERANCE_SETTING) or 0)
+    except (TypeError, ValueError):
+        return None
+    return tolerance if tolerance > 0 else None
+
+
+def simplify_points(points, tolerance):
+    """
+    Упрощает плоский список [x0, y0, x1, y1, ...]. Первая и последняя точки
+    всегда сохраняются; некорректные списки возвращаются без изменений.
+    """
+    if (
+        not tolerance
+        or not isinstance(points, list)
+        or len(points) < 6
+        or len(points) % 2
+        or not all(
+            isinstance(value, (int, float)) and not isinstance(value, bool)
+            for value in points
+        )
+    ):
+        return points
+
+    xs, ys = points[0::2], points[1::2]
+    keep = [False] * len(xs)
+    keep[0] = keep[-1] = True
+    limit = tolerance * tolerance
+
+    # Обход без рекурсии: длинный штрих не упрётся в лимит стека
+    stack = [(0, len(xs) - 1)]
+    while stack:
+        start, end = stack.pop()
+        x1, y1 = xs[start], ys[start]
+        dx, dy = xs[end] - x1, ys[end] - y1
+        length = dx * dx + dy * dy
+
+        farthest, index = 0.0, None
+        for i in range(start + 1, end):
+            px, py = xs[i] - x1, ys[i] - y1
+            if length:
+                cross = dx * py - dy * px
+                distance = cross * cross / length
+            else:
+                # Замкнутый штрих: расстояние до точки начала
+                distance = px * px + py * py
+            if distance > farthest:
+                farthest, index = distance, i
+
+        if index is not None and farthest > limit:
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+
+    return [value for x, y, kept in zip(xs, ys, keep) if kept for value in (x, y)]
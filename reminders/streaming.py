@@ -0,0 +1,50 @@
+"""
+Потоковая отдача элементов больших досок.
+
+Элементы читаются итератором с серверным курсором (на Postgres) пачками по
+STREAM_CHUNK_SIZE и сразу уходят клиенту кусками JSON-массива, поэтому
+память воркера не зависит от размера доски, а первый байт приходит сразу.
+
+Генератор асинхронный: под ASGI синхронный итератор StreamingHttpResponse
+сначала целиком собрал бы в список. Каждая пачка читается в одном и том же
+потоке (thread_sensitive), где живут соединение и курсор.
+"""
+
+import json
+
+from asgiref.sync import sync_to_async
+
+from .serializers import BoardItemSerializer
+
+STREAM_CHUNK_SIZE = 500
+
+
+def _item_chunks(items, chunk_size):
+    """Синхронно: JSON элементов пачками по chunk_size, без запятых между ними."""
+    serializer = BoardItemSerializer()
+    batch = []
+    for item in items.iterator(chunk_size=chunk_size):
+        batch.append(json.dumps(serializer.to_representation(item)))
+        if len(batch) == chunk_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def stream_json_array(items, chunk_size=STREAM_CHUNK_SIZE):
+    """Асинхронно отдаёт queryset элементов как JSON-массив по частям."""
+    chunks = _item_chunks(items, chunk_size)
+    next_chunk = sync_to_async(lambda: next(chunks, None), thread_sensitive=True)
+    close = sync_to_async(chunks.close, thread_sensitive=True)
+
+    yield "["
+    first = True
+    try:
+        while (batch := await next_chunk()) is not None:
+            yield ("" if first else ",") + ",".join(batch)
+            first = False
+    finally:
+        # Закрываем серверный курсор, даже если клиент оборвал соединение
+        await close()
+    yield "]"
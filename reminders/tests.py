@@ -1,3 +1,1795 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import pstats
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core import mail
+from django.db import connection
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from users.models import CustomUser
+from users.outbox import enqueue_mail
+from . import metrics
+from .batch import BATCH_LIMIT
+from .models import (
+    Board,
+    BoardAccess,
+    BoardClosure,
+    BoardCollaborator,
+    BoardItem,
+    GroupMember,
+    RequestProfile,
+    StoredImage,
+    TaskData,
+    UserContact,
+    WorkGroup,
+)
+from .board_cache import board_payload_cache_stats
+from .caching import TwoTierCache, bump_versions, cache_stats, versioned_key
+from .dashboard import get_dashboard_summary
+from .operations import apply_board_operations
+from .query_budget import QueryBudgetMixin, QueryRecorder
+from .due_reminders import DueReminderDispatcher
+from .images import UNUSED_GRACE
+from .realtime import get_backend
+from .simplify import simplify_points
+
+
+class BoardAccessTests(TestCase):
+    def setUp(self):
+        self.owner = CustomUser.objects.create_user(
+            username="owner", email="owner@example.com", password="testpass123"
+        )
+        self.other = CustomUser.objects.create_user(
+            username="other", email="other@example.com", password="testpass123"
+        )
+        self.root = Board.objects.create(title="Корень", owner=self.owner)
+        self.child = Board.objects.create(title="Дочерняя", parent=self.root)
+        self.grandchild = Board.objects.create(title="Внучка", parent=self.child)
+
+    def test_owner_access_is_inherited(self):
+        self.assertEqual(
+            self.root.get_access_level(self.owner), BoardAccess.Level.OWNER
+        )
+        self.assertEqual(
+            self.grandchild.get_access_level(self.owner), BoardAccess.Level.EDITOR
+        )
+        self.assertFalse(self.grandchild.user_can_read(self.other))
+
+    def test_permission_check_is_single_query(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(self.grandchild.user_can_edit(self.owner))
+
+    def test_access_level_is_cached_until_rights_change(self):
+        self.assertFalse(self.grandchild.user_can_read(self.other))
+        with self.assertNumQueries(0):
+            self.assertFalse(self.grandchild.user_can_read(self.other))
+
+        group = WorkGroup.objects.create(name="Команда")
+        GroupMember.objects.create(group=group, user=self.other)
+        self.root.group = group
+        self.root.save()
+        self.assertTrue(self.grandchild.user_can_read(self.other))
+        self.assertFalse(self.grandchild.user_can_edit(self.other))
+
+    def test_collaborator_changes(self):
+        collab = BoardCollaborator.objects.create(
+            board=self.child,
+            user=self.other,
+            access_level=BoardCollaborator.AccessLevel.VIEWER,
+        )
+        self.assertFalse(self.grandchild.user_can_read(self.other))
+
+        collab.status = BoardCollaborator.Status.ACCEPTED
+        collab.save()
+        self.assertTrue(self.grandchild.user_can_read(self.other))
+        self.assertFalse(self.grandchild.user_can_edit(self.other))
+        self.assertFalse(self.root.user_can_read(self.other))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            collab.delete()
+        self.assertFalse(self.grandchild.user_can_read(self.other))
+
+    def test_group_membership_changes(self):
+        group = WorkGroup.objects.create(name="Команда")
+        self.root.group = group
+        self.root.save()
+
+        member = GroupMember.objects.create(
+            group=group, user=self.other, role=GroupMember.Role.VIEWER
+        )
+        self.assertTrue(self.child.user_can_read(self.other))
+        self.assertFalse(self.child.user_can_edit(self.other))
+
+        member.role = GroupMember.Role.EDITOR
+        member.save()
+        self.assertTrue(self.child.user_can_edit(self.other))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            member.delete()
+        self.assertFalse(self.child.user_can_read(self.other))
+
+    def test_reparent_and_owner_change(self):
+        other_root = Board.objects.create(title="Чужая", owner=self.other)
+        self.child.parent = other_root
+        self.child.save()
+        self.assertTrue(self.grandchild.user_can_edit(self.other))
+        self.assertFalse(self.grandchild.user_can_read(self.owner))
+
+        other_root.owner = self.owner
+        other_root.save()
+        self.assertTrue(self.grandchild.user_can_edit(self.owner))
+        self.assertFalse(self.grandchild.user_can_read(self.other))
+
+
+class BoardHierarchyTests(TestCase):
+    def setUp(self):
+        self.root = Board.objects.create(title="Корень")
+        self.chain = [self.root]
+        for depth in range(1, 6):
+            self.chain.append(
+                Board.objects.create(title=f"Уровень {depth}", parent=self.chain[-1])
+            )
+
+    def test_ancestors_and_depth_single_query(self):
+        leaf = self.chain[-1]
+        with self.assertNumQueries(1):
+            self.assertEqual(leaf.get_ancestors(), self.chain)
+        with self.assertNumQueries(1):
+            self.assertEqual(leaf.get_depth(), 5)
+        with self.assertNumQueries(1):
+            self.assertEqual(set(self.root.get_descendants()), set(self.chain[1:]))
+
+    def test_cycle_detection(self):
+        self.root.parent = self.chain[3]
+        with self.assertNumQueries(1):
+            with self.assertRaises(ValidationError):
+                self.root.clean()
+        with self.assertRaises(ValidationError):
+            self.root.save()
+
+    def test_move_subtree(self):
+        other = Board.objects.create(title="Другой корень")
+        middle = self.chain[2]
+        middle.parent = other
+        middle.save()
+        self.assertEqual(self.chain[-1].get_ancestors(), [other] + self.chain[2:])
+        self.assertEqual(self.chain[-1].get_depth(), 4)
+        self.assertEqual(set(self.root.get_descendants()), {self.chain[1]})
+
+    def test_delete_subtree(self):
+        self.chain[1].delete()
+        self.assertEqual(list(Board.objects.all()), [self.root])
+        self.assertEqual(BoardClosure.objects.count(), 1)
+
+
+class BoardListTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="user", email="user@example.com", password="testpass123"
+        )
+        self.friend = CustomUser.objects.create_user(
+            username="friend", email="friend@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(self.user)
+        self.list_url = reverse("board-list")
+
+    def create_boards(self, count):
+        group = WorkGroup.objects.create(name=f"Группа {count}")
+        GroupMember.objects.create(
+            group=group, user=self.user, role=GroupMember.Role.EDITOR
+        )
+        for i in range(count):
+            own = Board.objects.create(title=f"Моя {i}", owner=self.user)
+            Board.objects.create(title=f"Вложенная {i}", parent=own)
+            Board.objects.create(title=f"Групповая {i}", owner=self.friend, group=group)
+            shared = Board.objects.create(title=f"Общая {i}", owner=self.friend)
+            BoardCollaborator.objects.create(
+                board=shared,
+                user=self.user,
+                access_level=BoardCollaborator.AccessLevel.VIEWER,
+                status=BoardCollaborator.Status.ACCEPTED,
+            )
+            BoardItem.objects.create(
+                board=own, item_type=BoardItem.ItemType.STICKER, geometry={}
+            )
+        Board.objects.create(title="Чужая", owner=self.friend)
+
+    def test_list_query_budget_is_constant(self):
+        self.create_boards(50)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 200)
+
+    def test_list_access_levels_and_counts(self):
+        self.create_boards(1)
+        response = self.client.get(self.list_url)
+        boards = {b["title"]: b for b in response.data}
+        self.assertNotIn("Чужая", boards)
+        self.assertEqual(boards["Моя 0"]["user_access_level"], "owner")
+        self.assertEqual(boards["Моя 0"]["items_count"], 1)
+        self.assertEqual(boards["Вложенная 0"]["user_access_level"], "editor")
+        self.assertEqual(boards["Групповая 0"]["user_access_level"], "editor")
+        self.assertEqual(boards["Общая 0"]["user_access_level"], "viewer")
+        self.assertEqual(boards["Общая 0"]["items_count"], 0)
+
+    def test_viewer_cannot_modify_through_viewset(self):
+        self.create_boards(1)
+        shared = Board.objects.get(title="Общая 0")
+        response = self.client.delete(reverse("board-detail", args=[shared.id]))
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(Board.objects.filter(id=shared.id).exists())
+
+    def test_only_owner_can_delete_through_viewset(self):
+        self.create_boards(1)
+        group_board = Board.objects.get(title="Групповая 0")
+        response = self.client.delete(reverse("board-detail", args=[group_board.id]))
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(Board.objects.filter(id=group_board.id).exists())
+
+        own = Board.objects.get(title="Моя 0")
+        response = self.client.delete(reverse("board-detail", args=[own.id]))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Board.objects.filter(title="Вложенная 0").exists())
+
+    def test_cyclic_parent_is_rejected(self):
+        own = Board.objects.create(title="Корень", owner=self.user)
+        child = Board.objects.create(title="Ребёнок", owner=self.user, parent=own)
+        grandchild = Board.objects.create(title="Внук", owner=self.user, parent=child)
+        closure = set(
+            BoardClosure.objects.values_list("ancestor", "descendant", "depth")
+        )
+        url = reverse("board-detail", args=[own.id])
+        for parent in (grandchild, own):
+            response = self.client.patch(url, {"parent_id": parent.id})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("parent_id", response.data)
+        own.refresh_from_db()
+        self.assertIsNone(own.parent_id)
+        self.assertEqual(
+            set(BoardClosure.objects.values_list("ancestor", "descendant", "depth")),
+            closure,
+        )
+
+    def test_parent_and_group_require_rights(self):
+        self.create_boards(1)
+        foreign = Board.objects.get(title="Чужая")
+        shared = Board.objects.get(title="Общая 0")
+        for parent in (foreign, shared):
+            response = self.client.post(
+                self.list_url, {"title": "Новая", "parent_id": parent.id}
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("parent_id", response.data)
+        self.assertFalse(Board.objects.filter(title="Новая").exists())
+
+        own = Board.objects.get(title="Моя 0")
+        response = self.client.patch(
+            reverse("board-detail", args=[own.id]), {"parent_id": foreign.id}
+        )
+        self.assertEqual(response.status_code, 400)
+        other_group = WorkGroup.objects.create(name="Чужая группа")
+        response = self.client.patch(
+            reverse("board-detail", args=[own.id]), {"group": other_group.id}
+        )
+        self.assertEqual(response.status_code, 400)
+        own.refresh_from_db()
+        self.assertIsNone(own.parent_id)
+        self.assertIsNone(own.group_id)
+
+        group_board = Board.objects.get(title="Групповая 0")
+        response = self.client.post(
+            self.list_url,
+            {
+                "title": "Новая",
+                "parent_id": group_board.id,
+                "group": group_board.group_id,
+            },
+        )
+        self.assertEqual(response.status_code, 201)
+        # Уже заданные родитель и группа не перепроверяются при правке названия
+        response = self.client.patch(
+            reverse("board-detail", args=[group_board.id]),
+            {"title": "Переименованная", "group": group_board.group_id},
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class NestedBoardItemTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="user", email="user@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(self.user)
+        self.board = Board.objects.create(title="Главная", owner=self.user)
+        for i in range(20):
+            child = Board.objects.create(title=f"Вложенная {i}", parent=self.board)
+            BoardItem.objects.create(
+                board=self.board,
+                item_type=BoardItem.ItemType.NESTED_BOARD,
+                geometry={},
+                content_payload=str(child.id),
+                linked_board=child,
+            )
+
+    def test_content_resolves_linked_titles_in_one_query(self):
+        url = reverse("board-content", args=[self.board.id])
+        # ETag, доска + её элементы вместе с привязанными досками
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        titles = {item["linked_board_title"] for item in response.data}
+        self.assertEqual(titles, {f"Вложенная {i}" for i in range(20)})
+
+    def test_deleting_tile_deletes_child_board(self):
+        item = BoardItem.objects.filter(board=self.board).first()
+        child_id = item.linked_board_id
+        response = self.client.post(reverse("delete_reminder_api"), {"id": item.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Board.objects.filter(id=child_id).exists())
+
+
+class BoardOperationsTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="user", email="user@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(self.user)
+        self.board = Board.objects.create(title="Доска", owner=self.user)
+        self.sticker = BoardItem.objects.create(
+            board=self.board,
+            item_type=BoardItem.ItemType.STICKER,
+            geometry={"x": 1, "y": 2, "width": 100},
+            style={"fill": "#fff", "stroke": "#000"},
+            content_payload="старый текст",
+        )
+        self.task = BoardItem.objects.create(
+            board=self.board, item_type=BoardItem.ItemType.TASK, geometry={}
+        )
+        TaskData.objects.create(item=self.task)
+        self.url = reverse("board_operations_api", args=[self.board.id])
+
+    def post_operations(self, operations):
+        return self.client.post(self.url, {"operations": operations}, format="json")
+
+    def test_apply_operations(self):
+        other = Board.objects.create(title="Чужая")
+        foreign = BoardItem.objects.create(
+            board=other, item_type=BoardItem.ItemType.TEXT, geometry={}
+        )
+        response = self.post_operations(
+            [
+                {"op": "move", "id": self.sticker.id, "geometry": {"x": 50, "y": 60}},
+                {"op": "restyle", "id": self.sticker.id, "style": {"stroke": None}},
+                {"op": "edit_text", "id": self.sticker.id, "text": "новый текст"},
+                {"op": "toggle_task", "id": self.task.id},
+                {"op": "move", "id": foreign.id, "geometry": {"x": 0}},
+            ]
+        )
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual(result["updated"], [self.sticker.id, self.task.id])
+        self.assertEqual(result["missing"], [foreign.id])
+
+        self.sticker.refresh_from_db()
+        self.assertEqual(self.sticker.geometry, {"x": 50, "y": 60, "width": 100})
+        self.assertEqual(self.sticker.style, {"fill": "#fff"})
+        self.assertEqual(self.sticker.content_payload, "новый текст")
+        self.assertTrue(TaskData.objects.get(item=self.task).is_completed)
+
+    def test_delete_and_validation(self):
+        response = self.post_operations([{"op": "move", "id": self.sticker.id}])
+        self.assertEqual(response.status_code, 400)
+
+        response = self.post_operations([{"op": "delete", "id": self.task.id}])
+        self.assertEqual(response.json()["deleted"], [self.task.id])
+        self.assertFalse(BoardItem.objects.filter(id=self.task.id).exists())
+
+    def test_deleting_tile_deletes_child_board_through_model(self):
+        child = Board.objects.create(title="Вложенная", parent=self.board)
+        tile = BoardItem.objects.create(
+            board=self.board,
+            item_type=BoardItem.ItemType.NESTED_BOARD,
+            geometry={},
+            linked_board=child,
+        )
+        image = StoredImage.objects.create(
+            sha256="0" * 64, original="images/orig.png", width=1, height=1
+        )
+        BoardItem.objects.create(
+            board=child, item_type=BoardItem.ItemType.IMAGE, geometry={}, image=image
+        )
+        response = self.post_operations([{"op": "delete", "id": tile.id}])
+        self.assertEqual(response.json()["deleted"], [tile.id])
+        self.assertFalse(Board.objects.filter(id=child.id).exists())
+        image.refresh_from_db()
+        self.assertEqual(image.ref_count, 0)
+
+    def test_child_board_is_kept_without_edit_rights(self):
+        child = Board.objects.create(title="Вложенная", parent=self.board)
+        tile = BoardItem.objects.create(
+            board=self.board,
+            item_type=BoardItem.ItemType.NESTED_BOARD,
+            geometry={},
+            linked_board=child,
+        )
+        with mock.patch.object(Board, "user_can_edit", return_value=False):
+            result = apply_board_operations(
+                self.board, [{"op": "delete", "id": tile.id}], self.user
+            )
+        self.assertEqual(result["deleted"], [tile.id])
+        self.assertTrue(Board.objects.filter(id=child.id).exists())
+
+
+class BoardRevisionTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="user", email="user@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(self.user)
+        self.board = Board.objects.create(title="Доска", owner=self.user)
+        self.first = BoardItem.objects.create(
+            board=self.board, item_type=BoardItem.ItemType.STICKER, geometry={}
+        )
+        self.second = BoardItem.objects.create(
+            board=self.board, item_type=BoardItem.ItemType.STICKER, geometry={}
+        )
+        self.operations_url = reverse("board_operations_api", args=[self.board.id])
+        self.changes_url = reverse("board_changes_api", args=[self.board.id])
+
+    def test_revisions_are_monotonic(self):
+        self.assertEqual((self.first.revision, self.second.revision), (1, 2))
+        self.board.title = "Новое имя"
+        self.board.save()
+        self.board.refresh_from_db()
+        self.assertEqual(self.board.revision, 2)
+
+    def test_stale_edit_reports_conflict(self):
+        base = self.first.revision
+        self.client.post(
+            self.operations_url,
+            {"operations": [{"op": "move", "id": self.first.id, "geometry": {"x": 1}}]},
+            format="json",
+        )
+        response = self.client.post(
+            self.operations_url,
+            {
+                "operations": [
+                    {
+                        "op": "move",
+                        "id": self.first.id,
+                        "geometry": {"x": 2},
+                        "revision": base,
+                    },
+                    {
+                        "op": "move",
+                        "id": self.second.id,
+                        "geometry": {"x": 3},
+                        "revision": self.second.revision,
+                    },
+                ]
+            },
+            format="json",
+        )
+        result = response.json()
+        self.assertEqual(result["updated"], [self.second.id])
+        self.assertEqual(result["conflicts"], [{"id": self.first.id, "revision": 3}])
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.geometry, {"x": 1})
+
+    def test_changes_since_revision(self):
+        since = self.second.revision
+        self.client.post(
+            self.operations_url,
+            {
+                "operations": [
+                    {"op": "edit_text", "id": self.first.id, "text": "привет"},
+                    {"op": "delete", "id": self.second.id},
+                ]
+            },
+            format="json",
+        )
+        response = self.client.get(self.changes_url, {"since": since})
+        result = response.json()
+        self.assertEqual([item["id"] for item in result["items"]], [self.first.id])
+        self.assertEqual(result["deleted"], [self.second.id])
+        self.assertEqual(result["revision"], 4)
+
+        response = self.client.get(self.changes_url, {"since": result["revision"]})
+        self.assertEqual(response.json()["items"], [])
+
+    def test_malformed_revision_is_rejected_per_item(self):
+        response = self.client.patch(
+            reverse("boarditem-detail", args=[self.first.id]),
+            {"style": {"fill": "red"}, "revision": "abc"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("revision", response.json())
+
+        response = self.client.post(
+            reverse("boarditem-bulk-update"),
+            {
+                "updates": [
+                    {"id": self.first.id, "style": {"a": 1}, "revision": "abc"},
+                    {"id": self.second.id, "style": {"b": 2}},
+                ]
+            },
+            format="json",
+        )
+        result = response.json()
+        self.assertEqual(result["updated_count"], 1)
+        self.assertEqual([entry["id"] for entry in result["invalid"]], [self.first.id])
+
+        stage = {
+            "children": [
+                {"attrs": {"id": self.first.id, "x": 5, "revision": "abc"}},
+                {"attrs": {"id": self.second.id, "x": 6}},
+            ]
+        }
+        response = self.client.post(
+            reverse("save_board_api"),
+            {"board_id": self.board.id, "board_data": stage},
+            format="json",
+        )
+        result = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(result["updated"], 1)
+        self.assertEqual([entry["id"] for entry in result["invalid"]], [self.first.id])
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.style, {})
+
+
+@override_settings(REALTIME_BACKEND="reminders.realtime.InProcessBackend")
+class BoardEventsTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="user", email="user@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(self.user)
+        self.board = Board.objects.create(title="Доска", owner=self.user)
+        self.item = BoardItem.objects.create(
+            board=self.board, item_type=BoardItem.ItemType.STICKER, geometry={}
+        )
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def subscribe(self):
+        async def subscribe():
+            return get_backend().subscribe(self.board.id)
+
+        queue = self.loop.run_until_complete(subscribe())
+        self.addCleanup(get_backend().unsubscribe, self.board.id, queue)
+        return queue
+
+    def drain(self, queue):
+        # Даём отработать call_soon_threadsafe из dispatch
+        self.loop.run_until_complete(asyncio.sleep(0))
+        events = []
+        while not queue.empty():
+            events.append(queue.get_nowait())
+        return events
+
+    def test_operations_publish_delta_after_commit(self):
+        queue = self.subscribe()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("board_operations_api", args=[self.board.id]),
+                {"operations": [{"op": "delete", "id": self.item.id}]},
+                format="json",
+            )
+        [event] = self.drain(queue)
+        self.assertEqual(event["type"], "board_changed")
+        self.assertEqual(event["deleted"], [self.item.id])
+        self.assertEqual(event["revision"], 2)
+
+    def test_item_viewset_publishes(self):
+        queue = self.subscribe()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                reverse("boarditem-detail", args=[self.item.id]),
+                {"content_payload": "текст"},
+                format="json",
+            )
+        [event] = self.drain(queue)
+        self.assertEqual(event["changed"], [self.item.id])
+
+    def test_slow_subscriber_gets_resync(self):
+        queue = self.subscribe()
+        backend = get_backend()
+        for _ in range(backend.QUEUE_SIZE + 1):
+            backend.dispatch(
+                self.board.id, {"type": "board_changed", "board_id": self.board.id}
+            )
+        events = self.drain(queue)
+        self.assertEqual(events, [{"type": "resync", "board_id": self.board.id}])
+
+    def test_events_require_access(self):
+        stranger = CustomUser.objects.create_user(
+            username="stranger", email="stranger@example.com", password="pass12345"
+        )
+        self.client.force_login(stranger)
+        response = self.client.get(reverse("board_events", args=[self.board.id]))
+        self.assertEqual(response.status_code, 403)
+
+
+class BoardPayloadCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username="user", email="user@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(self.user)
+        self.board = Board.objects.create(title="Доска", owner=self.user)
+        self.item = BoardItem.objects.create(
+            board=self.board, item_type=BoardItem.ItemType.STICKER, geometry={}
+        )
+        self.content_url = reverse("board-content", args=[self.board.id])
+
+    def test_unchanged_board_is_served_from_cache(self):
+        first = self.client.get(self.content_url).json()
+        # ETag и сама доска, элементы — из кэша
+        with self.assertNumQueries(2):
+            second = self.client.get(self.content_url).json()
+        self.assertEqual(first, second)
+        self.assertEqual(board_payload_cache_stats()["hits"], 1)
+        self.assertEqual(board_payload_cache_stats()["misses"], 1)
+
+    def test_writes_change_cache_key(self):
+        self.client.get(self.content_url)
+        self.item.content_payload = "новый текст"
+        self.item.save()
+        response = self.client.get(self.content_url)
+        self.assertEqual(response.json()[0]["content_payload"], "новый текст")
+
+        child = Board.objects.create(title="Старое", owner=self.user, parent=self.board)
+        BoardItem.objects.create(
+            board=self.board,
+            item_type=BoardItem.ItemType.NESTED_BOARD,
+            geometry={},
+            linked_board=child,
+        )
+        self.client.get(self.content_url)
+        child.title = "Новое"
+        child.save()
+        titles = [
+            item.get("linked_board_title")
+            for item in self.client.get(self.content_url).json()
+        ]
+        self.assertIn("Новое", titles)
+        self.assertEqual(board_payload_cache_stats()["hits"], 0)
+
+
+class BoardETagTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="user", email="user@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(self.user)
+        self.board = Board.objects.create(title="Доска", owner=self.user)
+        self.item = BoardItem.objects.create(
+            board=self.board, item_type=BoardItem.ItemType.STICKER, geometry={}
+        )
+
+    def assert_revalidates(self, url):
+        response = self.client.get(url)
+        etag = response["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        return etag
+
+    def test_unchanged_board_returns_304(self):
+        for name, pk in (
+            ("board-detail", self.board.id),
+            ("board-content", self.board.id),
+            ("boarditem-detail", self.item.id),
+        ):
+            with self.subTest(name):
+                self.assert_revalidates(reverse(name, args=[pk]))
+
+    def test_write_changes_etag(self):
+        url = reverse("board-content", args=[self.board.id])
+        etag = self.assert_revalidates(url)
+        BoardItem.objects.create(
+            board=self.board, item_type=BoardItem.ItemType.TEXT, geometry={}
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_no_etag_without_access(self):
+        stranger = CustomUser.objects.create_user(
+            username="stranger", email="stranger@example.com", password="pass12345"
+        )
+        etag = self.client.get(reverse("board-content", args=[self.board.id]))["ETag"]
+        self.client.force_authenticate(stranger)
+        response = self.client.get(
+            reverse("board-content", args=[self.board.id]), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class BoardStreamingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            username="user", email="user@example.com", password="testpass123"
+        )
+        cls.board = Board.objects.create(title="Доска", owner=cls.user)
+        BoardItem.objects.bulk_create(
+            BoardItem(
+                board=cls.board,
+                item_type=BoardItem.ItemType.DRAWING,
+                geometry={"points": [i, i + 1]},
+            )
+            for i in range(1203)
+        )
+
+    async def test_content_streams_json_array(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            reverse("board-content", args=[self.board.id]), {"stream": 1}
+        )
+        self.assertTrue(response.streaming)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertGreater(len(chunks), 3)
+        items = json.loads(b"".join(chunks))
+        self.assertEqual(len(items), 1203)
+        self.assertEqual(items[-1]["geometry"], {"points": [1202, 1203]})
+
+    def test_large_board_page_defers_items(self):
+        self.client.force_login(self.user)
+        with mock.patch("reminders.views.BOARD_STREAM_THRESHOLD", 1000):
+            response = self.client.get(reverse("board_page", args=[self.board.id]))
+        self.assertNotIn("items", json.loads(response.context["board_data_json"]))
+        self.assertTrue(response.context["board_items_url"].endswith("?stream=1"))
+
+
+class BoardViewportTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="user", email="user@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(self.user)
+        self.board = Board.objects.create(title="Доска", owner=self.user)
+        self.url = reverse("board_items_api", args=[self.board.id])
+
+    def create_item(self, **geometry):
+        return BoardItem.objects.create(
+            board=self.board, item_type=BoardItem.ItemType.DRAWING, geometry=geometry
+        )
+
+    def test_bbox_follows_konva_transform(self):
+        line = self.create_item(x=10, y=20, points=[0, 0, 50, -10], scaleX=2)
+        self.assertEqual(
+            (line.bbox_min_x, line.bbox_min_y, line.bbox_max_x, line.bbox_max_y),
+            (10, 10, 110, 20),
+        )
+        rect = self.create_item(x=100, y=0, width=40, height=20, rotation=90)
+        self.assertAlmostEqual(rect.bbox_min_x, 80)
+        self.assertAlmostEqual(rect.bbox_max_y, 40)
+
+    def test_viewport_query(self):
+        near = self.create_item(x=10, y=10, width=100, height=100)
+        self.create_item(x=5000, y=5000, width=10, height=10)
+        moved = self.create_item(x=5000, y=0, width=10, height=10)
+        self.client.post(
+            reverse("board_operations_api", args=[self.board.id]),
+            {"operations": [{"op": "move", "id": moved.id, "geometry": {"x": 50}}]},
+            format="json",
+        )
+
+        response = self.client.get(self.url, {"bbox": "0,0,200,200"})
+        ids = {item["id"] for item in response.json()["items"]}
+        self.assertEqual(ids, {near.id, moved.id})
+
+        response = self.client.get(self.url, {"bbox": "10,10,0,0"})
+        self.assertEqual(response.status_code, 400)
+
+
+class DrawingPointsStorageTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="user", email="user@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(self.user)
+        self.board = Board.objects.create(title="Доска", owner=self.user)
+
+    def test_points_round_trip_through_blob(self):
+        points = [10, 20.5, 10.25, 21, -3000.75, 40000]
+        item = BoardItem.objects.create(
+            board=self.board,
+            item_type=BoardItem.ItemType.DRAWING,
+            geometry={"x": 5, "points": points},
+        )
+        self.assertEqual(item.geometry["points"], points)
+        stored = BoardItem.objects.values_list("geometry", flat=True).get(pk=item.pk)
+        self.assertEqual(stored, {"x": 5})
+
+        response = self.client.get(reverse("boarditem-detail", args=[item.id]))
+        self.assertEqual(response.json()["geometry"]["points"], points)
+
+        item.refresh_from_db()
+        item.geometry["points"] = [0, 0, 1, 1]
+        BoardItem.objects.bulk_update([item], ["geometry"])
+        item = BoardItem.objects.get(pk=item.pk)
+        self.assertEqual(item.geometry, {"x": 5, "points": [0, 0, 1, 1]})
+        self.assertEqual(item.bbox_max_x, 6)
+
+    def test_unpackable_points_stay_in_json(self):
+        item = BoardItem.objects.create(
+            board=self.board,
+            item_type=BoardItem.ItemType.ARROW,
+            geometry={"points": [1, 2, 3]},
+        )
+        self.assertIsNone(BoardItem.objects.get(pk=item.pk).points_blob)
+        self.assertEqual(
+            BoardItem.objects.get(pk=item.pk).geometry, {"points": [1, 2, 3]}
+        )
+
+
+class StrokeSimplificationTests(APITestCase):
+    # Почти прямая линия с дрожанием меньше пикселя и одним изломом
+    STROKE = [0, 0, 10, 0.3, 20, -0.2, 30, 0.1, 40, 0, 40, 10, 40, 20.4, 40, 30]
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="user", email="user@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(self.user)
+        self.board = Board.objects.create(
+            title="Доска", owner=self.user, settings={"strokeTolerance": 1}
+        )
+
+    def test_simplify_points(self):
+        self.assertEqual(simplify_points(self.STROKE, 1), [0, 0, 40, 0, 40, 30])
+        # Точки на вертикальном отрезке лежат ровно на прямой
+        self.assertEqual(
+            simplify_points(self.STROKE, 0.05), self.STROKE[:10] + [40, 30]
+        )
+        self.assertEqual(simplify_points(self.STROKE, None), self.STROKE)
+
+    def test_create_and_save_simplify_drawings(self):
+        response = self.client.post(
+            reverse("create_reminder_api"),
+            {
+                "board_id": self.board.id,
+                "item_type": "drawing",
+                "geometry": {"x": 0, "y": 0, "points": self.STROKE},
+            },
+            format="json",
+        )
+        item = BoardItem.objects.get(pk=response.json()["id"])
+        self.assertEqual(item.geometry["points"], [0, 0, 40, 0, 40, 30])
+
+        stage = {
+            "attrs": {},
+            "children": [
+                {"attrs": {"id": str(item.id), "points": self.STROKE + [0, 30]}}
+            ],
+        }
+        self.client.post(
+            reverse("save_board_api"),
+            {"board_id": self.board.id, "board_data": stage},
+            format="json",
+        )
+        item.refresh_from_db()
+        self.assertEqual(item.geometry["points"], [0, 0, 40, 0, 40, 30, 0, 30])
+
+    def test_command_simplifies_existing_drawings(self):
+        item = BoardItem.objects.create(
+            board=self.board,
+            item_type=BoardItem.ItemType.DRAWING,
+            geometry={"points": self.STROKE},
+        )
+        call_command("simplify_drawings", stdout=io.StringIO())
+        item.refresh_from_db()
+        self.assertEqual(item.geometry["points"], [0, 0, 40, 0, 40, 30])
+        self.assertGreater(item.revision, 1)
+
+
+class DashboardSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username="user", email="user@example.com", password="testpass123"
+        )
+        self.owner = CustomUser.objects.create_user(
+            username="owner", email="owner@example.com", password="testpass123"
+        )
+        self.own = Board.objects.create(title="Моя", owner=self.user)
+        Board.objects.create(title="Вложенная", owner=self.user, parent=self.own)
+        group = WorkGroup.objects.create(name="Команда")
+        GroupMember.objects.create(group=group, user=self.user)
+        self.shared = Board.objects.create(title="Общая", owner=self.owner, group=group)
+        self.invited = Board.objects.create(title="Приглашение", owner=self.owner)
+        self.invite = BoardCollaborator.objects.create(
+            board=self.invited, user=self.user
+        )
+        item = BoardItem.objects.create(
+            board=self.own, item_type=BoardItem.ItemType.TASK, geometry={}
+        )
+        self.task = TaskData.objects.create(item=item, assigned_to=self.user)
+
+    def summary(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return get_dashboard_summary(self.user)
+
+    def test_summary_is_cached(self):
+        with self.assertNumQueries(3):
+            summary = self.summary()
+        self.assertEqual([b["title"] for b in summary["my_boards"]], ["Моя"])
+        self.assertEqual([b["title"] for b in summary["shared_boards"]], ["Общая"])
+        self.assertEqual([t["id"] for t in summary["my_tasks"]], [self.task.id])
+        self.assertEqual(
+            [i["board_id"] for i in summary["invitations"]], [self.invited.id]
+        )
+        with self.assertNumQueries(0):
+            self.summary()
+
+    def test_changes_invalidate_summary(self):
+        self.summary()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.invite.status = BoardCollaborator.Status.ACCEPTED
+            self.invite.save()
+        summary = self.summary()
+        self.assertEqual(summary["invitations"], [])
+        self.assertEqual(len(summary["shared_boards"]), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.is_completed = True
+            self.task.save()
+        self.assertEqual(self.summary()["my_tasks"], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shared.title = "Переименована"
+            self.shared.save()
+        titles = {b["title"] for b in self.summary()["shared_boards"]}
+        self.assertIn("Переименована", titles)
+
+
+class TwoTierCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_local_tier_serves_repeated_reads(self):
+        cache.set("key", {"value": 1})
+        before = cache_stats()
+        self.assertEqual(cache.get("key"), {"value": 1})
+        after = cache_stats()
+        self.assertEqual(after["local_hits"], before["local_hits"] + 1)
+        self.assertEqual(after["shared_hits"], before["shared_hits"])
+
+        # Другой воркер: локальный уровень пуст, значение приходит из общего
+        cache._store.clear()
+        self.assertEqual(cache.get("key"), {"value": 1})
+        self.assertEqual(cache_stats()["shared_hits"], after["shared_hits"] + 1)
+        self.assertEqual(cache.get("missing", "default"), "default")
+        self.assertEqual(cache_stats()["shared_misses"], after["shared_misses"] + 1)
+
+    def test_returned_values_are_copies(self):
+        cache.set("key", [1, 2])
+        cache.get("key").append(3)
+        self.assertEqual(cache.get("key"), [1, 2])
+
+    def test_local_tier_is_bounded_lru(self):
+        small = TwoTierCache("test-lru", {"OPTIONS": {"MAX_ENTRIES": 2}})
+        small._store.clear()
+        small.set("a", 1)
+        small.set("b", 2)
+        small.get("a")
+        small.set("c", 3)
+        self.assertEqual([key.split(":")[-1] for key in small._store], ["a", "c"])
+        # Вытесненное значение остаётся в общем уровне
+        self.assertEqual(small.get("b"), 2)
+
+    def test_bump_changes_versioned_key(self):
+        key = versioned_key("test", 1, "part")
+        self.assertEqual(versioned_key("test", 1, "part"), key)
+        cache.set(key, "old")
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_versions("test", [1])
+        new_key = versioned_key("test", 1, "part")
+        self.assertNotEqual(new_key, key)
+        self.assertIsNone(cache.get(new_key))
+        self.assertNotEqual(versioned_key("test", 2, "part"), new_key)
+
+    def test_user_backend_cache_is_invalidated_on_save(self):
+        from users.backends import CachedModelBackend
+
+        user = CustomUser.objects.create_user(
+            username="user", email="user@example.com", password="testpass123"
+        )
+        backend = CachedModelBackend()
+        backend.get_user(user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(backend.get_user(user.pk).username, "user")
+
+        user.first_name = "Имя"
+        user.save()
+        self.assertEqual(backend.get_user(user.pk).first_name, "Имя")
+
+    def test_stats_endpoint_is_staff_only(self):
+        user = CustomUser.objects.create_user(
+            username="user", email="user@example.com", password="testpass123"
+        )
+        self.client.force_login(user)
+        response = self.client.get(reverse("cache_stats_api"))
+        self.assertEqual(response.status_code, 403)
+
+        user.is_staff = True
+        user.save()
+        response = self.client.get(reverse("cache_stats_api"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("local_hits", response.json()["default"])
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username="user", email="user@example.com", password="testpass123"
+        )
+        self.board = Board.objects.create(title="Доска", owner=self.user)
+        for index in range(30):
+            item = BoardItem.objects.create(
+                board=self.board,
+                item_type=BoardItem.ItemType.TASK,
+                geometry={"x": index, "y": 0, "width": 100, "height": 100},
+            )
+            TaskData.objects.create(item=item, assigned_to=self.user)
+        self.client.force_login(self.user)
+
+    def test_endpoints_stay_within_budgets(self):
+        board_urls = {
+            "board_page": reverse("board_page", args=[self.board.id]),
+            "board-detail": reverse("board-detail", args=[self.board.id]),
+            "board-content": reverse("board-content", args=[self.board.id]),
+            "board-list": reverse("board-list"),
+            "dashboard_page": reverse("dashboard_page"),
+        }
+        for view_name, url in board_urls.items():
+            with self.subTest(view_name), self.assertQueryBudget(view_name):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+        stage = {
+            "children": [
+                {"attrs": {"id": str(item.id), "x": 5, "y": 5}}
+                for item in self.board.items.all()
+            ]
+        }
+        with self.assertQueryBudget("save_board_api"):
+            response = self.client.post(
+                reverse("save_board_api"),
+                {"board_id": self.board.id, "board_data": json.dumps(stage)},
+                content_type="application/json",
+            )
+        self.assertEqual(response.json()["updated"], 30)
+
+    def test_repeated_queries_point_to_call_site(self):
+        with QueryRecorder(repeat_threshold=3).record() as recorder:
+            for item in self.board.items.all():
+                item.task_data.is_completed
+        count, sql, call_site = recorder.repeated()[0]
+        self.assertEqual(count, 30)
+        self.assertIn("reminders_taskdata", sql)
+        self.assertTrue(call_site.startswith("reminders/tests.py:"))
+
+    @override_settings(QUERY_BUDGETS={"default": 1})
+    def test_middleware_warns_over_budget(self):
+        url = reverse("board-detail", args=[self.board.id])
+        response = self.client.get(url)
+        self.assertNotIn("Server-Timing", response)
+
+        with override_settings(QUERY_BUDGET_ENABLED=True), self.assertLogs(
+            "reminders.query_budget", "WARNING"
+        ) as logs:
+            response = self.client.get(url)
+        self.assertIn("queries", response["Server-Timing"])
+        self.assertIn("board-detail exceeded its query budget (1)", logs.output[0])
+
+    @override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGETS={"default": 0})
+    async def test_async_requests_are_counted(self):
+        await self.async_client.aforce_login(self.user)
+        url = reverse("board-detail", args=[self.board.id])
+        with self.assertLogs("reminders.query_budget", "WARNING"):
+            response = await self.async_client.get(url)
+        self.assertNotIn('desc="0 queries"', response["Server-Timing"])
+
+    def test_header_is_honoured_for_staff_only(self):
+        url = reverse("board-list")
+        response = self.client.get(url, HTTP_X_QUERY_BUDGET="1")
+        self.assertNotIn("Server-Timing", response)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(url, HTTP_X_QUERY_BUDGET="1")
+        self.assertIn("Server-Timing", response)
+
+
+@override_settings(METRICS_TOKEN="secret")
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics._views.clear()
+        metrics._state.update(slot=None, token=None)
+        self.user = CustomUser.objects.create_user(
+            username="user", email="user@example.com", password="testpass123"
+        )
+        self.client.force_login(self.user)
+
+    def scrape(self):
+        response = self.client.get(
+            reverse("metrics_api"), HTTP_AUTHORIZATION="Bearer secret"
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode().splitlines()
+
+    def test_requests_are_recorded_per_view(self):
+        Board.objects.create(title="Доска", owner=self.user)
+        self.client.get(reverse("board-list"))
+        self.client.get(reverse("board-list"))
+        self.client.get("/no-such-page/")
+        lines = self.scrape()
+        self.assertIn(
+            'reminders_http_request_duration_seconds_count{view="board-list"} 2', lines
+        )
+        self.assertIn(
+            'reminders_http_responses_total{view="<unresolved>",status="4xx"} 1', lines
+        )
+        queries = next(
+            line
+            for line in lines
+            if line.startswith('reminders_http_db_queries_total{view="board-list"}')
+        )
+        self.assertGreater(int(queries.split()[-1]), 0)
+
+    def test_snapshots_of_all_processes_are_summed(self):
+        self.client.get(reverse("board-list"))
+        metrics.flush()
+        # Снимок другого воркера в своём слоте
+        shared = cache.shared
+        other_slot = shared.incr(metrics.SLOTS_KEY)
+        shared.set(f"metrics:slot:{other_slot}", metrics.snapshot())
+        lines = self.scrape()
+        self.assertIn(
+            'reminders_http_request_duration_seconds_count{view="board-list"} 2', lines
+        )
+        self.assertIn("reminders_metrics_processes 2", lines)
+
+    def test_stale_slots_are_retired_and_reused(self):
+        self.client.get(reverse("board-list"))
+        metrics.flush()
+        dead_slot = metrics._state["slot"]
+        # Процесс замолчал: его снимок устарел
+        shared = cache.shared
+        snap = shared.get(f"metrics:slot:{dead_slot}")
+        snap["updated"] -= metrics.SLOT_STALE_AFTER + 1
+        shared.set(f"metrics:slot:{dead_slot}", snap, timeout=None)
+        count = 'reminders_http_request_duration_seconds_count{view="board-list"} 1'
+
+        metrics.reap_slots()
+        live, retired = metrics.collect_snapshots()
+        self.assertEqual(live, [])
+        self.assertGreater(retired["views"]["board-list"]["latency_sum"], 0)
+        self.assertIsNone(shared.get(f"metrics:slot:{dead_slot}:owner"))
+
+        # Ожившему процессу слот уже не принадлежит: счёт с нуля, сумма не меняется
+        lines = self.scrape()
+        self.assertIn(count, lines)
+        self.assertIn("reminders_metrics_processes 1", lines)
+        # Освобождённый слот занят снова, новые слоты не выдаются
+        self.assertEqual(metrics._state["slot"], dead_slot)
+        self.assertEqual(shared.get(metrics.SLOTS_KEY), 1)
+
+    def test_retired_slot_is_not_counted_twice(self):
+        self.client.get(reverse("board-list"))
+        metrics.flush()
+        slot = metrics._state["slot"]
+        shared = cache.shared
+        snap = shared.get(f"metrics:slot:{slot}")
+        # Сумма уже записана, а снимок ещё не удалён
+        shared.set(
+            metrics.RETIRED_KEY,
+            {"views": snap["views"], "cache": {}, "folded": {slot: snap["updated"]}},
+            timeout=None,
+        )
+        live, retired = metrics.collect_snapshots()
+        self.assertEqual(live, [])
+        self.assertEqual(
+            metrics._merge([retired, *live])["board-list"]["latency"],
+            snap["views"]["board-list"]["latency"],
+        )
+
+    def test_queue_gauges(self):
+        enqueue_mail("Тема", "Текст", ["to@example.com"])
+        self.assertIn('reminders_outbox_emails{status="pending"} 1', self.scrape())
+
+    def test_access_requires_token_or_staff(self):
+        self.assertEqual(self.client.get(reverse("metrics_api")).status_code, 403)
+        self.client.logout()
+        response = self.client.get(
+            reverse("metrics_api"), HTTP_AUTHORIZATION="Bearer wrong"
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_results_are_saved_and_fixtures_rolled_back(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = f"{directory}/bench.json"
+            call_command(
+                "benchmark_endpoints",
+                items="30",
+                depths="3",
+                groups=2,
+                repeat=2,
+                output=output,
+                stdout=io.StringIO(),
+            )
+            with open(output, encoding="utf-8") as result_file:
+                report = json.load(result_file)
+
+        endpoints = {row["endpoint"] for row in report["results"]}
+        self.assertEqual(
+            endpoints,
+            {
+                "board_page",
+                "save_board_api",
+                "dashboard_page",
+                "BoardViewSet.list",
+                "BoardViewSet.retrieve",
+                "BoardViewSet.content",
+            },
+        )
+        for row in report["results"]:
+            self.assertLess(row["status"], 400)
+            self.assertGreater(row["queries_cold"], 0)
+            self.assertGreater(row["peak_memory_kb"], 0)
+        self.assertFalse(Board.objects.exists())
+        self.assertFalse(CustomUser.objects.exists())
+
+
+class DueReminderTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="user", email="user@example.com", password="testpass123"
+        )
+        self.board = Board.objects.create(title="Доска", owner=self.user)
+        self.now = timezone.now()
+
+    def create_task(self, due_in, **kwargs):
+        item = BoardItem.objects.create(
+            board=self.board,
+            item_type=BoardItem.ItemType.TASK,
+            geometry={},
+            content_payload="Сдать отчёт",
+        )
+        return TaskData.objects.create(
+            item=item,
+            assigned_to=self.user,
+            due_date=self.now + due_in,
+            **kwargs,
+        )
+
+    def test_command_sends_each_reminder_once(self):
+        self.create_task(timedelta(minutes=-5))
+        self.create_task(timedelta(minutes=-5), is_completed=True)
+        self.create_task(timedelta(hours=3))
+        call_command("send_due_reminders", "--once", stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("Сдать отчёт", mail.outbox[0].subject)
+
+        call_command("send_due_reminders", "--once", stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_dispatcher_picks_up_changes_incrementally(self):
+        dispatcher = DueReminderDispatcher(batch_size=2)
+        tasks = [self.create_task(timedelta(minutes=10)) for _ in range(3)]
+        dispatcher.refresh(self.now)
+        self.assertEqual(len(dispatcher.heap), 3)
+
+        # Срок перенесли, а одну задачу закрыли пакетной записью
+        tasks[0].due_date = self.now + timedelta(minutes=1)
+        tasks[0].save()
+        tasks[1].is_completed = True
+        TaskData.objects.bulk_update([tasks[1]], ["is_completed"])
+
+        with self.assertNumQueries(3):
+            sent = dispatcher.run_once(self.now + timedelta(minutes=2))
+        self.assertEqual(sent, 1)
+        self.assertEqual(mail.outbox[0].to, ["user@example.com"])
+
+        self.assertEqual(dispatcher.run_once(self.now + timedelta(minutes=11)), 1)
+        self.assertEqual(len(mail.outbox), 2)
+
+
+class ImageStorageTests(APITestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, IMAGE_POOL_WORKERS=0
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = CustomUser.objects.create_user(
+            username="user", email="user@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(self.user)
+        self.board = Board.objects.create(title="Доска", owner=self.user)
+
+    def upload(self, color="red", size=(1200, 600)):
+        buffer = io.BytesIO()
+        Image.new("RGB", size, color).save(buffer, "PNG")
+        upload = SimpleUploadedFile(
+            "picture.png", buffer.getvalue(), content_type="image/png"
+        )
+        response = self.client.post(
+            reverse("upload_image_api"), {"image": upload}, format="multipart"
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()["image"]
+
+    def create_item(self, image_id, board=None, width=300, height=150):
+        response = self.client.post(
+            reverse("create_reminder_api"),
+            {
+                "board_id": (board or self.board).id,
+                "item_type": BoardItem.ItemType.IMAGE,
+                "image": image_id,
+                "geometry": {"x": 0, "y": 0, "width": width, "height": height},
+            },
+            format="json",
+        )
+        return BoardItem.objects.get(id=response.json()["id"])
+
+    def test_same_image_is_stored_once(self):
+        first = self.upload()
+        second = self.upload()
+        self.assertEqual(first["id"], second["id"])
+
+        image = StoredImage.objects.get()
+        self.assertEqual((image.width, image.height), (1200, 600))
+        self.assertEqual(
+            [variant[:2] for variant in image.variants],
+            [[256, 128], [512, 256], [1024, 512]],
+        )
+        for name in [image.original, *(v[2] for v in image.variants)]:
+            self.assertTrue(default_storage.exists(name))
+
+    def test_serializer_picks_fitting_variant(self):
+        image_id = self.upload()["id"]
+        item = self.create_item(image_id)
+        response = self.client.get(reverse("boarditem-detail", args=[item.id]))
+        self.assertTrue(response.data["image_url"].endswith("/512.webp"))
+        self.assertTrue(response.data["image_original_url"].endswith("/orig.png"))
+
+        item.geometry["scaleX"] = item.geometry["scaleY"] = 10
+        item.save()
+        response = self.client.get(reverse("boarditem-detail", args=[item.id]))
+        self.assertEqual(
+            response.data["image_url"], response.data["image_original_url"]
+        )
+
+    def test_reference_counting_and_collection(self):
+        image_id = self.upload()["id"]
+        other_board = Board.objects.create(title="Другая", owner=self.user)
+        first = self.create_item(image_id)
+        self.create_item(image_id, board=other_board)
+        self.assertEqual(StoredImage.objects.get().ref_count, 2)
+
+        first.delete()
+        other_board.delete()
+        image = StoredImage.objects.get()
+        self.assertEqual(image.ref_count, 0)
+
+        # Свежую картинку не трогаем: её могли загрузить и ещё не вставить
+        call_command("collect_images", stdout=io.StringIO())
+        self.assertTrue(StoredImage.objects.exists())
+
+        StoredImage.objects.update(created_at=timezone.now() - UNUSED_GRACE * 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("collect_images", stdout=io.StringIO())
+        self.assertFalse(StoredImage.objects.exists())
+        self.assertFalse(default_storage.exists(image.original))
+
+    def test_rejects_decompression_bomb(self):
+        # Несколько килобайт PNG, но 90 Мп после декодирования
+        buffer = io.BytesIO()
+        Image.new("1", (10000, 9000)).save(buffer, "PNG")
+        upload = SimpleUploadedFile(
+            "bomb.png", buffer.getvalue(), content_type="image/png"
+        )
+        response = self.client.post(
+            reverse("upload_image_api"), {"image": upload}, format="multipart"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "Could not read image")
+        self.assertFalse(StoredImage.objects.exists())
+
+    def test_foreign_image_cannot_be_placed(self):
+        image_id = self.upload()["id"]
+        other = CustomUser.objects.create_user(
+            username="other", email="other@example.com", password="testpass123"
+        )
+        other_board = Board.objects.create(title="Чужая", owner=other)
+        self.client.force_authenticate(other)
+        image_item = {"item_type": BoardItem.ItemType.IMAGE, "image": image_id}
+
+        response = self.client.post(
+            reverse("create_reminder_api"),
+            {"board_id": other_board.id, **image_item},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("image", response.json()["error"])
+        response = self.client.post(
+            reverse("create_items_api", args=[other_board.id]),
+            {"items": [image_item]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        sticker = BoardItem.objects.create(
+            board=other_board, item_type=BoardItem.ItemType.STICKER, geometry={}
+        )
+        response = self.client.patch(
+            reverse("boarditem-detail", args=[sticker.id]),
+            {"image": image_id},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(BoardItem.objects.filter(image_id=image_id).exists())
+
+        # Картинку с доступной доски можно скопировать к себе
+        self.client.force_authenticate(self.user)
+        self.create_item(image_id)
+        BoardCollaborator.objects.create(
+            board=self.board, user=other, status=BoardCollaborator.Status.ACCEPTED
+        )
+        self.client.force_authenticate(other)
+        response = self.client.post(
+            reverse("create_items_api", args=[other_board.id]),
+            {"items": [image_item]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class InviteContactsTests(APITestCase):
+    def setUp(self):
+        self.users = {
+            name: CustomUser.objects.create_user(
+                username=name, email=f"{name}@example.com", password="testpass123"
+            )
+            for name in ("me", "alice", "bob", "carol", "stranger")
+        }
+        self.me = self.users["me"]
+        self.client.force_authenticate(self.me)
+
+        # С alice две общие доски, с bob — группа, carol уже на целевой доске
+        for title in ("Первая", "Вторая"):
+            board = Board.objects.create(title=title, owner=self.me)
+            self.share(board, self.users["alice"])
+        group = WorkGroup.objects.create(name="Команда")
+        GroupMember.objects.create(group=group, user=self.me)
+        GroupMember.objects.create(group=group, user=self.users["bob"])
+        self.target = Board.objects.create(title="Цель", owner=self.me)
+        self.share(self.target, self.users["carol"])
+        self.url = reverse("search_users_for_invite", args=[self.target.id])
+
+    def share(self, board, user):
+        BoardCollaborator.objects.create(
+            board=board, user=user, status=BoardCollaborator.Status.ACCEPTED
+        )
+
+    def search(self, query=""):
+        response = self.client.get(self.url, {"q": query})
+        return [user["username"] for user in response.json()["users"]]
+
+    def test_contacts_follow_access_changes(self):
+        weights = dict(
+            UserContact.objects.filter(user=self.me).values_list(
+                "contact__username", "weight"
+            )
+        )
+        # Доски «Первая», «Вторая» и «Цель» (у carol) плюс группа у bob
+        self.assertEqual(weights, {"alice": 2, "bob": 1, "carol": 1})
+        self.assertTrue(
+            UserContact.objects.filter(user=self.users["alice"], contact=self.me)
+        )
+
+        BoardCollaborator.objects.filter(user=self.users["alice"]).delete()
+        GroupMember.objects.filter(user=self.users["bob"]).delete()
+        self.assertEqual(
+            list(
+                UserContact.objects.filter(user=self.me).values_list(
+                    "contact__username", flat=True
+                )
+            ),
+            ["carol"],
+        )
+
+    def test_pending_invitation_links_contacts(self):
+        # Ожидающее приглашение — контакт и для владельца, и для приглашённого
+        invite = BoardCollaborator.objects.create(
+            board=Board.objects.get(title="Первая"), user=self.users["stranger"]
+        )
+        self.assertEqual(
+            set(
+                UserContact.objects.filter(user=self.users["stranger"]).values_list(
+                    "contact__username", flat=True
+                )
+            ),
+            {"me", "alice"},
+        )
+        self.assertIn("stranger", self.search())
+
+        invite.delete()
+        self.assertNotIn("stranger", self.search())
+        self.assertFalse(UserContact.objects.filter(user=self.users["stranger"]))
+
+    def test_search_is_ranked_and_excludes_board_members(self):
+        with self.assertNumQueries(2):  # доска и контакты
+            self.assertEqual(self.search(), ["alice", "bob"])
+        self.assertEqual(self.search("BO"), ["bob"])
+        self.assertEqual(self.search("example.com"), ["alice", "bob"])
+        self.assertEqual(self.search("stranger"), [])
+
+        self.users["bob"].first_name = "Роберт"
+        self.users["bob"].save()
+        self.assertEqual(self.search("роберт"), ["bob"])
+
+
+class RecoverMiddleware:
+    """process_exception для ProfilingTests: ошибка представления — ответ 503."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        return HttpResponse(str(exception), status=503)
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.admin = CustomUser.objects.create_superuser(
+            username="admin", email="admin@example.com", password="testpass123"
+        )
+        self.user = CustomUser.objects.create_user(
+            username="user", email="user@example.com", password="testpass123"
+        )
+        Board.objects.create(title="Доска", owner=self.admin)
+
+    def test_staff_can_request_profile(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("board-list"), HTTP_X_PROFILE="1")
+        self.assertEqual(response.status_code, 200)
+        profile = RequestProfile.objects.get()
+        self.assertEqual(response["X-Profile-Id"], str(profile.id))
+        self.assertEqual(profile.view_name, "board-list")
+        self.assertEqual(profile.user, self.admin)
+        self.assertFalse(profile.sampled)
+        self.assertGreater(profile.query_count, 0)
+        self.assertIn("cumulative", profile.summary)
+        # Файл читается pstats, и рендеринг ответа DRF попал в профиль
+        with default_storage.open(profile.profile.name) as stored:
+            stats = pstats.Stats(stored.name)
+        self.assertTrue(
+            any(
+                function == "render" and "renderers" in filename
+                for filename, _, function in stats.stats
+            )
+        )
+
+        self.client.get(reverse("board-list"), {"_profile": "1"})
+        self.assertEqual(RequestProfile.objects.count(), 2)
+
+    def test_failing_view_goes_through_process_exception(self):
+        self.client.force_login(self.admin)
+        middleware = [*settings.MIDDLEWARE]
+        middleware.insert(-1, "reminders.tests.RecoverMiddleware")
+        with override_settings(MIDDLEWARE=middleware), mock.patch(
+            "reminders.views.BoardViewSet.list", side_effect=RuntimeError("сбой")
+        ):
+            response = self.client.get(reverse("board-list"), HTTP_X_PROFILE="1")
+        self.assertEqual(response.status_code, 503)
+        profile = RequestProfile.objects.get()
+        self.assertEqual(response["X-Profile-Id"], str(profile.id))
+        self.assertEqual(profile.status_code, 503)
+
+        # Необработанное исключение: профиль ответа 500 тоже сохраняется
+        # (новый клиент — цепочка middleware загружается заново)
+        self.client = self.client_class(raise_request_exception=False)
+        self.client.force_login(self.admin)
+        with mock.patch(
+            "reminders.views.BoardViewSet.list", side_effect=RuntimeError("сбой")
+        ):
+            response = self.client.get(reverse("board-list"), HTTP_X_PROFILE="1")
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(RequestProfile.objects.latest("id").status_code, 500)
+
+    def test_request_from_regular_user_is_ignored(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("board-list"), HTTP_X_PROFILE="1")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(PROFILE_SAMPLE_RATE=1, PROFILE_KEEP=2)
+    def test_sampled_profiles_are_pruned(self):
+        self.client.force_login(self.user)
+        for _ in range(3):
+            self.client.get(reverse("board-list"))
+        profiles = list(RequestProfile.objects.all())
+        self.assertEqual(len(profiles), 2)
+        self.assertTrue(all(profile.sampled for profile in profiles))
+        files = default_storage.listdir("profiles")[1]
+        self.assertEqual(
+            sorted(files),
+            sorted(profile.profile.name.split("/")[-1] for profile in profiles),
+        )
+
+    def test_admin_download(self):
+        self.client.force_login(self.admin)
+        self.client.get(reverse("board-list"), HTTP_X_PROFILE="1")
+        profile = RequestProfile.objects.get()
+        response = self.client.get(
+            reverse("admin:reminders_requestprofile_download", args=[profile.pk])
+        )
+        self.assertEqual(response.status_code, 200)
+        with default_storage.open(profile.profile.name) as stored:
+            self.assertEqual(b"".join(response.streaming_content), stored.read())
+
+        changelist = self.client.get(
+            reverse("admin:reminders_requestprofile_changelist")
+        )
+        self.assertContains(changelist, "board-list")
+
+
+class BatchCreateTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            username="user", email="user@example.com", password="testpass123"
+        )
+        self.editor = CustomUser.objects.create_user(
+            username="editor", email="editor@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(self.user)
+        self.board = Board.objects.create(title="Доска", owner=self.user)
+        BoardCollaborator.objects.create(
+            board=self.board,
+            user=self.editor,
+            access_level=BoardCollaborator.AccessLevel.EDITOR,
+            status=BoardCollaborator.Status.ACCEPTED,
+        )
+        self.url = reverse("create_items_api", args=[self.board.id])
+
+    def create(self, items):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, {"items": items}, format="json")
+
+    def stickers(self, count):
+        return [
+            {"item_type": BoardItem.ItemType.STICKER, "geometry": {"x": i, "y": i}}
+            for i in range(count)
+        ]
+
+    def test_items_are_created_in_input_order(self):
+        get_dashboard_summary(self.editor)
+        response = self.create(
+            [
+                {"item_type": BoardItem.ItemType.STICKER, "content_payload": "A"},
+                {
+                    "item_type": BoardItem.ItemType.TASK,
+                    "title": "Задача",
+                    "task_data": {"assigned_to_id": self.editor.id},
+                },
+                {"item_type": BoardItem.ItemType.NESTED_BOARD, "title": "Внутри"},
+                {
+                    "item_type": BoardItem.ItemType.DRAWING,
+                    "geometry": {"points": [0, 0, 10, 10]},
+                },
+            ]
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        ids = data["ids"]
+        items = BoardItem.objects.in_bulk(ids)
+        self.assertEqual(
+            [items[item_id].item_type for item_id in ids],
+            ["sticker", "task", "nested_board", "drawing"],
+        )
+        self.board.refresh_from_db()
+        self.assertEqual(data["revision"], self.board.revision)
+        self.assertEqual({item.revision for item in items.values()}, {data["revision"]})
+        # bbox считается, как при обычном сохранении
+        self.assertEqual(items[ids[3]].bbox_max_x, 10)
+
+        task = TaskData.objects.get(item_id=ids[1])
+        self.assertEqual(task.assigned_to, self.editor)
+        self.assertEqual(items[ids[1]].content_payload, "Задача")
+        self.assertEqual(
+            [t["id"] for t in get_dashboard_summary(self.editor)["my_tasks"]],
+            [task.id],
+        )
+
+        # Вложенная доска: замыкание и унаследованные права
+        child = items[ids[2]].linked_board
+        self.assertEqual(child.title, "Внутри")
+        self.assertEqual(items[ids[2]].content_payload, str(child.id))
+        self.assertEqual(
+            data["linked_boards"][str(ids[2])]["linked_board_id"], child.id
+        )
+        self.assertEqual(child.get_ancestors(), [self.board, child])
+        self.assertTrue(child.user_can_edit(self.editor))
+
+    def test_inserts_do_not_grow_with_batch_size(self):
+        self.create(self.stickers(1))  # права доски попадают в кэш
+        with CaptureQueriesContext(connection) as small:
+            self.create(self.stickers(2))
+        with CaptureQueriesContext(connection) as large:
+            self.create(self.stickers(50))
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(BoardItem.objects.filter(board=self.board).count(), 53)
+
+    def test_invalid_batch_creates_nothing(self):
+        response = self.create(
+            self.stickers(2)
+            + [
+                {
+                    "item_type": BoardItem.ItemType.TASK,
+                    "task_data": {"assigned_to_id": 999999},
+                },
+                {"item_type": BoardItem.ItemType.IMAGE, "image": 999999},
+            ]
+        )
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()["error"]
+        self.assertEqual(errors[:2], [{}, {}])
+        self.assertIn("assigned_to_id", errors[2]["task_data"])
+        self.assertIn("image", errors[3])
+        self.assertFalse(BoardItem.objects.exists())
+
+        response = self.create(self.stickers(BATCH_LIMIT + 1))
+        self.assertEqual(response.status_code, 400)
+
+    def test_readers_cannot_create(self):
+        viewer = CustomUser.objects.create_user(
+            username="viewer", email="viewer@example.com", password="testpass123"
+        )
+        BoardCollaborator.objects.create(
+            board=self.board, user=viewer, status=BoardCollaborator.Status.ACCEPTED
+        )
+        self.client.force_authenticate(viewer)
+        response = self.create(self.stickers(1))
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(BoardItem.objects.exists())
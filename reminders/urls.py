@@ -2,9 +2,34 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import *
 
+router = DefaultRouter()
+router.register("boards", BoardViewSet, basename="board")
+router.register("items", BoardItemViewSet, basename="boarditem")
+
 urlpatterns = [
     path("create_reminder/", create_reminder_api, name="create_reminder_api"),
     path("save_board/", save_board_api, name="save_board_api"),
+    path(
+        "board/<int:board_id>/operations/",
+        board_operations_api,
+        name="board_operations_api",
+    ),
+    path(
+        "board/<int:board_id>/changes/",
+        board_changes_api,
+        name="board_changes_api",
+    ),
+    path("board/<int:board_id>/items/", board_items_api, name="board_items_api"),
+    path(
+        "board/<int:board_id>/items/batch/",
+        create_items_api,
+        name="create_items_api",
+    ),
+    path("board/<int:board_id>/events/", board_events, name="board_events"),
+    path("board-cache/stats/", board_cache_stats_api, name="board_cache_stats_api"),
+    path("cache/stats/", cache_stats_api, name="cache_stats_api"),
+    path("metrics/", metrics_api, name="metrics_api"),
+    path("images/", upload_image_api, name="upload_image_api"),
     path("delete_reminder/", delete_reminder_api, name="delete_reminder_api"),
     path("create_board/", create_board_api, name="create_board_api"),
     path("update_board/", update_board_api, name="update_board_api"),
@@ -30,4 +55,5 @@ urlpatterns = [
         respond_to_invitation,
         name="respond_invitation",
     ),
+    path("", include(router.urls)),
 ]
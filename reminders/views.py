@@ -2,36 +2,136 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import serializers
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from django.urls import reverse
-from django.db.models import Q
+from django.db.models import Count, Exists, F, FilteredRelation, OuterRef, Q
 from django.db import transaction
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils.dateparse import parse_datetime
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from rest_framework.decorators import api_view, permission_classes
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.core.signing import TimestampSigner, BadSignature, SignatureExpired, Signer
 
 from rest_framework.filters import SearchFilter, OrderingFilter
-from .models import Board, BoardCollaborator, Board, BoardItem, TaskData, GroupMember
+from .models import (
+    Board,
+    BoardAccess,
+    BoardCollaborator,
+    BoardItem,
+    TaskData,
+    UserContact,
+)
 
+from .batch import BATCH_LIMIT, batch_context, create_board_items
+from .board_cache import (
+    PAYLOAD_FORMAT,
+    board_payload_cache_stats,
+    get_board_items_payload,
+    get_board_payload,
+)
+from .caching import cache_stats
+from .dashboard import get_dashboard_summary, invalidate_task_assignees
+from .geometry import parse_bbox
+from .images import ImageError, image_url, store_image
+from .metrics import metrics_authorized, render_metrics
+from .operations import apply_board_operations
+from .points import quantize_points
+from .simplify import board_stroke_tolerance, simplify_points
+from .streaming import stream_json_array
+from .realtime import get_backend, publish_board_event
 from .serializers import (
+    BoardOperationSerializer,
     BoardSerializer,
     BoardDetailSerializer,
     BoardItemSerializer,
+    BoardItemBatchSerializer,
     TaskDataSerializer,
     UserSerializer,
 )
 
+from users.avatars import avatar_url
 from users.views import CustomUser
 
+import asyncio
+import hashlib
 import json
+import logging
+import os
 import uuid
 
+logger = logging.getLogger(__name__)
+
+# Раз в сколько секунд слать комментарий в SSE, чтобы прокси не рвали соединение
+BOARD_EVENTS_KEEPALIVE = 25
+# С какого числа элементов board_page отдаёт их потоком, а не внутри страницы
+BOARD_STREAM_THRESHOLD = 2000
+
+
+def board_items_queryset():
+    """Элементы доски со всем, что нужно BoardItemSerializer, без N+1."""
+    return BoardItem.objects.select_related(
+        "task_data__assigned_to", "linked_board", "image"
+    )
+
+
+# --- ETag ---
+# Считаются одним маленьким запросом без загрузки элементов: всё, что видно
+# в ответе, либо входит в Board.revision, либо выбирается здесь же.
+# Если доступа нет, ETag не выдаётся и ответ (404) формирует сама вьюха.
+
+
+def _make_etag(*parts):
+    return hashlib.sha1(repr((PAYLOAD_FORMAT,) + parts).encode()).hexdigest()
+
+
+def board_content_etag(request, pk=None, **kwargs):
+    revision = (
+        Board.objects.filter(pk=pk, access_entries__user_id=request.user.pk)
+        .values_list("revision", flat=True)
+        .first()
+    )
+    return None if revision is None else _make_etag("content", pk, revision)
+
+
+def board_detail_etag(request, pk=None, **kwargs):
+    row = (
+        Board.objects.filter(pk=pk, access_entries__user_id=request.user.pk)
+        .values_list(
+            "revision",
+            "updated_at",
+            "access_entries__level",
+            "owner__username",
+            "owner__email",
+            "owner__first_name",
+            "owner__last_name",
+            "owner__avatar",
+        )
+        .first()
+    )
+    return None if row is None else _make_etag("detail", pk, *row)
+
+
+def board_item_etag(request, pk=None, **kwargs):
+    # Ревизия доски растёт при любом изменении, видимом в её элементах
+    revision = (
+        BoardItem.objects.filter(pk=pk, board__access_entries__user_id=request.user.pk)
+        .values_list("board__revision", flat=True)
+        .first()
+    )
+    return None if revision is None else _make_etag("item", pk, revision)
+
+
+def parse_revision(value):
+    """Ревизия, на которой клиент основал правку (ValidationError, если не число)."""
+    if value is None:
+        return None
+    return serializers.IntegerField(min_value=0).run_validation(value)
+
 
-@ensure_csrf_cookie
 class BoardViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     filter_backends = [SearchFilter, OrderingFilter]
@@ -43,22 +143,53 @@ class BoardViewSet(viewsets.ModelViewSet):
             return BoardDetailSerializer
         return BoardSerializer
 
+    # Действия, для которых достаточно прав на чтение
+    READ_ACTIONS = ("list", "retrieve", "content")
+
     def get_queryset(self):
+        """
+        Доски, доступные пользователю, с уровнем доступа (access_level)
+        и числом элементов (items_count) одним запросом на всю страницу.
+        """
         user = self.request.user
 
-        return Board.objects.filter(
-            Q(owner=user) | Q(group__members__user=user)
-        ).distinct()
+        queryset = (
+            Board.objects.annotate(
+                user_access=FilteredRelation(
+                    "access_entries", condition=Q(access_entries__user=user)
+                )
+            )
+            .filter(user_access__isnull=False)
+            .annotate(access_level=F("user_access__level"), items_count=Count("items"))
+            .select_related("owner")
+        )
+        if self.action == "destroy":
+            # Удалить доску может только владелец, как и в delete_board_api
+            queryset = queryset.filter(user_access__level=BoardAccess.Level.OWNER)
+        elif self.action not in self.READ_ACTIONS:
+            queryset = queryset.filter(user_access__level__gte=BoardAccess.Level.EDITOR)
+        return queryset
+
+    @method_decorator(condition(etag_func=board_detail_etag))
+    def retrieve(self, request, *args, **kwargs):
+        board = self.get_object()
+        items = board_items_queryset().filter(board=board)
+        return Response(get_board_payload(board, request, items))
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
     @action(detail=True, methods=["get"])
+    @method_decorator(condition(etag_func=board_content_etag))
     def content(self, request, pk=None):
         board = self.get_object()
-        items = BoardItem.objects.filter(board=board).select_related("task_data")
-        serializer = BoardItemSerializer(items, many=True)
-        return Response(serializer.data)
+        items = board_items_queryset().filter(board=board)
+        if request.query_params.get("stream"):
+            # Большие доски: без кэша и без сборки всего списка в памяти
+            return StreamingHttpResponse(
+                stream_json_array(items), content_type="application/json"
+            )
+        return Response(get_board_items_payload(board, items))
 
     @action(detail=True, methods=["post"])
     def clear(self, request, pk=None):
@@ -69,7 +200,9 @@ class BoardViewSet(viewsets.ModelViewSet):
             and board.owner != request.user
         ):
             return Response({"error": "Нет прав"}, status=403)
-        board.items.all().delete()
+        deleted_ids = list(board.items.values_list("id", flat=True))
+        board.items.all().delete_tracked()
+        publish_board_event(board.id, deleted=deleted_ids)
         return Response({"status": "cleared"})
 
 
@@ -79,11 +212,39 @@ class BoardItemViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        # Показываем элементы только с доступных досок
+        # Показываем элементы только с доступных досок, менять — только с редактируемых
         user = self.request.user
+        min_level = (
+            BoardAccess.Level.VIEWER
+            if self.action in ("list", "retrieve")
+            else BoardAccess.Level.EDITOR
+        )
         return BoardItem.objects.filter(
-            Q(board__owner=user) | Q(board__group__members__user=user)
-        ).distinct()
+            board__access_entries__user=user,
+            board__access_entries__level__gte=min_level,
+        )
+
+    @method_decorator(condition(etag_func=board_item_etag))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        # Клиент может прислать ревизию, на которой основана правка
+        try:
+            base_revision = parse_revision(request.data.get("revision"))
+        except serializers.ValidationError as error:
+            raise serializers.ValidationError({"revision": error.detail})
+        if base_revision is not None:
+            item = self.get_object()
+            if item.revision > base_revision:
+                return Response(
+                    {
+                        "error": "conflict",
+                        "conflicts": [{"id": item.id, "revision": item.revision}],
+                    },
+                    status=status.HTTP_409_CONFLICT,
+                )
+        return super().update(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         # Проверка прав на редактирование доски
@@ -92,7 +253,17 @@ class BoardItemViewSet(viewsets.ModelViewSet):
             # Здесь можно добавить проверку CanEditBoard
             if not board.user_can_edit(self.request.user):
                 raise serializers.ValidationError("Нет доступа к этой доске")
-        serializer.save()
+        item = serializer.save()
+        publish_board_event(item.board_id, changed=[item.id])
+
+    def perform_update(self, serializer):
+        item = serializer.save()
+        publish_board_event(item.board_id, changed=[item.id])
+
+    def perform_destroy(self, instance):
+        board_id, item_id = instance.board_id, instance.id
+        instance.delete()
+        publish_board_event(board_id, deleted=[item_id])
 
     @action(detail=False, methods=["post"])
     def bulk_update(self, request):
@@ -102,62 +273,57 @@ class BoardItemViewSet(viewsets.ModelViewSet):
 
         # Получаем ID для проверки прав
         ids = [u.get("id") for u in updates]
-        qs = self.get_queryset().filter(id__in=ids)
-        existing_items = {item.id: item for item in qs}
-
-        items_to_update = []
-        for update_data in updates:
-            item_id = update_data.get("id")
-            item = existing_items.get(item_id)
-            if item:
-                # Обновляем геометрию
-                if "geometry" in update_data:
-                    item.geometry = update_data["geometry"]
-                # Обновляем стили (если нужно)
-                if "style" in update_data:
-                    item.style = update_data["style"]
-                items_to_update.append(item)
-
-        if items_to_update:
-            BoardItem.objects.bulk_update(items_to_update, ["geometry", "style"])
+        with transaction.atomic():
+            qs = self.get_queryset().filter(id__in=ids).select_for_update()
+            existing_items = {item.id: item for item in qs}
+
+            items_to_update = {}
+            conflicts = []
+            invalid = []
+            for update_data in updates:
+                item_id = update_data.get("id")
+                item = existing_items.get(item_id)
+                if item:
+                    try:
+                        base_revision = parse_revision(update_data.get("revision"))
+                    except serializers.ValidationError as error:
+                        invalid.append({"id": item.id, "revision": error.detail})
+                        continue
+                    if base_revision is not None and item.revision > base_revision:
+                        conflicts.append({"id": item.id, "revision": item.revision})
+                        continue
+                    # Обновляем геометрию
+                    if "geometry" in update_data:
+                        item.geometry = update_data["geometry"]
+                    # Обновляем стили (если нужно)
+                    if "style" in update_data:
+                        item.style = update_data["style"]
+                    items_to_update.setdefault(item.board_id, []).append(item)
+
+            for board_id, items in items_to_update.items():
+                BoardItem.stamp_revision(board_id, items)
+                BoardItem.objects.bulk_update(items, ["geometry", "style", "revision"])
+                publish_board_event(board_id, changed=[item.id for item in items])
 
-        return Response({"status": "success", "updated_count": len(items_to_update)})
+        return Response(
+            {
+                "status": "success",
+                "updated_count": sum(len(items) for items in items_to_update.values()),
+                "conflicts": conflicts,
+                "invalid": invalid,
+            }
+        )
 
 
 @login_required
 def dashboard_page(request):
     user = request.user
-
-    my_boards = (
-        Board.objects.filter(owner=user, parent__isnull=True)
-        .order_by("-updated_at")
-    )
-
-    shared_boards = (
-        Board.objects.filter(
-            Q(group__members__user=user)
-            | Q(
-                collaborators__user=user,
-                collaborators__status=BoardCollaborator.Status.ACCEPTED,
-            )
-        )
-        .exclude(owner=user)
-        .filter(parent__isnull=True)
-        .distinct()
-        .order_by("-updated_at")
-    )
-
-    my_tasks = (
-        TaskData.objects.filter(assigned_to=user, is_completed=False)
-        .select_related("item", "item__board")
-        .order_by("due_date")[:10]
-    )
+    # Свои и доступные корневые доски, задачи и приглашения — из кэша
+    summary = get_dashboard_summary(user)
 
     context = {
         "user": user,
-        "my_boards": my_boards,
-        "shared_boards": shared_boards,
-        "my_tasks": my_tasks,
+        **summary,
     }
     return render(request, "app/dashboard_v2.html", context)
 
@@ -171,13 +337,22 @@ def board_page(request, board_id):
     """
     try:
         board = Board.objects.get(id=board_id)
-        if not board.user_can_read(request.user):
+        access_level = board.get_access_level(request.user)
+        if access_level is None:
             return render(request, "403.html", status=403)
     except Board.DoesNotExist:
         return render(request, "404.html", status=404)
 
-    board_serializer = BoardDetailSerializer(board, context={"request": request})
-    board_data = board_serializer.data
+    items_url = None
+    board.items_count = board.items.count()
+    if board.items_count > BOARD_STREAM_THRESHOLD:
+        # Элементы не встраиваем в страницу: board.js загрузит их потоком
+        board_data = BoardSerializer(board, context={"request": request}).data
+        items_url = reverse("board-content", args=[board.id]) + "?stream=1"
+    else:
+        board_data = get_board_payload(
+            board, request, board_items_queryset().filter(board=board)
+        )
 
     user_serializer = UserSerializer(request.user)
     user_data = user_serializer.data
@@ -185,25 +360,84 @@ def board_page(request, board_id):
     breadcrumbs = [
         {"id": b.id, "title": b.title} for b in board.get_ancestors()
     ]
-    parent_board = board.parent
 
     context = {
         "board_id": board.id,
         "board_title": board.title,
         "board_data_json": json.dumps(board_data),
+        "board_items_url": items_url,
         "user_data_json": json.dumps(user_data),
         "breadcrumbs_json": json.dumps(breadcrumbs),
-        "parent_board_id": parent_board.id if parent_board else None,
-        "can_edit": board.user_can_edit(request.user),
+        "parent_board_id": board.parent_id,
+        "can_edit": access_level >= BoardAccess.Level.EDITOR,
     }
     return render(request, "board.html", context)
 
 
+def _item_data(board, user, data):
+    """
+    Поля нового элемента из запроса (create_reminder_api, create_items_api)
+    со значениями по умолчанию для его типа.
+    """
+    item_type = data.get("item_type", BoardItem.ItemType.TASK)
+
+    if item_type == BoardItem.ItemType.NESTED_BOARD:
+        color = data.get("color", board.settings.get("BackgroundColor", "#65d3ff"))
+        return {
+            "item_type": item_type,
+            "geometry": data.get(
+                "geometry", {"x": 100, "y": 100, "width": 220, "height": 160}
+            ),
+            "style": data.get("style", {"fill": color}),
+            "title": data.get("title", "Новая доска"),
+            "color": color,
+        }
+
+    content_payload = data.get("content_payload", "")
+    if item_type == BoardItem.ItemType.TASK and not content_payload:
+        content_payload = data.get("title", "Новая задача")
+    elif item_type == BoardItem.ItemType.TEXT and not content_payload:
+        content_payload = "Новый текст"
+
+    item_data = {
+        "item_type": item_type,
+        "geometry": data.get("geometry", {"x": 100, "y": 100}),
+        "style": data.get("style", {}),
+        "content_payload": content_payload,
+    }
+    if item_type == BoardItem.ItemType.IMAGE:
+        # id из upload_image_api
+        item_data["image"] = data.get("image")
+    elif item_type == BoardItem.ItemType.TASK:
+        raw_task_data = data.get("task_data") or {}
+
+        item_data["task_data"] = {
+            "assigned_to_id": raw_task_data.get("assigned_to_id") or user.id,
+            "description": raw_task_data.get("description", ""),
+            "priority": raw_task_data.get("priority", "medium"),
+            "is_completed": raw_task_data.get("is_completed", False),
+        }
+
+        if raw_task_data.get("due_date"):
+            item_data["task_data"]["due_date"] = raw_task_data.get("due_date")
+    elif item_type == BoardItem.ItemType.DRAWING:
+        geometry = item_data["geometry"]
+        if isinstance(geometry, dict) and "points" in geometry:
+            item_data["geometry"] = {
+                **geometry,
+                "points": simplify_points(
+                    geometry["points"], board_stroke_tolerance(board)
+                ),
+            }
+    return item_data
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def create_reminder_api(request):
     """
     Универсальное создание элемента доски (Задача, Стикер, Текст, Рисунок).
+    Много элементов сразу — create_items_api.
     """
     try:
         data = request.data.copy()
@@ -214,29 +448,27 @@ def create_reminder_api(request):
                 {"success": False, "error": "Access denied"}, status=403
             )
 
-        item_type = data.get("item_type", BoardItem.ItemType.TASK)
-
-        if item_type == BoardItem.ItemType.NESTED_BOARD:
-            geometry = data.get("geometry", {"x": 100, "y": 100, "width": 220, "height": 160})
-            title = data.get("title", "Новая доска")
-            color = data.get("color", board.settings.get("BackgroundColor", "#65d3ff"))
+        item_data = _item_data(board, request.user, data)
 
+        if item_data["item_type"] == BoardItem.ItemType.NESTED_BOARD:
             with transaction.atomic():
                 child_board = Board(
-                    title=title,
+                    title=item_data["title"],
                     owner=board.owner or request.user,
                     parent=board,
-                    settings={"BackgroundColor": color},
+                    settings={"BackgroundColor": item_data["color"]},
                 )
                 child_board.full_clean()
                 child_board.save()
                 item = BoardItem.objects.create(
                     board=board,
                     item_type=BoardItem.ItemType.NESTED_BOARD,
-                    geometry=geometry,
-                    style=data.get("style", {"fill": color}),
+                    geometry=item_data["geometry"],
+                    style=item_data["style"],
                     content_payload=str(child_board.id),
+                    linked_board=child_board,
                 )
+                publish_board_event(board.id, changed=[item.id])
 
             return JsonResponse(
                 {
@@ -247,51 +479,78 @@ def create_reminder_api(request):
                 }
             )
 
-        content_payload = data.get("content_payload", "")
-        if item_type == BoardItem.ItemType.TASK and not content_payload:
-            content_payload = data.get("title", "Новая задача")
-        elif item_type == BoardItem.ItemType.TEXT and not content_payload:
-            content_payload = "Новый текст"
-
-        item_data = {
-            "board": board_id,
-            "item_type": item_type,
-            "geometry": data.get("geometry", {"x": 100, "y": 100}),
-            "style": data.get("style", {}),
-            "content_payload": content_payload,
-        }
-        if item_type == BoardItem.ItemType.TASK:
-            raw_task_data = data.get("task_data", {})
-
-            item_data["task_data"] = {
-                "assigned_to_id": raw_task_data.get("assigned_to_id")
-                or request.user.id,
-                "description": raw_task_data.get("description", ""),
-                "priority": raw_task_data.get("priority", "medium"),
-                "is_completed": raw_task_data.get("is_completed", False),
-            }
-
-            if raw_task_data.get("due_date"):
-                item_data["task_data"]["due_date"] = raw_task_data.get("due_date")
-        serializer = BoardItemSerializer(data=item_data)
+        serializer = BoardItemSerializer(
+            data={"board": board_id, **item_data}, context={"request": request}
+        )
 
-        print(item_data, flush=True)
         if serializer.is_valid():
             item = serializer.save()
+            publish_board_event(board.id, changed=[item.id])
             return JsonResponse({"success": True, "id": item.id})
         else:
-            print("Serializer Errors:", serializer.errors)
             return JsonResponse(
                 {"success": False, "error": serializer.errors}, status=400
             )
 
     except Exception as e:
-        import traceback
-
-        traceback.print_exc()
+        logger.exception("Could not create board item")
         return JsonResponse({"success": False, "error": str(e)}, status=400)
 
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def create_items_api(request, board_id):
+    """
+    Пакетное создание элементов: {"items": [...]} в формате create_reminder_api
+    (без board_id). Элементы проверяются вместе и вставляются пачкой
+    (reminders/batch.py); id возвращаются в порядке items.
+    """
+    board = get_object_or_404(Board, id=board_id)
+    if not board.user_can_edit(request.user):
+        return JsonResponse({"success": False, "error": "Access denied"}, status=403)
+
+    raw_items = request.data.get("items")
+    if not isinstance(raw_items, list) or not all(
+        isinstance(entry, dict) for entry in raw_items
+    ):
+        return JsonResponse(
+            {"success": False, "error": "items должен быть списком объектов"},
+            status=400,
+        )
+    if len(raw_items) > BATCH_LIMIT:
+        return JsonResponse(
+            {"success": False, "error": f"Не больше {BATCH_LIMIT} элементов за раз"},
+            status=400,
+        )
+
+    entries = [_item_data(board, request.user, entry) for entry in raw_items]
+    serializer = BoardItemBatchSerializer(
+        data=entries, many=True, context=batch_context(request.user, entries)
+    )
+    if not serializer.is_valid():
+        return JsonResponse({"success": False, "error": serializer.errors}, status=400)
+
+    items = create_board_items(board, request.user, serializer.validated_data)
+    if items:
+        publish_board_event(board.id, changed=[item.id for item in items])
+    return JsonResponse(
+        {
+            "success": True,
+            "ids": [item.id for item in items],
+            # Для вложенных досок: id элемента -> созданная доска
+            "linked_boards": {
+                item.id: {
+                    "linked_board_id": item.linked_board_id,
+                    "linked_board_title": item.linked_board.title,
+                }
+                for item in items
+                if item.linked_board_id
+            },
+            "revision": items[0].revision if items else board.revision,
+        }
+    )
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def delete_reminder_api(request):
@@ -300,7 +559,7 @@ def delete_reminder_api(request):
         item_id = request.data.get("id")
         item = get_object_or_404(BoardItem, id=item_id)
         user = request.user
-        can_edit_board = (item.board.owner == user) or item.board.user_can_edit(user)
+        can_edit_board = item.board.user_can_edit(user)
         is_assignee = False
 
         try:
@@ -310,18 +569,18 @@ def delete_reminder_api(request):
             pass
 
         if can_edit_board or is_assignee:
-            if item.item_type == BoardItem.ItemType.NESTED_BOARD:
-                try:
-                    child_id = int(item.content_payload or 0)
-                except (TypeError, ValueError):
-                    child_id = None
-                if child_id:
-                    child_board = Board.objects.filter(
-                        id=child_id, parent=item.board
-                    ).first()
-                    if child_board and child_board.user_can_edit(user):
-                        child_board.delete()
+            if (
+                item.item_type == BoardItem.ItemType.NESTED_BOARD
+                and item.linked_board_id
+            ):
+                child_board = Board.objects.filter(
+                    id=item.linked_board_id, parent=item.board
+                ).first()
+                if child_board and child_board.user_can_edit(user):
+                    child_board.delete()
+            board_id = item.board_id
             item.delete()
+            publish_board_event(board_id, deleted=[item_id])
             return JsonResponse({"success": True})
         else:
             return JsonResponse(
@@ -381,7 +640,10 @@ def update_board_api(request):
         if "color" in data:
             board.settings["BackgroundColor"] = data["color"]
 
-        board.save()
+        with transaction.atomic():
+            board.save()
+            board.bump_revision()
+            publish_board_event(board.id, settings_changed=True)
         return JsonResponse({"success": True})
     except Exception as e:
         return JsonResponse({"success": False, "error": str(e)}, status=400)
@@ -422,11 +684,12 @@ def save_board_api(request):
             return JsonResponse({"success": False, "error": "No board ID"}, status=400)
 
         board = get_object_or_404(Board, id=board_id)
-        if not board.user_can_read(request.user):
+        access_level = board.get_access_level(request.user)
+        if access_level is None:
             return JsonResponse(
                 {"success": False, "error": "Access denied"}, status=403
             )
-        if not board.user_can_edit(request.user):
+        if access_level < BoardAccess.Level.EDITOR:
             return JsonResponse({"error": "Только для чтения"}, status=403)
         stage_data = (
             json.loads(konva_json_raw)
@@ -447,7 +710,10 @@ def save_board_api(request):
             settings_changed = True
 
         if settings_changed:
-            board.save(update_fields=["settings", "updated_at"])
+            with transaction.atomic():
+                board.save(update_fields=["settings", "updated_at"])
+                board.bump_revision()
+                publish_board_event(board.id, settings_changed=True)
 
         items_to_update = []
         tasks_to_update = []
@@ -499,17 +765,32 @@ def save_board_api(request):
             "content_payload",
             "deadline_iso",
             "is_completed",
+            # Ревизия элемента, на которой основано состояние клиента
+            "revision",
             # Вложенная доска (храним связь в content_payload)
             "childBoardId",
             "boardTitle",
         }
 
+        conflicts = []
+        invalid = []
+        stroke_tolerance = board_stroke_tolerance(board)
+
         with transaction.atomic():
-            for db_item in db_items:
+            for db_item in db_items.select_for_update(of=("self",)):
                 node = incoming_nodes_map.get(str(db_item.id))
                 attrs = node.get("attrs", {})
                 item_changed = False
 
+                try:
+                    base_revision = parse_revision(attrs.get("revision"))
+                except serializers.ValidationError as error:
+                    invalid.append({"id": db_item.id, "revision": error.detail})
+                    continue
+                if base_revision is not None and db_item.revision > base_revision:
+                    conflicts.append({"id": db_item.id, "revision": db_item.revision})
+                    continue
+
                 new_geometry = {
                     "x": attrs.get("x", 0),
                     "y": attrs.get("y", 0),
@@ -521,6 +802,12 @@ def save_board_api(request):
                     "zIndex": attrs.get("zIndex", 0),
                     "points": attrs.get("points"),
                 }
+                if new_geometry["points"] is not None:
+                    points = new_geometry["points"]
+                    if db_item.item_type == BoardItem.ItemType.DRAWING:
+                        points = simplify_points(points, stroke_tolerance)
+                    # Сравниваем с тем, что вернулось бы из БД после упаковки
+                    new_geometry["points"] = quantize_points(points)
 
                 current_style_from_front = {
                     k: v for k, v in attrs.items() if k not in NON_STYLE_KEYS
@@ -566,23 +853,228 @@ def save_board_api(request):
 
                     if task_changed:
                         tasks_to_update.append(task_data)
+                        if not item_changed:
+                            items_to_update.append(db_item)
             if items_to_update:
+                BoardItem.stamp_revision(board.id, items_to_update)
                 BoardItem.objects.bulk_update(
-                    items_to_update, ["geometry", "style", "content_payload"]
+                    items_to_update,
+                    ["geometry", "style", "content_payload", "revision"],
+                )
+                publish_board_event(
+                    board.id, changed=[item.id for item in items_to_update]
                 )
 
             if tasks_to_update:
                 TaskData.objects.bulk_update(
                     tasks_to_update, ["due_date", "is_completed"]
                 )
+            invalidate_task_assignees(
+                item.id
+                for item in items_to_update
+                if item.item_type == BoardItem.ItemType.TASK
+            )
 
-        return JsonResponse({"success": True, "updated": len(items_to_update)})
+        return JsonResponse(
+            {
+                "success": True,
+                "updated": len(items_to_update),
+                "conflicts": conflicts,
+                "invalid": invalid,
+                "revision": Board.objects.values_list("revision", flat=True).get(
+                    pk=board.id
+                ),
+            }
+        )
 
     except Exception as e:
-        import traceback
+        logger.exception("Could not save board %s", request.data.get("board_id"))
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def board_operations_api(request, board_id):
+    """
+    Дельта-сохранение доски: пакет операций над конкретными элементами.
+    Полное сохранение сцены через save_board_api остаётся запасным путём.
+    """
+    board = get_object_or_404(Board, id=board_id)
+    if not board.user_can_edit(request.user):
+        return JsonResponse({"success": False, "error": "Access denied"}, status=403)
+
+    serializer = BoardOperationSerializer(
+        data=request.data.get("operations", []), many=True
+    )
+    if not serializer.is_valid():
+        return JsonResponse({"success": False, "error": serializer.errors}, status=400)
+
+    result = apply_board_operations(board, serializer.validated_data, request.user)
+    if result["updated"] or result["deleted"]:
+        publish_board_event(
+            board.id, changed=result["updated"], deleted=result["deleted"]
+        )
+    return JsonResponse({"success": True, **result})
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def board_changes_api(request, board_id):
+    """
+    Изменения доски после ревизии ?since=N: изменённые элементы и id удалённых.
+    Позволяет клиенту не перезагружать доску целиком.
+    """
+    board = get_object_or_404(Board, id=board_id)
+    if not board.user_can_read(request.user):
+        return JsonResponse({"success": False, "error": "Access denied"}, status=403)
+
+    try:
+        since = int(request.GET.get("since", 0))
+    except ValueError:
+        return JsonResponse(
+            {"success": False, "error": "since должен быть числом"}, status=400
+        )
+
+    items = board_items_queryset().filter(board=board, revision__gt=since)
+    deleted_ids = board.deleted_items.filter(revision__gt=since).values_list(
+        "item_id", flat=True
+    )
+    return JsonResponse(
+        {
+            "success": True,
+            "revision": board.revision,
+            "settings": board.settings,
+            "items": BoardItemSerializer(items, many=True).data,
+            "deleted": list(deleted_ids),
+        }
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def board_items_api(request, board_id):
+    """
+    Элементы доски в видимой области ?bbox=min_x,min_y,max_x,max_y
+    (координаты сцены). Без bbox возвращает все элементы.
+    """
+    board = get_object_or_404(Board, id=board_id)
+    if not board.user_can_read(request.user):
+        return JsonResponse({"success": False, "error": "Access denied"}, status=403)
+
+    items = board_items_queryset().filter(board=board)
+    if "bbox" in request.GET:
+        try:
+            items = items.in_viewport(*parse_bbox(request.GET["bbox"]))
+        except ValueError:
+            return JsonResponse(
+                {
+                    "success": False,
+                    "error": "bbox должен быть в виде min_x,min_y,max_x,max_y",
+                },
+                status=400,
+            )
+
+    return JsonResponse(
+        {
+            "success": True,
+            "revision": board.revision,
+            "items": BoardItemSerializer(items, many=True).data,
+        }
+    )
+
+
+@login_required
+async def board_events(request, board_id):
+    """
+    SSE-канал доски: пока вкладка открыта, сервер присылает события
+    board_changed с ревизией и id изменённых/удалённых элементов.
+    Работает только под ASGI (reminder_project.asgi).
+    """
+    user = await request.auser()
+    board = await Board.objects.filter(id=board_id).afirst()
+    if board is None:
+        return JsonResponse({"success": False, "error": "Доска не найдена"}, status=404)
+    if not await BoardAccess.objects.filter(board=board, user=user).aexists():
+        return JsonResponse({"success": False, "error": "Access denied"}, status=403)
+
+    backend = get_backend()
+    queue = backend.subscribe(board.id)
+
+    async def stream():
+        try:
+            # Стартовая ревизия: клиент сверяет её со своей и при разнице
+            # добирает изменения через board_changes_api
+            hello = {"type": "hello", "board_id": board.id, "revision": board.revision}
+            yield f"retry: 3000\nevent: hello\ndata: {json.dumps(hello)}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), timeout=BOARD_EVENTS_KEEPALIVE
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            backend.unsubscribe(board.id, queue)
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # nginx не должен буферизовать поток
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def board_cache_stats_api(request):
+    """Счётчики попаданий и промахов кэша элементов досок."""
+    return JsonResponse(board_payload_cache_stats())
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def cache_stats_api(request):
+    """Попадания и промахи уровней кэша в процессе, обслужившем запрос."""
+    return JsonResponse({"pid": os.getpid(), "default": cache_stats()})
+
 
-        traceback.print_exc()
+def metrics_api(request):
+    """
+    Метрики в текстовом формате Prometheus (reminders/metrics.py).
+    Доступ — по заголовку Authorization: Bearer <METRICS_TOKEN> или сотрудникам.
+    """
+    if not metrics_authorized(request):
+        return JsonResponse({"success": False, "error": "Access denied"}, status=403)
+    return HttpResponse(
+        render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def upload_image_api(request):
+    """
+    Загрузка картинки для элемента IMAGE. Возвращает id для поля image
+    элемента; одинаковые картинки хранятся один раз (reminders/images.py).
+    """
+    if "image" not in request.FILES:
+        return JsonResponse({"success": False, "error": "No file"}, status=400)
+    try:
+        image = store_image(request.FILES["image"], request.user)
+    except ImageError as e:
         return JsonResponse({"success": False, "error": str(e)}, status=400)
+    return JsonResponse(
+        {
+            "success": True,
+            "image": {
+                "id": image.id,
+                "url": image_url(image),
+                "width": image.width,
+                "height": image.height,
+            },
+        }
+    )
 
 
 def api_icons(request):
@@ -736,73 +1228,45 @@ def search_users_for_invite(request, board_id):
     except Board.DoesNotExist:
         return Response({"success": False, "error": "Доска не найдена"}, status=404)
 
-    # 1. Кто УЖЕ на этой доске? (Их мы исключим из результатов)
-    existing_user_ids = set()
-    if board.owner:
-        existing_user_ids.add(board.owner.id)
-    if board.group:
-        existing_user_ids.update(board.group.members.values_list("user_id", flat=True))
-    existing_user_ids.update(board.collaborators.values_list("user_id", flat=True))
-
-    # 2. Собираем "Круг общения" текущего пользователя (Контакты)
-    # Находим группы пользователя
-    my_groups = GroupMember.objects.filter(user=request.user).values_list(
-        "group_id", flat=True
-    )
-
-    # Находим доски, к которым у пользователя есть доступ (как владелец или соавтор)
-    my_boards = Board.objects.filter(
-        Q(owner=request.user)
-        | Q(collaborators__user=request.user)
-        | Q(group__in=my_groups)
-    ).values_list("id", flat=True)
-
-    # Получаем всех пользователей, которые пересекаются с нами по группам или доскам
-    known_users = (
-        CustomUser.objects.filter(
-            Q(workgroup_memberships__group__in=my_groups)
-            | Q(shared_boards__board__in=my_boards)
-            | Q(owned_boards__in=my_boards)
+    # Контакты из материализованной таблицы (reminders/contacts.py), кроме тех,
+    # кто уже имеет доступ к доске или приглашён на неё, — одним запросом
+    contacts = (
+        UserContact.objects.filter(user=request.user)
+        .exclude(
+            Exists(
+                BoardAccess.objects.filter(board=board, user_id=OuterRef("contact_id"))
+            )
         )
-        .exclude(id=request.user.id)
-        .exclude(id__in=existing_user_ids)
-        .distinct()
+        .exclude(
+            Exists(
+                BoardCollaborator.objects.filter(
+                    board=board, user_id=OuterRef("contact_id")
+                )
+            )
+        )
+        .select_related("contact")
+        .order_by("-weight", "search_text")
     )
+    if query:
+        contacts = contacts.filter(search_text__contains=query.lower())
+    contacts = list(contacts[:10])
 
-    # 3. Фильтруем контакты, если есть поисковый запрос
     if query:
-        known_users = known_users.filter(
-            Q(username__icontains=query)
-            | Q(email__icontains=query)
-            | Q(first_name__icontains=query)
-            | Q(last_name__icontains=query)
-        )[:10]
-        section_title = (
-            "Результаты поиска" if known_users.exists() else "В контактах не найдено"
-        )
+        section_title = "Результаты поиска" if contacts else "В контактах не найдено"
     else:
-        known_users = known_users[:10]
         section_title = (
-            "Ваши контакты (коллеги)"
-            if known_users.exists()
-            else "Нет доступных контактов"
+            "Ваши контакты (коллеги)" if contacts else "Нет доступных контактов"
         )
 
-    # 4. Формируем ответ
     users_data = []
-    for u in known_users:
+    for entry in contacts:
+        u = entry.contact
         users_data.append(
             {
                 "id": u.id,
                 "username": u.username,
                 "full_name": f"{u.first_name} {u.last_name}".strip() or u.username,
-                "avatar_url": (
-                    u.avatar.url
-                    if hasattr(u, "avatar")
-                    and u.avatar
-                    and u.avatar.name != "avatars/default_avatar.png"
-                    else None
-                ),
+                "avatar_url": avatar_url(u, "sm"),
             }
         )
 
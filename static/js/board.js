@@ -124,7 +124,16 @@ document.addEventListener('DOMContentLoaded', function() {
   };
 
   // ─── Инициализация сцены ─────────────────────────────────────────────────
-  if (window.DJANGO_DATA && window.DJANGO_DATA.boardData) {
+  if (window.DJANGO_DATA && window.DJANGO_DATA.boardItemsUrl) {
+    // Большая доска: элементы приходят отдельным потоковым запросом
+    fetch(window.DJANGO_DATA.boardItemsUrl, {credentials: 'same-origin'})
+      .then((response) => response.json())
+      .then((items) => {
+        window.DJANGO_DATA.boardData.items = items;
+        initStage(window.DJANGO_DATA.boardData);
+      })
+      .catch((err) => console.error(err));
+  } else if (window.DJANGO_DATA && window.DJANGO_DATA.boardData) {
     setTimeout(() => initStage(window.DJANGO_DATA.boardData), 50);
   } else {
     initStage();
@@ -0,0 +1,120 @@
+"""
+Обработка аватаров: одна точка входа для всех форм загрузки.
+
+Загрузка декодируется один раз (в пуле процессов, users/imaging.py),
+из неё строятся квадратные копии AVATAR_SIZES в WebP и JPEG-запасной
+вариант. Имена файлов содержат хэш содержимого, поэтому их можно кэшировать
+надолго (nginx отдаёт /media/ с expires 30d): новый аватар — новый URL.
+
+Старые файлы удаляются после коммита в фоновом потоке, запрос их не ждёт.
+"""
+
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, UnidentifiedImageError
+
+from .imaging import render_in_pool
+
+logger = logging.getLogger(__name__)
+
+MAX_AVATAR_SIZE = 5 * 1024 * 1024
+ALLOWED_TYPES = ("image/jpeg", "image/png", "image/gif", "image/webp")
+DEFAULT_AVATAR = "avatars/default_avatar.png"
+
+# Квадратные копии: ключ → сторона в пикселях
+AVATAR_SIZES = {"sm": 64, "md": 256, "lg": 512}
+# В поле avatar лежит эта копия; остальные — в avatar_variants
+MAIN_VARIANT = "md"
+FALLBACK_EXT = "jpg"
+
+_cleanup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="avatars")
+
+
+class AvatarError(ValueError):
+    pass
+
+
+def validate_avatar(upload):
+    if upload.size > MAX_AVATAR_SIZE:
+        raise AvatarError("File size too large. Maximum 5MB allowed.")
+    if upload.content_type not in ALLOWED_TYPES:
+        raise AvatarError("Invalid file type. Allowed: JPEG, PNG, GIF, WEBP")
+
+
+def avatar_files(user):
+    """Все файлы текущего аватара пользователя."""
+    names = set(user.avatar_variants.values())
+    if user.avatar:
+        names.add(user.avatar.name)
+    names.discard(DEFAULT_AVATAR)
+    return names
+
+
+def avatar_url(user, size=MAIN_VARIANT, ext="webp"):
+    """URL копии нужного размера; для старых аватаров без копий — исходный файл."""
+    name = user.avatar_variants.get(f"{size}.{ext}")
+    if name:
+        return default_storage.url(name)
+    if user.avatar and user.avatar.name != DEFAULT_AVATAR:
+        return user.avatar.url
+    return None
+
+
+def _delete_files(names):
+    for name in names:
+        try:
+            default_storage.delete(name)
+        except OSError:
+            logger.warning("Could not delete avatar file %s", name, exc_info=True)
+
+
+def schedule_cleanup(names):
+    """Удаляет файлы после коммита, не задерживая ответ."""
+    names = list(names)
+    if names:
+        transaction.on_commit(lambda: _cleanup_executor.submit(_delete_files, names))
+
+
+def save_avatar(user, upload):
+    """
+    Проверяет загрузку, сохраняет копии и записывает их в пользователя
+    (только поля avatar и avatar_variants). Бросает AvatarError.
+    """
+    validate_avatar(upload)
+    data = upload.read()
+    digest = hashlib.sha256(data).hexdigest()[:16]
+
+    specs = [(key, side, side, True, "webp") for key, side in AVATAR_SIZES.items()]
+    side = AVATAR_SIZES[MAIN_VARIANT]
+    specs.append((MAIN_VARIANT, side, side, True, FALLBACK_EXT))
+    try:
+        _, _, rendered = render_in_pool(settings.IMAGE_POOL_WORKERS, data, specs)
+    except (
+        UnidentifiedImageError,
+        Image.DecompressionBombError,
+        OSError,
+        ValueError,
+    ) as error:
+        raise AvatarError("Could not read image") from error
+
+    variants = {}
+    for (key, ext), (_, _, content) in rendered.items():
+        name = f"avatars/user_{user.id}/{digest}-{key}.{ext}"
+        # Тот же файл уже загружался: копии с этим хэшем на месте
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(content))
+        variants[f"{key}.{ext}"] = name
+
+    old_files = avatar_files(user) - set(variants.values())
+    user.avatar.name = variants[f"{MAIN_VARIANT}.webp"]
+    user.avatar_variants = variants
+    with transaction.atomic():
+        user.save(update_fields=["avatar", "avatar_variants", "updated_at"])
+        schedule_cleanup(old_files)
+    return user
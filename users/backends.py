@@ -0,0 +1,27 @@
+"""
+Бэкенд аутентификации с кэшем пользователя.
+
+AuthenticationMiddleware загружает пользователя на каждый запрос; здесь он
+берётся из кэша под версией "user" (reminders/caching.py), которую меняет
+любое сохранение или удаление CustomUser (reminders/signals.py). Смена
+пароля сохраняет пользователя, поэтому проверка хэша сессии не видит
+устаревших данных.
+"""
+
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from reminders.caching import versioned_key
+
+USER_TIMEOUT = 60 * 10
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = versioned_key("user", user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, USER_TIMEOUT)
+        return user
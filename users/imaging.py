@@ -0,0 +1,90 @@
+"""
+Уменьшенные копии загруженных изображений.
+
+Модуль не зависит от Django: render_variants() выполняется в отдельных
+процессах (get_pool), чтобы декодирование и сжатие картинок не занимали
+GIL воркера, который обслуживает запросы.
+"""
+
+import io
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from PIL import Image, ImageOps
+
+# Защита от «бомб»: картинка больше 40 Мп не декодируется
+Image.MAX_IMAGE_PIXELS = 40_000_000
+
+FORMATS = {
+    "webp": ("WEBP", {"quality": 82, "method": 4}),
+    "jpg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+}
+
+_pool = None
+_pool_workers = None
+
+
+def get_pool(workers):
+    """Общий пул процессов; None, если обработка должна идти в текущем процессе."""
+    global _pool, _pool_workers
+    if workers <= 0:
+        return None
+    if _pool is None or _pool_workers != workers:
+        # spawn, а не fork: воркер ASGI многопоточный
+        _pool = ProcessPoolExecutor(workers, mp_context=get_context("spawn"))
+        _pool_workers = workers
+    return _pool
+
+
+def reset_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _prepare(image, ext):
+    if ext == "jpg" or image.mode not in ("RGB", "RGBA"):
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            return background if ext == "jpg" else image
+        return image.convert("RGB")
+    return image
+
+
+def render_variants(data, specs):
+    """
+    Декодирует картинку один раз и строит копии по спецификациям
+    (key, width, height, crop, ext). crop=True — заполнить кадр с обрезкой,
+    иначе вписать с сохранением пропорций (и не увеличивать).
+
+    Возвращает (исходная ширина, исходная высота,
+    {(key, ext): (ширина, высота, bytes)}).
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        source.seek(0)  # первый кадр GIF
+        image = ImageOps.exif_transpose(source)
+        image.load()
+
+    result = {}
+    for key, width, height, crop, ext in specs:
+        if crop:
+            variant = ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+        else:
+            variant = image.copy()
+            variant.thumbnail((width, height), Image.Resampling.LANCZOS)
+        variant = _prepare(variant, ext)
+        buffer = io.BytesIO()
+        pil_format, options = FORMATS[ext]
+        variant.save(buffer, pil_format, **options)
+        result[(key, ext)] = (variant.width, variant.height, buffer.getvalue())
+    return image.width, image.height, result
+
+
+def render_in_pool(workers, data, specs):
+    pool = get_pool(workers)
+    if pool is None:
+        return render_variants(data, specs)
+    return pool.submit(render_variants, data, specs).result()
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from users.outbox import OutboxWorker
+
+
+class Command(BaseCommand):
+    help = "Отправляет письма из очереди OutboxEmail (долгоживущий процесс)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Отправить всё, что готово, и выйти",
+        )
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=5,
+            help="Пауза в секундах, когда очередь пуста",
+        )
+
+    def handle(self, *args, **options):
+        worker = OutboxWorker(
+            batch_size=options["batch_size"], poll_interval=options["poll_interval"]
+        )
+        if options["once"]:
+            try:
+                sent = worker.run_once()
+            finally:
+                worker.close()
+            self.stdout.write(self.style.SUCCESS(f"Отправлено писем: {sent}"))
+            return
+
+        self.stdout.write("Отправка писем из очереди запущена")
+        try:
+            worker.run_forever()
+        except KeyboardInterrupt:
+            self.stdout.write("Остановлено")
@@ -0,0 +1,143 @@
+"""
+Очередь исходящих писем (OutboxEmail).
+
+enqueue_mail() только записывает письмо в БД — в той же транзакции, что
+и создание пользователя или приглашения, поэтому запрос не ждёт SMTP,
+а письмо не теряется при падении процесса.
+
+Отправляет OutboxWorker (команда send_outbox): забирает пачку готовых
+писем с SELECT ... FOR UPDATE SKIP LOCKED (несколько воркеров не
+отправят одно письмо дважды), шлёт их через одно SMTP-соединение и
+держит его открытым, пока очередь не опустеет. Неудачная попытка
+откладывает письмо с экспоненциальной задержкой; после MAX_ATTEMPTS
+письмо помечается FAILED.
+"""
+
+import logging
+import smtplib
+import time
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 8
+RETRY_BASE = timedelta(seconds=30)
+RETRY_MAX = timedelta(hours=1)
+
+
+def enqueue_mail(subject, message, recipient_list, from_email=None):
+    """Ставит письмо в очередь; сигнатура повторяет django.core.mail.send_mail."""
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or "",
+        to=list(recipient_list),
+    )
+
+
+def retry_delay(attempts):
+    return min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX)
+
+
+class OutboxWorker:
+    def __init__(self, batch_size=50, poll_interval=5):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.connection = None
+
+    def _open(self):
+        if self.connection is None:
+            self.connection = get_connection()
+            self.connection.open()
+        return self.connection
+
+    def _fail(self, email, error, now):
+        email.attempts += 1
+        email.last_error = str(error)[:1000]
+        if email.attempts >= MAX_ATTEMPTS:
+            email.status = OutboxEmail.Status.FAILED
+            logger.error("Giving up on outbox email %s: %s", email.id, error)
+        else:
+            email.next_attempt_at = now + retry_delay(email.attempts)
+
+    def send_batch(self, now=None):
+        """Отправляет одну пачку готовых писем, возвращает число отправленных."""
+        now = now or timezone.now()
+        with transaction.atomic():
+            batch = list(
+                OutboxEmail.objects.select_for_update(skip_locked=True)
+                .filter(status=OutboxEmail.Status.PENDING, next_attempt_at__lte=now)
+                .order_by("next_attempt_at", "id")[: self.batch_size]
+            )
+            if not batch:
+                return 0
+
+            sent = 0
+            for index, email in enumerate(batch):
+                message = EmailMessage(
+                    subject=email.subject,
+                    body=email.body,
+                    from_email=email.from_email or None,
+                    to=email.to,
+                )
+                try:
+                    self._open().send_messages([message])
+                except (
+                    smtplib.SMTPRecipientsRefused,
+                    smtplib.SMTPSenderRefused,
+                    smtplib.SMTPDataError,
+                ) as error:
+                    # Отказ по конкретному письму (адрес, размер), соединение живо
+                    self._fail(email, error, now)
+                except OSError as error:
+                    # Сервер недоступен или оборвал соединение (SMTPException —
+                    # тоже OSError): откладываем остаток пачки целиком
+                    logger.warning("SMTP connection failed: %s", error)
+                    self.close()
+                    for pending in batch[index:]:
+                        self._fail(pending, error, now)
+                    break
+                else:
+                    email.status = OutboxEmail.Status.SENT
+                    email.sent_at = timezone.now()
+                    email.last_error = ""
+                    sent += 1
+
+            OutboxEmail.objects.bulk_update(
+                batch,
+                ["status", "attempts", "next_attempt_at", "last_error", "sent_at"],
+            )
+        return sent
+
+    def run_once(self, now=None):
+        """Отправляет всё, что готово к отправке."""
+        total = 0
+        while sent := self.send_batch(now):
+            total += sent
+            if sent < self.batch_size:
+                break
+        return total
+
+    def run_forever(self):
+        try:
+            while True:
+                if not self.run_once():
+                    # Очередь пуста: не держим соединение, пока ждём
+                    self.close()
+                    time.sleep(self.poll_interval)
+        finally:
+            self.close()
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.connection = None
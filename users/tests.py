@@ -1,8 +1,24 @@
-from django.test import TestCase
+import io
+import shutil
+import smtplib
+import tempfile
+from unittest import mock
+
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
-from .models import CustomUser
+from PIL import Image
+
+from . import avatars
+from .imaging import reset_pool
+from .models import CustomUser, OutboxEmail
+from .outbox import MAX_ATTEMPTS, RETRY_BASE, OutboxWorker, enqueue_mail
 
 class AuthenticationTests(APITestCase):
     def setUp(self):
@@ -47,4 +63,143 @@ class AuthenticationTests(APITestCase):
         # Доступ к защищенному endpoint с токеном
         self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
         response = self.client.get(self.profile_url)
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+class OutboxTests(TestCase):
+    def test_registration_only_enqueues_mail(self):
+        response = self.client.post(
+            reverse("register_page"),
+            {
+                "username": "newuser",
+                "email": "new@example.com",
+                "password": "testpass123",
+                "password2": "testpass123",
+            },
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        self.assertTrue(response.json()["success"])
+        self.assertEqual(len(mail.outbox), 0)
+
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.to, ["new@example.com"])
+        self.assertIn("/user/verify/email/", email.body)
+
+        call_command("send_outbox", "--once", stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboxEmail.Status.SENT)
+
+    def test_failed_delivery_is_retried_with_backoff(self):
+        email = enqueue_mail("Тема", "Текст", ["user@example.com"])
+        worker = OutboxWorker()
+        now = timezone.now()
+        with mock.patch.object(
+            locmem.EmailBackend,
+            "send_messages",
+            side_effect=smtplib.SMTPServerDisconnected("down"),
+        ):
+            self.assertEqual(worker.send_batch(now), 0)
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboxEmail.Status.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertEqual(email.next_attempt_at, now + RETRY_BASE)
+
+        # До следующей попытки письмо не трогаем
+        self.assertEqual(worker.send_batch(now), 0)
+        self.assertEqual(worker.send_batch(now + RETRY_BASE), 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_gives_up_after_max_attempts(self):
+        email = enqueue_mail("Тема", "Текст", ["user@example.com"])
+        OutboxEmail.objects.filter(id=email.id).update(attempts=MAX_ATTEMPTS - 1)
+        with mock.patch.object(
+            locmem.EmailBackend,
+            "send_messages",
+            side_effect=smtplib.SMTPRecipientsRefused({}),
+        ):
+            OutboxWorker().send_batch()
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboxEmail.Status.FAILED)
+
+
+def make_upload(color, size=(800, 600), fmt="PNG", name="avatar.png"):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, fmt)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class AvatarPipelineTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, IMAGE_POOL_WORKERS=0
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = CustomUser.objects.create_user(
+            username="user", email="user@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(self.user)
+
+    def upload(self, upload):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse("avatar_api"), {"avatar": upload}, format="multipart"
+            )
+        # Дожидаемся фоновой очистки старых файлов
+        avatars._cleanup_executor.submit(lambda: None).result()
+        self.user.refresh_from_db()
+        return response
+
+    def test_upload_produces_hashed_variants(self):
+        response = self.upload(make_upload("red"))
+        self.assertEqual(response.status_code, 200)
+
+        variants = self.user.avatar_variants
+        self.assertEqual(
+            set(variants), {"sm.webp", "md.webp", "lg.webp", "md.jpg"}
+        )
+        self.assertEqual(self.user.avatar.name, variants["md.webp"])
+        with Image.open(self.user.avatar.path) as image:
+            self.assertEqual((image.format, image.size), ("WEBP", (256, 256)))
+        self.assertEqual(
+            avatars.avatar_url(self.user, "sm"), "/media/" + variants["sm.webp"]
+        )
+
+        # Та же картинка — те же имена, новая — новые, а старые файлы удалены
+        old_files = avatars.avatar_files(self.user)
+        self.upload(make_upload("red"))
+        self.assertEqual(avatars.avatar_files(self.user), old_files)
+
+        self.upload(make_upload("blue"))
+        self.assertFalse(old_files & avatars.avatar_files(self.user))
+        storage = avatars.default_storage
+        self.assertFalse(any(storage.exists(name) for name in old_files))
+        self.assertTrue(storage.exists(self.user.avatar.name))
+
+    def test_rejects_invalid_upload(self):
+        upload = SimpleUploadedFile("a.png", b"not an image", content_type="image/png")
+        response = self.upload(upload)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.user.avatar_variants, {})
+
+    def test_rejects_decompression_bomb(self):
+        # Несколько килобайт PNG, но 90 Мп после декодирования
+        buffer = io.BytesIO()
+        Image.new("1", (10000, 9000)).save(buffer, "PNG")
+        upload = SimpleUploadedFile(
+            "bomb.png", buffer.getvalue(), content_type="image/png"
+        )
+        response = self.upload(upload)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.user.avatar_variants, {})
+
+    def test_process_pool(self):
+        with override_settings(IMAGE_POOL_WORKERS=1):
+            self.addCleanup(reset_pool)
+            response = self.upload(make_upload("green", fmt="GIF", name="a.gif"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.user.avatar_variants), 4)
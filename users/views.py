@@ -1,13 +1,12 @@
-import os
 import requests
 
 from django.views import View
 
 from django.shortcuts import render, redirect
 from django.urls import reverse
-from django.core.mail import send_mail
 from django.http import JsonResponse
 from django.conf import settings
+from django.db import transaction
 
 from django.contrib.auth.tokens import default_token_generator
 from django.contrib.auth import login, logout, authenticate
@@ -23,9 +22,14 @@ from rest_framework import generics, permissions, status
 from rest_framework.parsers import MultiPartParser, FormParser
 
 
+from .avatars import AvatarError, save_avatar
 from .models import CustomUser
+from .outbox import enqueue_mail
 from .serializers import AvatarUpdateSerializer
 
+# login() без authenticate(): бэкендов несколько, записываем в сессию этот
+CACHED_BACKEND = "users.backends.CachedModelBackend"
+
 
 class VerifyEmailView(View):
     def get(self, request, uidb64, token):
@@ -38,7 +42,7 @@ class VerifyEmailView(View):
         if user is not None and default_token_generator.check_token(user, token):
             user.is_active = True
             user.save()
-            login(request, user)
+            login(request, user, backend=CACHED_BACKEND)
             return redirect("dashboard_page")
         else:
             return render(
@@ -136,30 +140,31 @@ class TemplateRegisterView(View):
             return render(request, "app/dashboard_v2.html", {"error": error_msg})
 
         try:
-            user = CustomUser.objects.create_user(
-                username=username,
-                email=email,
-                password=password,
-                first_name=request.POST.get("first_name", ""),
-                last_name=request.POST.get("last_name", ""),
-            )
-            user.is_active = False
-            user.save()
+            with transaction.atomic():
+                user = CustomUser.objects.create_user(
+                    username=username,
+                    email=email,
+                    password=password,
+                    first_name=request.POST.get("first_name", ""),
+                    last_name=request.POST.get("last_name", ""),
+                )
+                user.is_active = False
+                user.save()
 
-            uid = urlsafe_base64_encode(force_bytes(user.pk))
-            token = default_token_generator.make_token(user)
-            relative_url = reverse(
-                "verify_email", kwargs={"uidb64": uid, "token": token}
-            )
-            verify_url = request.build_absolute_uri(relative_url)
-
-            send_mail(
-                subject="Подтверждение регистрации CloudReminders",
-                message=f"Привет, {user.username}!\n\nПожалуйста, перейдите по ссылке, чтобы подтвердить вашу почту:\n{verify_url}\n\nЕсли это были не вы, просто проигнорируйте письмо.",
-                from_email=None,
-                recipient_list=[user.email],
-                fail_silently=False,
-            )
+                uid = urlsafe_base64_encode(force_bytes(user.pk))
+                token = default_token_generator.make_token(user)
+                relative_url = reverse(
+                    "verify_email", kwargs={"uidb64": uid, "token": token}
+                )
+                verify_url = request.build_absolute_uri(relative_url)
+
+                # Письмо ставится в очередь в одной транзакции с пользователем,
+                # отправляет его команда send_outbox — SMTP не держит запрос
+                enqueue_mail(
+                    subject="Подтверждение регистрации CloudReminders",
+                    message=f"Привет, {user.username}!\n\nПожалуйста, перейдите по ссылке, чтобы подтвердить вашу почту:\n{verify_url}\n\nЕсли это были не вы, просто проигнорируйте письмо.",
+                    recipient_list=[user.email],
+                )
 
             if is_ajax:
                 return JsonResponse(
@@ -201,15 +206,15 @@ class AvatarUpdateView(generics.UpdateAPIView):
     def update(self, request, *args, **kwargs):
         user = self.get_object()
 
-        # Удаляем старый аватар если он не дефолтный
-        if user.avatar and user.avatar.name != "avatars/default_avatar.png":
-            old_avatar_path = user.avatar.path
-            if os.path.exists(old_avatar_path):
-                os.remove(old_avatar_path)
-
-        serializer = self.get_serializer(user, data=request.data, partial=True)
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        if "avatar" not in request.FILES:
+            return Response(
+                {"avatar": ["No file was submitted."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            save_avatar(user, request.FILES["avatar"])
+        except AvatarError as e:
+            return Response({"avatar": [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response(
             {"message": "Avatar updated successfully", "avatar_url": user.avatar.url}
@@ -242,35 +247,10 @@ class ProfileView(View):
             # Обработка загрузки аватара
             avatar_url = None
             if "avatar" in request.FILES:
-                avatar_file = request.FILES["avatar"]
-
-                # Проверки размера и типа файла
-                if avatar_file.size > 5 * 1024 * 1024:
-                    return JsonResponse(
-                        {
-                            "success": False,
-                            "error": "File size too large. Maximum 5MB allowed.",
-                        },
-                        status=400,
-                    )
-
-                allowed_types = ["image/jpeg", "image/png", "image/gif"]
-                if avatar_file.content_type not in allowed_types:
-                    return JsonResponse(
-                        {
-                            "success": False,
-                            "error": "Invalid file type. Allowed: JPEG, PNG, GIF",
-                        },
-                        status=400,
-                    )
-
-                # Удаляем старый аватар
-                if user.avatar and user.avatar.name != "avatars/default_avatar.png":
-                    old_avatar_path = user.avatar.path
-                    if os.path.exists(old_avatar_path):
-                        os.remove(old_avatar_path)
-
-                user.avatar = avatar_file
+                try:
+                    save_avatar(user, request.FILES["avatar"])
+                except AvatarError as e:
+                    return JsonResponse({"success": False, "error": str(e)}, status=400)
 
             user.save()
 
@@ -305,31 +285,13 @@ class ProfileView(View):
 
         # Обработка загрузки аватара
         if "avatar" in request.FILES:
-            avatar_file = request.FILES["avatar"]
-            if avatar_file.size > 5 * 1024 * 1024:
-                return render(
-                    request,
-                    "profile/profile.html",
-                    {
-                        "user": user,
-                        "error": "File size too large. Maximum 5MB allowed.",
-                    },
-                )
-
-            allowed_types = ["image/jpeg", "image/png", "image/gif"]
-            if avatar_file.content_type not in allowed_types:
+            try:
+                save_avatar(user, request.FILES["avatar"])
+            except AvatarError as e:
                 return render(
-                    request,
-                    "profile/profile.html",
-                    {
-                        "user": user,
-                        "error": "Invalid file type. Allowed: JPEG, PNG, GIF",
-                    },
+                    request, "profile/profile.html", {"user": user, "error": str(e)}
                 )
 
-            user.avatar = avatar_file
-            user.save()
-
         return render(
             request,
             "profile/profile.html",
@@ -357,30 +319,10 @@ def update_user_profile(request):
             user.last_name = request.data["last_name"]
 
         if "avatar" in request.FILES:
-            avatar_file = request.FILES["avatar"]
-
-            FIVE_MB_IN_BITES = 5 * 1024 * 1024
-            if avatar_file.size > FIVE_MB_IN_BITES:
-                return Response(
-                    {"error": "File size too large. Maximum 5MB allowed."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
-            allowed_types = ["image/jpeg", "image/png", "image/gif", "image/webp"]
-            if avatar_file.content_type not in allowed_types:
-                return Response(
-                    {"error": "Invalid file type. Allowed: JPEG, PNG, GIF, WEBP"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
-            if user.avatar and user.avatar.name != "avatars/default_avatar.png":
-                old_avatar_path = user.avatar.path
-                import os
-
-                if os.path.exists(old_avatar_path):
-                    os.remove(old_avatar_path)
-
-            user.avatar = avatar_file
+            try:
+                save_avatar(user, request.FILES["avatar"])
+            except AvatarError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         user.save()
 
@@ -461,5 +403,5 @@ def yandex_callback(request):
         user.set_unusable_password()
         user.save()
 
-    login(request, user)
+    login(request, user, backend=CACHED_BACKEND)
     return redirect("dashboard_page")